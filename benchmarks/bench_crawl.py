@@ -0,0 +1,228 @@
+# Офлайн-бенчмарк обхода: парсеры YouTube, VK и RuTube работают с локальным
+# сервером (replay_server.py) вместо настоящих сайтов, затем замеряются
+# объединение, запись результата и полный прогон run_crawl.
+#
+#   python benchmarks/bench_crawl.py                          # синтетические каналы по 300 видео
+#   python benchmarks/bench_crawl.py --videos 3000 --latency 80 --throttle 0.05
+#   python benchmarks/bench_crawl.py --record fixtures/ https://youtube.com/@garchenmoscow https://rutube.ru/channel/31787118/videos/
+#   python benchmarks/bench_crawl.py --fixtures fixtures/
+#
+# --record один раз проходит настоящие каналы и сохраняет ответы (и кэш полных
+# метаданных) в папку; --fixtures затем воспроизводит их без сети.
+# Для каждого этапа выводятся число видео, время, видео/с, запросы к серверу,
+# ответы 429 и прирост RSS: насколько пик памяти за время этапа превысил RSS
+# в его начале (ru_maxrss процесса только растёт и для этапа ничего не говорит).
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rate_limiter
+from bench_writers import current_rss_kb, max_rss_kb
+from crawl import detect_platform, youtube_channel_id
+from merge import VideoMerger
+from metadata_cache import CACHE_FILE, close_cache, get_cache
+from pipeline import run_crawl
+from replay_server import (RESPONSES_FILE, SOURCES_FILE, Recording, ReplayServer, SyntheticSite,
+                           install_recorder, install_replay, load_fixtures)
+from writers import write_rows
+
+# Интервал опроса RSS во время этапа, секунды
+RSS_SAMPLE_INTERVAL = 0.01
+
+# Пиковый прирост RSS за время этапа, КБ: фоновый поток опрашивает текущий RSS
+# (/proc/self/status). Где его нет (macOS), берём прирост ru_maxrss — он
+# занижен, если процесс уже занимал больше памяти на прошлых этапах.
+class RSSPeak:
+    def __enter__(self):
+        self.start = current_rss_kb()
+        self.start_max = max_rss_kb()
+        self.peak = self.start
+        self._stop = threading.Event()
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, current_rss_kb() or 0)
+
+    def __exit__(self, *exc):
+        if self.start is None:
+            self.growth_kb = max(0, max_rss_kb() - self.start_max)
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_kb() or 0)
+        self.growth_kb = max(0, self.peak - self.start)
+
+# Вывод парсеров (прогресс-бары, предупреждения) не мешает таблице результатов
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+# Без ограничителей замеряется сам код, а не RATE_LIMITS
+def disable_rate_limits():
+    for limits in list(rate_limiter.RATE_LIMITS.values()) + [rate_limiter.DEFAULT_RATE_LIMIT]:
+        limits.update(rate=10000, min_rate=10000, max_rate=10000)
+
+def load_parsers():
+    from parser_percentages import PARSERS
+    return PARSERS
+
+# Ссылку @handle на YouTube заменяем ссылкой /channel/UC..., чтобы при
+# воспроизведении не нужен был запрос yt-dlp за ID канала
+def resolve_youtube(url):
+    if youtube_channel_id(url):
+        return url
+    import yt_dlp
+    with yt_dlp.YoutubeDL({'quiet': True, 'extract_flat': True, 'no_warnings': True}) as ydl:
+        channel_id = ydl.extract_info(url, download=False, process=False).get('channel_id')
+    if not channel_id:
+        raise RuntimeError(f"could not resolve channel id for {url}")
+    return f'https://www.youtube.com/channel/{channel_id}'
+
+def record(directory, urls):
+    os.makedirs(directory, exist_ok=True)
+    sources = []
+    for url in urls:
+        platform = detect_platform(url)
+        if platform is None:
+            raise SystemExit(f"Unsupported URL: {url}")
+        sources.append((platform, resolve_youtube(url) if platform == 'youtube' else url))
+
+    recording = Recording()
+    install_recorder(recording)
+    # Полные метаданные, которые всё же пришлось запросить, попадают в кэш,
+    # и при воспроизведении берутся из него
+    get_cache(os.path.join(directory, CACHE_FILE))
+    parsers = load_parsers()
+    for platform, url in sources:
+        start = time.perf_counter()
+        count = sum(1 for _ in parsers[platform](url))
+        print(f"Recorded {platform} {url}: {count} videos in {time.perf_counter() - start:.1f} s")
+    close_cache()
+
+    recording.save(os.path.join(directory, RESPONSES_FILE))
+    with open(os.path.join(directory, SOURCES_FILE), 'w', encoding='utf-8') as f:
+        json.dump(sources, f, ensure_ascii=False, indent=1)
+    print(f"Saved {len(recording.responses)} responses to {directory}")
+
+def run_stage(results, server, name, func):
+    before = server.stats()
+    with RSSPeak() as rss:
+        start = time.perf_counter()
+        with quiet():
+            videos = func()
+        elapsed = time.perf_counter() - start
+    after = server.stats()
+    results.append({
+        'stage': name,
+        'videos': videos,
+        'seconds': elapsed,
+        'requests': after['requests'] - before['requests'],
+        'throttled': after['throttled'] - before['throttled'],
+        'rss_growth_mb': rss.growth_kb / 1024,
+    })
+
+def benchmark(args):
+    if args.fixtures:
+        recording, sources = load_fixtures(args.fixtures)
+        server = ReplayServer(recording=recording, latency=args.latency / 1000, throttle=args.throttle)
+    else:
+        site = SyntheticSite(args.videos)
+        sources = site.sources()
+        server = ReplayServer(site=site, latency=args.latency / 1000, throttle=args.throttle)
+    install_replay(server.start())
+    if args.unlimited:
+        disable_rate_limits()
+
+    workdir = tempfile.mkdtemp(prefix='bench_crawl_')
+    if args.fixtures and os.path.exists(os.path.join(args.fixtures, CACHE_FILE)):
+        shutil.copy(os.path.join(args.fixtures, CACHE_FILE), workdir)
+    os.chdir(workdir)
+
+    parsers = load_parsers()
+    results = []
+    records = []
+
+    # Этап 1: парсеры по очереди, чтобы время каждой платформы было видно отдельно
+    for index, (platform, url) in enumerate(sources):
+        def parse():
+            parsed = list(parsers[platform](url))
+            records.extend((index, video) for video in parsed)
+            return len(parsed)
+        run_stage(results, server, f'parse {platform}', parse)
+
+    # Этап 2: объединение
+    rows = []
+    def merge():
+        merger = VideoMerger()
+        for index, video in records:
+            merger.add(video, source_index=index)
+        rows.extend(merger.rows())
+        return len(records)
+    run_stage(results, server, 'merge', merge)
+
+    # Этап 3: запись
+    output_file = os.path.join(workdir, 'videos.' + args.format)
+    run_stage(results, server, f'write {args.format}', lambda: write_rows(rows, output_file))
+
+    # Полный прогон: источники параллельно, потоковое объединение и запись
+    if not args.skip_end_to_end:
+        def end_to_end():
+            exit_code = run_crawl([url for platform, url in sources], parsers,
+                                  output_file=os.path.join(workdir, 'end_to_end.' + args.format),
+                                  incremental=False)
+            if exit_code:
+                raise RuntimeError(f"run_crawl exited with {exit_code}")
+            return len(records)
+        run_stage(results, server, 'end-to-end', end_to_end)
+
+    server.stop()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'stage':>14} {'videos':>8} {'time, s':>9} {'videos/s':>10} {'requests':>9} {'429':>5} {'RSS growth, MB':>15}")
+    for result in results:
+        rate = result['videos'] / result['seconds'] if result['seconds'] else 0
+        print(f"{result['stage']:>14} {result['videos']:>8} {result['seconds']:>9.2f} {rate:>10.0f} "
+              f"{result['requests']:>9} {result['throttled']:>5} {result['rss_growth_mb']:>15.1f}")
+    if server.stats()['missing']:
+        print(f"⚠️ {server.stats()['missing']} requests had no recorded response")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline crawl benchmark against a local replay server')
+    parser.add_argument('--videos', type=int, default=300, help='videos per synthetic channel')
+    parser.add_argument('--latency', type=float, default=0, help='delay of every response, ms')
+    parser.add_argument('--throttle', type=float, default=0, help='share of requests answered with 429')
+    parser.add_argument('--unlimited', action='store_true', help='disable rate limiters to measure code throughput')
+    parser.add_argument('--format', default='xlsx', help='output format for the write stage')
+    parser.add_argument('--skip-end-to-end', action='store_true')
+    parser.add_argument('--fixtures', metavar='DIR', help='replay responses recorded with --record')
+    parser.add_argument('--record', metavar='DIR', help='record real responses for the given URLs into DIR')
+    parser.add_argument('--json', metavar='FILE', help='also save results as JSON')
+    parser.add_argument('urls', nargs='*', help='URLs to record (with --record)')
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.urls:
+            parser.error('--record needs channel URLs')
+        record(args.record, args.urls)
+    else:
+        benchmark(args)
+
+if __name__ == '__main__':
+    main()
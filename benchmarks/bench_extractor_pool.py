@@ -0,0 +1,93 @@
+# Бенчмарк накладных расходов на одно видео: новый YoutubeDL на каждое видео
+# (как было в parser_percentages.py) против экземпляра из пула ydl_pool.
+#
+#   python benchmarks/bench_extractor_pool.py                 # только создание/загрузка cookies
+#   python benchmarks/bench_extractor_pool.py -n 20 --url https://rutube.ru/video/<id>/
+#
+# Без --url сеть не используется: замеряется создание экстрактора, загрузка
+# cookies.txt и закрытие (которое в yt-dlp перезаписывает файл cookies).
+import argparse
+import copy
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import yt_dlp
+
+from ydl_pool import ExtractorPool
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+base_opts = {
+    'quiet': True,
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36',
+        'Referer': 'https://rutube.ru/',
+    },
+    'retries': 3,
+    'socket_timeout': 20,
+    'no_warnings': True,
+    'extract_flat': False,
+}
+
+def touch(ydl, url):
+    # Принудительно загружаем cookie-jar, как это происходит при первом запросе
+    ydl.cookiejar
+    if url:
+        ydl.extract_info(url, download=False)
+
+def bench_per_video(opts, n, url):
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            touch(ydl, url)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def bench_pooled(opts, n, url):
+    pool = ExtractorPool()
+    timings = []
+    try:
+        for _ in range(n):
+            start = time.perf_counter()
+            with pool.extractor(('rutube', 'full'), opts) as ydl:
+                touch(ydl, url)
+            timings.append(time.perf_counter() - start)
+    finally:
+        pool.close()
+    return timings
+
+def report(name, timings):
+    print(f"{name:>10}: mean {statistics.mean(timings) * 1000:8.2f} ms/video, "
+          f"median {statistics.median(timings) * 1000:8.2f} ms, "
+          f"first {timings[0] * 1000:8.2f} ms, total {sum(timings):.2f} s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-video YoutubeDL overhead: new instance vs pooled')
+    parser.add_argument('-n', type=int, default=200, help='number of videos to simulate')
+    parser.add_argument('--url', help='real video URL to extract on every iteration')
+    parser.add_argument('--cookies', default=os.path.join(ROOT, 'cookies.txt'))
+    args = parser.parse_args()
+
+    # Работаем с копией cookies.txt: YoutubeDL.close() перезаписывает файл
+    with tempfile.TemporaryDirectory() as tmp:
+        opts = copy.deepcopy(base_opts)
+        if os.path.exists(args.cookies):
+            opts['cookiefile'] = shutil.copy(args.cookies, os.path.join(tmp, 'cookies.txt'))
+
+        print(f"{args.n} videos, url={args.url or '-'}, cookies={'cookiefile' in opts}")
+        before = bench_per_video(opts, args.n, args.url)
+        after = bench_pooled(opts, args.n, args.url)
+        report('per-video', before)
+        report('pooled', after)
+        saved = statistics.mean(before) - statistics.mean(after)
+        print(f"Saved {saved * 1000:.2f} ms per video ({statistics.mean(before) / statistics.mean(after):.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# Бенчмарк объединения дубликатов: нормализация названий и объединение строк
+# с разных платформ (VideoMerger) для 100k и 1M записей.
+#
+#   python benchmarks/bench_merge.py
+#   python benchmarks/bench_merge.py --records 100000 --fuzzy --repeat 3
+#
+# Записи приходят без normalized_title, поэтому в замер входит и нормализация.
+# Каждый замер выполняется в отдельном процессе; пиковая память — прирост
+# максимального RSS процесса во время объединения (Linux/macOS).
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_writers import current_rss_kb, max_rss_kb
+from video_record import VideoRecord
+
+PLATFORM_LINKS = [
+    ('YouTube link', 'https://youtube.com/watch?v={:011d}'),
+    ('VK link', 'https://vkvideo.ru/video-123456_{}'),
+    ('RuTube link', 'https://rutube.ru/video/{:032x}/'),
+]
+
+# Записи трёх платформ вперемешку; каждое название встречается примерно на двух платформах.
+# Каждая десятая запись — строка ранее сохранённого файла (словарь с заполненной «Инфа»).
+def generate_records(n):
+    sources = len(PLATFORM_LINKS)
+    for i in range(n):
+        platform = i % sources
+        title = f'Друбпон Лама Палкьи. Совет практикующим, часть {(i * 7919) % max(n // 2, 1)}!'
+        column, link = PLATFORM_LINKS[platform]
+        if i % 10 == 0:
+            yield platform, {'Название видео': title, column: link.format(i), 'Инфа': f'заметка {i}'}
+        else:
+            yield platform, VideoRecord(title, str(i), column, link.format(i))
+
+def run_child(n, fuzzy):
+    from merge import FUZZY_THRESHOLD, VideoMerger
+
+    records = list(generate_records(n))
+    gc.collect()
+    before = current_rss_kb() or max_rss_kb()
+    merger = VideoMerger(FUZZY_THRESHOLD if fuzzy else None)
+    start = time.perf_counter()
+    for source_index, record in records:
+        merger.add(record, source_index=source_index)
+    added = time.perf_counter()
+    rows = sum(1 for _ in merger.rows())
+    finished = time.perf_counter()
+    print(json.dumps({
+        'add_seconds': added - start,
+        'rows_seconds': finished - added,
+        'seconds': finished - start,
+        'rows': rows,
+        'peak_mb': max(0, max_rss_kb() - before) / 1024,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge/dedup benchmark')
+    parser.add_argument('--records', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--fuzzy', action='store_true', help='include the fuzzy title matching pass')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per measurement; the fastest is reported')
+    parser.add_argument('--child', nargs=2, metavar=('RECORDS', 'FUZZY'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(int(args.child[0]), args.child[1] == '1')
+        return
+
+    print(f"{'records':>8} {'rows':>8} {'add, s':>8} {'rows(), s':>10} {'total, s':>9} {'rec/s':>9} {'peak, MB':>9}")
+    for n in args.records:
+        runs = []
+        for _ in range(args.repeat):
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', str(n), '1' if args.fuzzy else '0'],
+                capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'
+                print(f"{n:>8}  skipped: {error}")
+                break
+            runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+        if not runs:
+            continue
+        stats = min(runs, key=lambda run: run['seconds'])
+        print(f"{n:>8} {stats['rows']:>8} {stats['add_seconds']:>8.2f} {stats['rows_seconds']:>10.2f} "
+              f"{stats['seconds']:>9.2f} {n / stats['seconds']:>9.0f} {stats['peak_mb']:>9.1f}")
+
+if __name__ == '__main__':
+    main()
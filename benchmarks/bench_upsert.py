@@ -0,0 +1,105 @@
+# Бенчмарк обновления существующей книги: upsert на месте (upsert.py) против прежнего
+# способа — прочитать все строки, объединить с новыми и перезаписать файл целиком.
+# В книге 10k и 100k строк с заполненными ручными колонками; обход приносит
+# --new новых видео и столько же ссылок для уже существующих строк.
+#
+#   python benchmarks/bench_upsert.py
+#   python benchmarks/bench_upsert.py --rows 10000 --new 100
+#
+# Каждый замер выполняется в отдельном процессе; пиковая память — прирост
+# максимального RSS процесса во время обновления (Linux/macOS).
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_writers import current_rss_kb, generate_rows, max_rss_kb
+
+ENGINES = ['rewrite', 'upsert']
+
+def sheet_rows(n):
+    for i, row in enumerate(generate_rows(n)):
+        row['Кто в видео?'] = 'Друбпон Лама Палкьи' if i % 4 == 0 else ''
+        row['Инфа'] = f'заметка {i}' if i % 7 == 0 else ''
+        yield row
+
+# Новые видео и ссылки VK для существующих строк без неё
+def crawled_rows(n, new):
+    for i in range(new):
+        yield {'Название видео': f'Новое видео {i}', 'YouTube link': f'https://youtube.com/watch?v=new{i:08d}'}
+    updated = 0
+    for i in range(n):
+        if updated == new:
+            break
+        if i % 3:
+            yield {'Название видео': f'Друбпон Лама Палкьи. Совет практикующим, часть {i}',
+                   'VK link': f'https://vkvideo.ru/video-654321_{i}'}
+            updated += 1
+
+def run_child(engine, workbook, n, new):
+    from merge import VideoMerger
+    from pipeline import load_existing
+    from upsert import upsert_xlsx
+    from writers import write_rows
+
+    output_file = os.path.join(tempfile.mkdtemp(), 'videos.xlsx')
+    shutil.copy(workbook, output_file)
+    rows = list(crawled_rows(n, new))
+    before = current_rss_kb() or max_rss_kb()
+    start = time.perf_counter()
+    if engine == 'upsert':
+        upsert_xlsx(rows, output_file)
+    else:
+        merger = VideoMerger()
+        for row in rows:
+            merger.add(row)
+        load_existing(merger, output_file)
+        write_rows(merger.rows(), output_file)
+    print(json.dumps({
+        'seconds': time.perf_counter() - start,
+        'peak_mb': max(0, max_rss_kb() - before) / 1024,
+    }))
+    shutil.rmtree(os.path.dirname(output_file))
+
+def main():
+    parser = argparse.ArgumentParser(description='Existing workbook update benchmark')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--new', type=int, default=1000, help='new videos (and updated rows) per run')
+    parser.add_argument('--engines', nargs='+', default=ENGINES, choices=ENGINES)
+    parser.add_argument('--child', nargs=4, metavar=('ENGINE', 'WORKBOOK', 'ROWS', 'NEW'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], int(args.child[2]), int(args.child[3]))
+        return
+
+    from writers import write_rows
+
+    directory = tempfile.mkdtemp()
+    try:
+        print(f"{'engine':>8} {'rows':>8} {'new':>6} {'time, s':>8} {'peak, MB':>9}")
+        for n in args.rows:
+            workbook = os.path.join(directory, f'videos_{n}.xlsx')
+            write_rows(sheet_rows(n), workbook)
+            for engine in args.engines:
+                result = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--child', engine, workbook, str(n), str(args.new)],
+                    capture_output=True, text=True,
+                )
+                if result.returncode != 0:
+                    error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'
+                    print(f"{engine:>8} {n:>8}  skipped: {error}")
+                    continue
+                stats = json.loads(result.stdout.strip().splitlines()[-1])
+                print(f"{engine:>8} {n:>8} {args.new:>6} {stats['seconds']:>8.2f} {stats['peak_mb']:>9.1f}")
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# Бенчмарк писателей результата: время записи и пиковая память для 1k, 10k и 100k строк.
+# Для сравнения включён прежний способ: список словарей -> DataFrame -> df.to_excel.
+#
+#   python benchmarks/bench_writers.py
+#   python benchmarks/bench_writers.py --rows 1000 10000 --formats csv xlsx
+#
+# Каждый замер выполняется в отдельном процессе; пиковая память — прирост
+# максимального RSS процесса во время записи (Linux/macOS).
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from merge import COLUMNS
+
+FORMATS = ['pandas-xlsx', 'xlsx', 'csv', 'jsonl', 'parquet']
+
+def generate_rows(n):
+    for i in range(n):
+        yield {
+            'Название видео': f'Друбпон Лама Палкьи. Совет практикующим, часть {i}',
+            'YouTube link': f'https://youtube.com/watch?v={i:011d}' if i % 2 == 0 else '',
+            'VK link': f'https://vkvideo.ru/video-123456_{i}' if i % 3 == 0 else '',
+            'RuTube link': f'https://rutube.ru/video/{i:032x}/' if i % 5 == 0 else '',
+        }
+
+def current_rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def max_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # На macOS ru_maxrss в байтах, на Linux — в килобайтах
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+def run_child(fmt, n):
+    import pandas as pd
+
+    from writers import write_rows
+
+    output_file = os.path.join(tempfile.mkdtemp(), 'videos.' + fmt.replace('pandas-', ''))
+    before = current_rss_kb() or max_rss_kb()
+    start = time.perf_counter()
+    if fmt == 'pandas-xlsx':
+        rows = list(generate_rows(n))
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        df.to_excel(output_file, index=False, engine='openpyxl')
+    else:
+        write_rows(generate_rows(n), output_file)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'seconds': elapsed,
+        'peak_mb': max(0, max_rss_kb() - before) / 1024,
+        'size_mb': os.path.getsize(output_file) / 1024 / 1024,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description='Output writer benchmark')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--formats', nargs='+', default=FORMATS, choices=FORMATS)
+    parser.add_argument('--child', nargs=2, metavar=('FORMAT', 'ROWS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], int(args.child[1]))
+        return
+
+    print(f"{'format':>12} {'rows':>8} {'time, s':>9} {'peak, MB':>9} {'file, MB':>9}")
+    for n in args.rows:
+        for fmt in args.formats:
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', fmt, str(n)],
+                capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'
+                print(f"{fmt:>12} {n:>8}  skipped: {error}")
+                continue
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            print(f"{fmt:>12} {n:>8} {stats['seconds']:>9.2f} {stats['peak_mb']:>9.1f} {stats['size_mb']:>9.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+# Локальная замена YouTube, VK и RuTube для офлайн-бенчмарков.
+#
+# Сервер отдаёт либо записанные ранее настоящие ответы (responses.jsonl, см.
+# bench_crawl.py --record), либо синтетические каналы заданного размера.
+# Можно добавить задержку на каждый запрос и долю ответов 429 Too Many Requests.
+#
+# Запросы парсеров перенаправляются на сервер без изменения их кода:
+# listing.py — через LISTING_BASE_URLS, scrapetube (запасной путь для YouTube) —
+# через подмену get_session.
+import hashlib
+import html
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import scrapetube.scrapetube
+
+import listing
+
+RESPONSES_FILE = 'responses.jsonl'
+SOURCES_FILE = 'sources.json'
+
+YOUTUBE_BASE_URL = 'https://www.youtube.com'
+
+# Ключ ответа: метод, путь с параметрами и хэш тела запроса
+def request_key(method, url, body=None):
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path + ('?' + parts.query if parts.query else '')
+    if isinstance(body, str):
+        body = body.encode()
+    return f"{method} {path} {hashlib.sha1(body or b'').hexdigest()}"
+
+# Записанные ответы: ключ -> (status, content_type, body)
+class Recording:
+    def __init__(self):
+        self.responses = {}
+        self._lock = threading.Lock()
+
+    def add(self, method, url, body, status, content_type, text):
+        with self._lock:
+            self.responses[request_key(method, url, body)] = (status, content_type, text)
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for key, (status, content_type, text) in self.responses.items():
+                f.write(json.dumps({'key': key, 'status': status, 'content_type': content_type, 'body': text},
+                                   ensure_ascii=False) + '\n')
+
+    @classmethod
+    def load(cls, path):
+        recording = cls()
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                item = json.loads(line)
+                recording.responses[item['key']] = (item['status'], item['content_type'], item['body'])
+        return recording
+
+    def lookup(self, method, path, body):
+        return self.responses.get(request_key(method, path, body))
+
+# Синтетические каналы: по одному на платформу, videos видео в каждом.
+# Часть названий совпадает между платформами, чтобы объединению было что делать.
+# У канала YouTube есть ещё вкладки Shorts (videos // 5) и трансляций (videos // 10);
+# пустой вкладки нет, и по её адресу, как у YouTube, открывается главная страница канала.
+class SyntheticSite:
+    YOUTUBE_CHANNEL = 'UCreplaybenchmarkchannel'
+    VK_HANDLE = '@replaybench'
+    VK_OID = -100500
+    RUTUBE_CHANNEL = '1000'
+    YOUTUBE_PAGE = 30
+    VK_PAGE = 100
+    RUTUBE_PAGE = 20
+
+    def __init__(self, videos):
+        self.videos = videos
+
+    def sources(self):
+        return [
+            ('youtube', f'https://www.youtube.com/channel/{self.YOUTUBE_CHANNEL}'),
+            ('vk', f'https://vkvideo.ru/{self.VK_HANDLE}/all'),
+            ('rutube', f'https://rutube.ru/channel/{self.RUTUBE_CHANNEL}/videos/'),
+        ]
+
+    def title(self, platform, i):
+        shared = {'youtube': True, 'vk': i % 2 == 0, 'rutube': i % 3 == 0}[platform]
+        if shared:
+            return f'Друбпон Лама Палкьи. Учение {i}'
+        return f'Ретрит в Москве, {platform} запись {i}'
+
+    def youtube_tabs(self):
+        return {'videos': self.videos, 'shorts': self.videos // 5, 'streams': self.videos // 10}
+
+    def youtube_item(self, tab, i):
+        if tab == 'shorts':
+            return {'shortsLockupViewModel': {
+                'onTap': {'innertubeCommand': {'reelWatchEndpoint': {'videoId': f'S{i:010d}'}}},
+                'overlayMetadata': {'primaryText': {'content': f'Короткое видео {i}'}},
+            }}
+        if tab == 'streams':
+            return {'videoRenderer': {'videoId': f'L{i:010d}', 'title': {'runs': [{'text': f'Трансляция {i}'}]}}}
+        return {'videoRenderer': {'videoId': f'{i:011d}', 'title': {'runs': [{'text': self.title('youtube', i)}]}}}
+
+    # Продолжение «вкладка:страница» вместо настоящего непрозрачного токена
+    def youtube_items(self, tab, page):
+        start = page * self.YOUTUBE_PAGE
+        count = self.youtube_tabs()[tab]
+        items = [
+            {'richItemRenderer': {'content': self.youtube_item(tab, i)}}
+            for i in range(start, min(start + self.YOUTUBE_PAGE, count))
+        ]
+        if start + self.YOUTUBE_PAGE < count:
+            items.append({'continuationItemRenderer': {'continuationEndpoint': {
+                'clickTrackingParams': 'bench',
+                'continuationCommand': {'token': f'{tab}:{page + 1}'},
+            }}})
+        return items
+
+    def youtube_page(self, tab):
+        tabs = [name for name, count in self.youtube_tabs().items() if count]
+        selected = tab if tab in tabs else 'featured'
+        renderers = []
+        for name in ['featured'] + tabs:
+            renderer = {
+                'title': name,
+                'selected': name == selected,
+                'endpoint': {'commandMetadata': {'webCommandMetadata': {'url': f'/channel/{self.YOUTUBE_CHANNEL}/{name}'}}},
+            }
+            if name == selected:
+                contents = self.youtube_items(name, 0) if name != 'featured' else []
+                renderer['content'] = {'richGridRenderer': {'contents': contents}}
+            renderers.append({'tabRenderer': renderer})
+        data = {'contents': {'twoColumnBrowseResultsRenderer': {'tabs': renderers}}}
+        return ('<script>ytcfg.set({"INNERTUBE_CONTEXT":{"client":{"clientVersion":"2.20240101"}},'
+                '"innertubeApiKey":"bench"});</script>'
+                f'<script>var ytInitialData = {json.dumps(data)};</script>')
+
+    def respond(self, method, path, body):
+        parts = urllib.parse.urlsplit(path)
+        query = urllib.parse.parse_qs(parts.query)
+        channel_path = f'/channel/{self.YOUTUBE_CHANNEL}/'
+        if parts.path.startswith(channel_path) and method == 'GET':
+            return 200, 'text/html', self.youtube_page(parts.path[len(channel_path):].strip('/'))
+        if parts.path == '/youtubei/v1/browse' and method == 'POST':
+            tab, page = json.loads(body)['continuation'].split(':')
+            data = {'onResponseReceivedActions': [
+                {'appendContinuationItemsAction': {'continuationItems': self.youtube_items(tab, int(page))}},
+            ]}
+            return 200, 'application/json', json.dumps(data)
+        if parts.path == f'/video/{self.VK_HANDLE}':
+            return 200, 'text/html', f'<script>var newCur = {{"section":"all","oid":{self.VK_OID}}};</script>'
+        if parts.path == '/al_video.php' and method == 'POST':
+            form = urllib.parse.parse_qs(body.decode())
+            offset, section = int(form['offset'][0]), form['section'][0]
+            videos = [
+                [self.VK_OID, i, 'thumb', html.escape(self.title('vk', i))]
+                for i in range(offset, min(offset + self.VK_PAGE, self.videos))
+            ]
+            payload = {'payload': ['0', [{section: {'count': len(videos), 'total': self.videos, 'list': videos}}]]}
+            return 200, 'application/json', '<!--' + json.dumps(payload, ensure_ascii=False)
+        if parts.path == f'/api/video/person/{self.RUTUBE_CHANNEL}/':
+            page = int(query['page'][0])
+            start = (page - 1) * self.RUTUBE_PAGE
+            results = [
+                {'id': f'{i:032x}', 'title': self.title('rutube', i), 'video_url': f'https://rutube.ru/video/{i:032x}/'}
+                for i in range(start, min(start + self.RUTUBE_PAGE, self.videos))
+            ]
+            has_next = start + self.RUTUBE_PAGE < self.videos
+            next_url = f'https://rutube.ru/api/video/person/{self.RUTUBE_CHANNEL}/?page={page + 1}&format=json'
+            return 200, 'application/json', json.dumps({'results': results, 'has_next': has_next,
+                                                        'next': next_url if has_next else None})
+        return None
+
+# HTTP-сервер в фоновом потоке. latency — задержка каждого ответа (с),
+# throttle — доля запросов, на которые отвечаем 429.
+class ReplayServer:
+    def __init__(self, recording=None, site=None, latency=0.0, throttle=0.0, seed=0):
+        self.recording = recording
+        self.site = site
+        self.latency = latency
+        self.throttle = throttle
+        self.requests = 0
+        self.throttled = 0
+        self.missing = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    def respond(self, method, path, body):
+        with self._lock:
+            self.requests += 1
+            throttled = self._random.random() < self.throttle
+            if throttled:
+                self.throttled += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            return 429, 'text/plain', 'Too Many Requests'
+        response = None
+        if self.recording is not None:
+            response = self.recording.lookup(method, path, body)
+        if response is None and self.site is not None:
+            response = self.site.respond(method, path, body)
+        if response is None:
+            with self._lock:
+                self.missing += 1
+            return 404, 'text/plain', 'Not recorded'
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'throttled': self.throttled, 'missing': self.missing}
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def handle_request(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                status, content_type, text = server.respond(method, self.path, body)
+                data = text.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self.handle_request('GET')
+
+            def do_POST(self):
+                self.handle_request('POST')
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+# Перенаправляем запросы listing.py и scrapetube на сервер
+def install_replay(base_url):
+    listing.LISTING_BASE_URLS.update({'youtube': base_url, 'vk': base_url, 'rutube': base_url})
+
+    original = scrapetube.scrapetube.get_session
+
+    def get_session(proxies=None):
+        session = original(proxies)
+        request = session.request
+
+        def replay_request(method, url, *args, **kwargs):
+            if url.startswith(YOUTUBE_BASE_URL):
+                url = base_url + url[len(YOUTUBE_BASE_URL):]
+            return request(method, url, *args, **kwargs)
+
+        session.request = replay_request
+        return session
+
+    scrapetube.scrapetube.get_session = get_session
+
+# Записываем настоящие ответы, которые получают listing.py и scrapetube
+def install_recorder(recording):
+    original_fetch = listing.fetch
+
+    def fetch(platform, url, data=None, headers=None, json_data=None):
+        text = original_fetch(platform, url, data, headers, json_data)
+        if json_data is not None:
+            body = json.dumps(json_data).encode()
+        else:
+            body = urllib.parse.urlencode(data).encode() if data is not None else None
+        content_type = 'application/json' if text.lstrip().startswith(('{', '[', '<!--')) else 'text/html'
+        recording.add('POST' if body is not None else 'GET', url, body, 200, content_type, text)
+        return text
+
+    listing.fetch = fetch
+
+    original = scrapetube.scrapetube.get_session
+
+    def get_session(proxies=None):
+        session = original(proxies)
+        request = session.request
+
+        def recording_request(method, url, *args, **kwargs):
+            response = request(method, url, *args, **kwargs)
+            content_type = response.headers.get('Content-Type', 'text/html').split(';')[0]
+            recording.add(method, response.request.url, response.request.body,
+                          response.status_code, content_type, response.text)
+            return response
+
+        session.request = recording_request
+        return session
+
+    scrapetube.scrapetube.get_session = get_session
+
+def load_fixtures(directory):
+    recording = Recording.load(os.path.join(directory, RESPONSES_FILE))
+    with open(os.path.join(directory, SOURCES_FILE), encoding='utf-8') as f:
+        sources = [tuple(source) for source in json.load(f)]
+    return recording, sources
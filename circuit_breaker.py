@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import deque
+
+from metrics import get_metrics
+
+# Автомат отключения (circuit breaker) полных запросов к платформе: если среди последних
+# BREAKER_WINDOW запросов (но не меньше BREAKER_MIN_REQUESTS) доля ошибок достигает
+# BREAKER_ERROR_RATE, запросы приостанавливаются на BREAKER_COOLDOWN секунд.
+# После паузы пропускается один пробный запрос: успех снова открывает доступ, ошибка —
+# продлевает паузу.
+BREAKER_WINDOW = 20
+BREAKER_MIN_REQUESTS = 5
+BREAKER_ERROR_RATE = 0.5
+BREAKER_COOLDOWN = 30
+
+# Запрос не выполнялся: платформа на паузе после серии ошибок
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    def __init__(self, window=BREAKER_WINDOW, min_requests=BREAKER_MIN_REQUESTS,
+                 error_rate=BREAKER_ERROR_RATE, cooldown=BREAKER_COOLDOWN, platform=None):
+        self.platform = platform
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.trips = 0
+        self.rejected = 0
+        self._results = deque(maxlen=window)
+        self._open_until = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    # Можно ли выполнить запрос сейчас; во время паузы — нет, после неё — один пробный
+    def allow(self):
+        with self._lock:
+            if self._open_until is None:
+                return True
+            if self._probing or time.monotonic() < self._open_until:
+                self.rejected += 1
+                return False
+            self._probing = True
+            return True
+
+    # Сколько секунд осталось до конца паузы
+    def remaining(self):
+        with self._lock:
+            if self._open_until is None:
+                return 0.0
+            return max(0.0, self._open_until - time.monotonic())
+
+    # Результат запроса. Повторы (retry=True) не учитываются в доле ошибок, чтобы одно
+    # битое видео, которое повторяется несколько раз, не ставило на паузу всю платформу.
+    def record(self, ok, retry=False):
+        with self._lock:
+            if self._open_until is not None:
+                # Результат пробного запроса
+                if not self._probing:
+                    return
+                self._probing = False
+                if ok:
+                    self._open_until = None
+                    self._results.clear()
+                else:
+                    self._trip()
+                return
+            if retry:
+                return
+            self._results.append(ok)
+            failures = self._results.count(False)
+            if len(self._results) >= self.min_requests and failures >= self.error_rate * len(self._results):
+                self._trip()
+
+    def _trip(self):
+        self._open_until = time.monotonic() + self.cooldown
+        self._results.clear()
+        self.trips += 1
+        if self.platform:
+            get_metrics().inc('circuit_breaks_total', platform=self.platform)
+        print(f"⚠️ {self.platform or 'platform'}: too many failed requests, pausing for {self.cooldown} s")
+
+    def stats(self):
+        with self._lock:
+            return {'trips': self.trips, 'rejected': self.rejected, 'open': self._open_until is not None}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+# Возвращает общий автомат отключения для платформы (создаётся при первом обращении)
+def get_breaker(platform):
+    with _breakers_lock:
+        breaker = _breakers.get(platform)
+        if breaker is None:
+            breaker = _breakers[platform] = CircuitBreaker(platform=platform)
+        return breaker
+
+def breaker_stats():
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {platform: breaker.stats() for platform, breaker in breakers.items()}
@@ -0,0 +1,234 @@
+# Запуск без диалога (cron, планировщик, воркеры):
+#
+#   python cli.py crawl https://youtube.com/@garchenmoscow https://rutube.ru/channel/31787118/videos/
+#   python cli.py crawl -i channels.txt -o videos.csv --workers vk=2 --resume
+#   python cli.py cache stats
+#
+# Распределённый обход через общую очередь заданий:
+#
+#   python cli.py submit --queue /mnt/shared/queue.sqlite -i channels.txt   # печатает RUN_ID
+#   python cli.py worker --queue /mnt/shared/queue.sqlite                   # на каждой машине
+#   python cli.py collect RUN_ID --queue /mnt/shared/queue.sqlite -o videos.xlsx
+#   python cli.py crawl -i channels.txt --queue crawl_queue.sqlite --local-workers 4
+#
+# Резидентный режим: демон держит модули, экстракторы и кэши загруженными,
+# а задания ему отправляет лёгкий client.py:
+#
+#   python cli.py daemon --listen unix:///tmp/video_parser.sock
+#
+# Код завершения: 0 — результат сохранён (или новых видео нет), 1 — ошибка (в том числе если
+# не удалось обойти хотя бы одну ссылку), 2 — неверные аргументы.
+import argparse
+import importlib
+import os
+import sys
+
+from client import DAEMON_ADDRESS, DAEMON_TOKEN_FILE, collect_urls, parse_address
+from crawl import SOURCE_WORKERS
+from daemon import serve
+from distributed import collect_crawl, crawl_distributed, run_worker, submit_crawl
+from enrichment import ENRICH_WORKERS
+from job_queue import JOB_QUEUE_FILE, LEASE_SECONDS, open_queue
+from metadata_cache import CACHE_FILE, MetadataCache
+from metrics import METRICS_FILE
+from pipeline import EXIT_FAILED, EXIT_OK, OUTPUT_FILE, run_crawl
+from writers import WRITERS
+
+# Разбор значений вида vk=4 для --workers и --source-workers
+def platform_count(platforms):
+    def parse(value):
+        platform, sep, count = value.partition('=')
+        if not sep or platform not in platforms or not count.isdigit() or int(count) < 1:
+            raise argparse.ArgumentTypeError(f"expected PLATFORM=N ({', '.join(platforms)}), got '{value}'")
+        return platform, int(count)
+    return parse
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='Collect YouTube, VK and RuTube video links into one table')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    crawl = commands.add_parser('crawl', help='parse channels and playlists and save the merged table')
+    crawl.add_argument('urls', nargs='*', metavar='URL', help='channel or playlist URLs (space or comma separated)')
+    crawl.add_argument('-i', '--input-file', action='append', default=[], metavar='FILE',
+                       help='file with one URL per line; can be repeated')
+    crawl.add_argument('-o', '--output', default=OUTPUT_FILE, help=f'output file (default: {OUTPUT_FILE})')
+    crawl.add_argument('--format', choices=list(WRITERS), help='output format (default: from the file extension)')
+    crawl.add_argument('--resume', action='store_true', help='continue an interrupted run from the crawl journal')
+    crawl.add_argument('--full', action='store_true', help='ignore sync state and crawl every video again')
+    crawl.add_argument('--workers', type=platform_count(list(ENRICH_WORKERS)), action='append', default=[], metavar='PLATFORM=N',
+                       help='metadata workers per platform, e.g. vk=2')
+    crawl.add_argument('--source-workers', type=platform_count(list(SOURCE_WORKERS)), action='append', default=[], metavar='PLATFORM=N',
+                       help='URLs of one platform parsed at once, e.g. youtube=4')
+    crawl.add_argument('--cache', default=CACHE_FILE, metavar='PATH', help=f'metadata cache file (default: {CACHE_FILE})')
+    crawl.add_argument('--metrics', default=METRICS_FILE, metavar='PATH', help=f'run metrics as JSON (default: {METRICS_FILE})')
+    crawl.add_argument('--prometheus', metavar='PATH', help='also write metrics in Prometheus text format')
+    crawl.add_argument('-v', '--verbose', action='store_true', help='detailed logs instead of progress bars')
+
+    crawl.add_argument('--queue', metavar='QUEUE', help='run through a shared job queue (path or sqlite://path)')
+    crawl.add_argument('--local-workers', type=int, default=0, metavar='N',
+                       help='with --queue: start N worker processes on this machine')
+
+    submit = commands.add_parser('submit', help='put URLs into a shared job queue for workers and print the run id')
+    submit.add_argument('urls', nargs='*', metavar='URL', help='channel or playlist URLs (space or comma separated)')
+    submit.add_argument('-i', '--input-file', action='append', default=[], metavar='FILE',
+                        help='file with one URL per line; can be repeated')
+    submit.add_argument('-o', '--output', default=OUTPUT_FILE, help='output file the run will be merged into (for incremental sync)')
+    submit.add_argument('--full', action='store_true', help='ignore sync state and crawl every video again')
+    submit.add_argument('--workers', type=platform_count(list(ENRICH_WORKERS)), action='append', default=[], metavar='PLATFORM=N',
+                        help='metadata workers per platform, e.g. vk=2')
+    submit.add_argument('-v', '--verbose', action='store_true', help='detailed logs')
+
+    worker = commands.add_parser('worker', help='take jobs from a shared job queue and parse them')
+    worker.add_argument('--platform', action='append', choices=list(SOURCE_WORKERS), metavar='PLATFORM',
+                        help='only take jobs of this platform; can be repeated')
+    worker.add_argument('--once', action='store_true', help='exit when the queue is empty instead of waiting for jobs')
+    worker.add_argument('--lease', type=int, default=LEASE_SECONDS, metavar='SECONDS',
+                        help=f'job lease, renewed while the job runs (default: {LEASE_SECONDS})')
+    worker.add_argument('--source-workers', type=platform_count(list(SOURCE_WORKERS)), action='append', default=[], metavar='PLATFORM=N',
+                        help='jobs of one platform run at once, e.g. youtube=4')
+    worker.add_argument('--cache', default=CACHE_FILE, metavar='PATH', help=f'metadata cache file (default: {CACHE_FILE})')
+    worker.add_argument('--metrics', metavar='PATH', help='write worker metrics as JSON on exit')
+    worker.add_argument('-v', '--verbose', action='store_true', help='detailed logs instead of progress bars')
+
+    collect = commands.add_parser('collect', help='wait for a queued run and save the merged table')
+    collect.add_argument('run_id', metavar='RUN_ID')
+    collect.add_argument('-o', '--output', default=OUTPUT_FILE, help=f'output file (default: {OUTPUT_FILE})')
+    collect.add_argument('--format', choices=list(WRITERS), help='output format (default: from the file extension)')
+    collect.add_argument('--full', action='store_true', help='rewrite the output file instead of adding new rows')
+    collect.add_argument('--no-wait', action='store_true', help='fail instead of waiting if jobs are still running')
+    collect.add_argument('--keep', action='store_true', help='keep jobs and results in the queue after saving')
+    collect.add_argument('-v', '--verbose', action='store_true', help='detailed logs and progress')
+
+    for command in (submit, worker, collect):
+        command.add_argument('--queue', default=JOB_QUEUE_FILE, metavar='QUEUE',
+                             help=f'shared job queue, path or sqlite://path (default: {JOB_QUEUE_FILE})')
+
+    daemon = commands.add_parser('daemon', help='keep modules and caches loaded and serve crawl jobs for client.py')
+    daemon.add_argument('--listen', default=DAEMON_ADDRESS, metavar='ADDRESS',
+                        help=f'http://host:port or unix:///path (default: {DAEMON_ADDRESS})')
+    daemon.add_argument('--cache', default=CACHE_FILE, metavar='PATH', help=f'metadata cache file (default: {CACHE_FILE})')
+    daemon.add_argument('--token-file', default=DAEMON_TOKEN_FILE, metavar='PATH',
+                        help=f'where to write the API access token for clients (default: {DAEMON_TOKEN_FILE})')
+    daemon.add_argument('-v', '--verbose', action='store_true', help='log API requests and job errors')
+
+    cache = commands.add_parser('cache', help='inspect or trim the metadata cache')
+    cache.add_argument('action', choices=['stats', 'evict'])
+    cache.add_argument('--cache', default=CACHE_FILE, metavar='PATH', help=f'metadata cache file (default: {CACHE_FILE})')
+    return parser
+
+def get_urls(args, parser):
+    try:
+        urls = collect_urls(args.urls, args.input_file)
+    except OSError as e:
+        parser.error(f"can't read input file: {e}")
+    if not urls:
+        parser.error('no URLs given (pass them as arguments or with --input-file)')
+    return urls
+
+def get_queue(args, parser):
+    try:
+        return open_queue(args.queue)
+    except ValueError as e:
+        parser.error(str(e))
+
+# Подробный вывод — парсеры parser.py, иначе — с прогресс-барами из parser_percentages.py
+def load_parsers(verbose):
+    return importlib.import_module('parser' if verbose else 'parser_percentages').PARSERS
+
+def run_crawl_command(args, parser):
+    urls = get_urls(args, parser)
+    if args.queue:
+        if args.resume:
+            parser.error('--resume is not supported with --queue (failed jobs are retried by the queue)')
+        queue = get_queue(args, parser)
+        try:
+            return crawl_distributed(
+                urls, queue, args.queue,
+                local_workers=args.local_workers,
+                output_file=args.output,
+                output_format=args.format,
+                incremental=not args.full,
+                enrich_workers=dict(args.workers) or None,
+                source_workers=dict(args.source_workers) or None,
+                cache_file=args.cache,
+                metrics_file=args.metrics,
+                prometheus_file=args.prometheus,
+                verbose=args.verbose,
+            )
+        finally:
+            queue.close()
+    if args.local_workers:
+        parser.error('--local-workers requires --queue')
+
+    parsers = load_parsers(args.verbose)
+    return run_crawl(
+        urls, parsers,
+        output_file=args.output,
+        output_format=args.format,
+        incremental=not args.full,
+        resume=args.resume,
+        verbose=args.verbose,
+        source_workers=dict(args.source_workers) or None,
+        enrich_workers=dict(args.workers) or None,
+        cache_file=args.cache,
+        metrics_file=args.metrics,
+        prometheus_file=args.prometheus,
+    )
+
+def run_queue_command(args, parser):
+    urls = get_urls(args, parser) if args.command == 'submit' else None
+    queue = get_queue(args, parser)
+    try:
+        if args.command == 'submit':
+            run_id = submit_crawl(queue, urls, output_file=args.output, incremental=not args.full,
+                                  enrich_workers=dict(args.workers) or None, verbose=args.verbose)
+            print(run_id)
+            return EXIT_OK
+        if args.command == 'worker':
+            run_worker(queue, load_parsers(args.verbose), platforms=args.platform, once=args.once,
+                       lease_seconds=args.lease, source_workers=dict(args.source_workers) or None, cache_file=args.cache, metrics_file=args.metrics,
+                       verbose=args.verbose)
+            return EXIT_OK
+        return collect_crawl(queue, args.run_id, output_file=args.output, output_format=args.format,
+                             incremental=not args.full, wait=not args.no_wait, keep=args.keep,
+                             verbose=args.verbose)
+    finally:
+        queue.close()
+
+def run_cache_command(args):
+    if not os.path.exists(args.cache):
+        print(f"❌ Cache file {args.cache} not found")
+        return EXIT_FAILED
+    cache = MetadataCache(args.cache)
+    try:
+        if args.action == 'evict':
+            expired = cache.expire()
+            evicted = cache.evict()
+            print(f"✅ Removed {expired} expired and {evicted} least recently used entries from {args.cache}")
+        else:
+            stats = cache.stats()
+            print(f"{args.cache}: {sum(stats.values())} entries, {os.path.getsize(args.cache)} bytes")
+            for platform, count in stats.items():
+                print(f"  {platform}: {count}")
+    finally:
+        cache.close()
+    return EXIT_OK
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'crawl':
+        return run_crawl_command(args, parser)
+    if args.command in ('submit', 'worker', 'collect'):
+        return run_queue_command(args, parser)
+    if args.command == 'daemon':
+        try:
+            parse_address(args.listen)
+        except ValueError as e:
+            parser.error(str(e))
+        serve(args.listen, args.cache, args.token_file, args.verbose)
+        return EXIT_OK
+    return run_cache_command(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+# Лёгкий клиент демона (python cli.py daemon): только стандартная библиотека,
+# поэтому запускается мгновенно — yt_dlp, openpyxl и кэши уже загружены в демоне.
+#
+#   python client.py crawl https://vkvideo.ru/@garchenmoscow/all -o videos.xlsx
+#   python client.py lookup https://rutube.ru/channel/31787118/videos/
+#   python client.py status
+#   python client.py stop
+#
+# Код завершения такой же, как у cli.py: 0 — успех, 1 — ошибка (или демон недоступен), 2 — неверные аргументы.
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import time
+import urllib.parse
+
+# Адрес демона: http://host:port или unix:///path/to/socket
+DAEMON_ADDRESS = 'http://127.0.0.1:8765'
+
+# Токен доступа к API: демон при запуске записывает случайный токен в этот файл
+# (читать его может только пользователь демона), клиент отправляет его в заголовке Authorization
+DAEMON_TOKEN_FILE = os.path.join(os.path.expanduser('~'), '.video_parser_daemon_token')
+
+# Если демон запущен, parser.py и parser_percentages.py отправляют обход ему
+USE_DAEMON = True
+
+# Как часто клиент спрашивает о ходе задания (секунды)
+POLL_INTERVAL = 0.2
+
+# Таймаут одного запроса к демону; проверка доступности — короче
+REQUEST_TIMEOUT = 60
+CONNECT_TIMEOUT = 0.5
+
+class DaemonError(Exception):
+    pass
+
+# ('unix', path) или ('tcp', host, port)
+def parse_address(address):
+    if address.startswith('unix://'):
+        return 'unix', address[len('unix://'):]
+    parts = urllib.parse.urlsplit(address if '://' in address else 'http://' + address)
+    if parts.scheme != 'http' or not parts.hostname:
+        raise ValueError(f"Unsupported daemon address '{address}' (expected http://host:port or unix:///path)")
+    return 'tcp', parts.hostname, parts.port or 80
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def connect(address, timeout):
+    kind, *target = parse_address(address)
+    if kind == 'unix':
+        return UnixHTTPConnection(target[0], timeout)
+    return http.client.HTTPConnection(target[0], target[1], timeout=timeout)
+
+def read_token(token_file=DAEMON_TOKEN_FILE):
+    try:
+        with open(token_file, encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+# Запрос к API демона; ответ — JSON. Ошибки соединения и ответы 4xx/5xx — DaemonError.
+def call(address, method, path, payload=None, timeout=REQUEST_TIMEOUT, token_file=DAEMON_TOKEN_FILE):
+    headers = {}
+    token = read_token(token_file)
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    if payload is not None:
+        headers['Content-Type'] = 'application/json'
+    conn = connect(address, timeout)
+    try:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        conn.request(method, path, body, headers)
+        response = conn.getresponse()
+        data = json.loads(response.read().decode('utf-8') or 'null')
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        raise DaemonError(f"daemon at {address} is not available: {e}")
+    finally:
+        conn.close()
+    if response.status >= 400:
+        raise DaemonError((data or {}).get('error', f'HTTP {response.status}'))
+    return data
+
+def daemon_running(address=DAEMON_ADDRESS, token_file=DAEMON_TOKEN_FILE):
+    try:
+        return call(address, 'GET', '/health', timeout=CONNECT_TIMEOUT, token_file=token_file).get('status') == 'ok'
+    except (DaemonError, ValueError):
+        return False
+
+# Ссылки из аргументов (через пробел или запятую) и из файлов: по одной на строку,
+# пустые строки и строки с # пропускаются
+def collect_urls(args, input_files):
+    urls = []
+    for arg in args:
+        urls.extend(url.strip() for url in arg.split(','))
+    for input_file in input_files:
+        with open(input_file, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    urls.append(line)
+    # Убираем пустые строки и повторы, сохраняя порядок
+    return list(dict.fromkeys(url for url in urls if url))
+
+# Ставим обход в очередь демона и ждём результата, печатая его вывод.
+# Относительные пути (результат, метрики, состояние синхронизации) считаются
+# от текущего каталога клиента. Возвращает код завершения обхода.
+def run_remote_crawl(address, urls, wait=True, token_file=DAEMON_TOKEN_FILE, **options):
+    job = call(address, 'POST', '/crawl', dict(options, urls=urls, cwd=os.getcwd()), token_file=token_file)
+    if not wait:
+        print(job['id'])
+        return 0
+    shown = 0
+    while True:
+        job = call(address, 'GET', f"/jobs/{job['id']}?since={shown}", token_file=token_file)
+        for line in job['log']:
+            print(line, end='')
+        shown += len(job['log'])
+        if job['state'] in ('done', 'failed'):
+            break
+        time.sleep(POLL_INTERVAL)
+    if job['state'] == 'failed':
+        print(f"❌ Crawl failed in the daemon: {job['error']}")
+        return 1
+    return job['exit_code']
+
+# Для интерактивных скриптов: отправляем обход демону, если он запущен.
+# Возвращает код завершения или None, если демона нет и обход надо выполнить локально.
+def crawl_via_daemon(urls, address=DAEMON_ADDRESS, **options):
+    if not USE_DAEMON or not daemon_running(address):
+        return None
+    print(f"Sending the crawl to the daemon at {address}")
+    try:
+        return run_remote_crawl(address, urls, **options)
+    except DaemonError as e:
+        print(f"❌ {e}")
+        return 1
+
+# Разбор значений вида vk=4 для --workers и --source-workers (проверяет демон)
+def platform_count(value):
+    platform, sep, count = value.partition('=')
+    if not sep or not count.isdigit() or int(count) < 1:
+        raise argparse.ArgumentTypeError(f"expected PLATFORM=N, got '{value}'")
+    return platform, int(count)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='client.py', description='Send crawl jobs to a running video parser daemon')
+    parser.add_argument('--daemon', default=DAEMON_ADDRESS, metavar='ADDRESS',
+                        help=f'daemon address, http://host:port or unix:///path (default: {DAEMON_ADDRESS})')
+    parser.add_argument('--token-file', default=DAEMON_TOKEN_FILE, metavar='PATH',
+                        help=f'file with the daemon access token (default: {DAEMON_TOKEN_FILE})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    crawl = commands.add_parser('crawl', help='parse channels and playlists and save the merged table')
+    crawl.add_argument('urls', nargs='*', metavar='URL', help='channel or playlist URLs (space or comma separated)')
+    crawl.add_argument('-i', '--input-file', action='append', default=[], metavar='FILE',
+                       help='file with one URL per line; can be repeated')
+    crawl.add_argument('-o', '--output', help='output file (default: the daemon default, in the current directory)')
+    crawl.add_argument('--format', help='output format (default: from the file extension)')
+    crawl.add_argument('--resume', action='store_true', help='continue an interrupted run from the crawl journal')
+    crawl.add_argument('--full', action='store_true', help='ignore sync state and crawl every video again')
+    crawl.add_argument('--workers', type=platform_count, action='append', default=[], metavar='PLATFORM=N',
+                       help='metadata workers per platform, e.g. vk=2')
+    crawl.add_argument('--source-workers', type=platform_count, action='append', default=[], metavar='PLATFORM=N',
+                       help='URLs of one platform parsed at once, e.g. youtube=4')
+    crawl.add_argument('--metrics', metavar='PATH', help='run metrics as JSON')
+    crawl.add_argument('--prometheus', metavar='PATH', help='also write metrics in Prometheus text format')
+    crawl.add_argument('--no-wait', action='store_true', help='print the job id and exit without waiting')
+    crawl.add_argument('-v', '--verbose', action='store_true', help='detailed logs')
+
+    lookup = commands.add_parser('lookup', help='list the videos of one channel or playlist as JSON lines, without saving')
+    lookup.add_argument('url', metavar='URL')
+
+    status = commands.add_parser('status', help='daemon status, or the state of one job')
+    status.add_argument('job_id', nargs='?', metavar='JOB_ID')
+
+    commands.add_parser('stop', help='stop the daemon after the running job')
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        parse_address(args.daemon)
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        if args.command == 'crawl':
+            try:
+                urls = collect_urls(args.urls, args.input_file)
+            except OSError as e:
+                parser.error(f"can't read input file: {e}")
+            if not urls:
+                parser.error('no URLs given (pass them as arguments or with --input-file)')
+            options = {
+                'output': args.output, 'format': args.format, 'resume': args.resume, 'full': args.full,
+                'workers': dict(args.workers), 'source_workers': dict(args.source_workers),
+                'metrics': args.metrics, 'prometheus': args.prometheus, 'verbose': args.verbose,
+            }
+            return run_remote_crawl(args.daemon, urls, wait=not args.no_wait, token_file=args.token_file,
+                                    **{key: value for key, value in options.items() if value})
+        if args.command == 'lookup':
+            result = call(args.daemon, 'POST', '/lookup', {'url': args.url}, token_file=args.token_file)
+            for video in result['videos']:
+                print(json.dumps(video, ensure_ascii=False))
+            return 0
+        if args.command == 'status':
+            path = f'/jobs/{args.job_id}' if args.job_id else '/health'
+            print(json.dumps(call(args.daemon, 'GET', path, token_file=args.token_file), ensure_ascii=False, indent=1))
+            return 0
+        call(args.daemon, 'POST', '/shutdown', {}, token_file=args.token_file)
+        print(f"✅ Daemon at {args.daemon} is stopping")
+        return 0
+    except DaemonError as e:
+        print(f"❌ {e}")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
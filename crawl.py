@@ -0,0 +1,102 @@
+import queue
+import re
+import threading
+
+from job_context import ContextThreadPoolExecutor
+
+# Сколько ссылок одной платформы обрабатывается одновременно
+SOURCE_WORKERS = {
+    'youtube': 2,
+    'vk': 1,
+    'rutube': 1,
+}
+# Сколько записей может ждать обработки, прежде чем парсеры притормозят
+STREAM_QUEUE_SIZE = 1000
+
+# Функция для определения платформы по URL
+def detect_platform(url):
+    if 'youtube.com' in url or 'youtu.be' in url:
+        return 'youtube'
+    elif 'vkvideo.ru' in url or 'vk.com' in url:
+        return 'vk'
+    elif 'rutube.ru' in url:
+        return 'rutube'
+    return None
+
+# ID канала YouTube из ссылки вида youtube.com/channel/UC...; None для @handle и прочих ссылок
+YOUTUBE_CHANNEL_RE = re.compile(r'youtube\.com/channel/(UC[\w-]{22})')
+
+def youtube_channel_id(url):
+    match = YOUTUBE_CHANNEL_RE.search(url)
+    return match.group(1) if match else None
+
+# Ошибка обхода ссылки целиком (не удалось получить канал или плейлист). Парсеры
+# поднимают её, а не завершаются молча, чтобы ссылка не считалась обойденной:
+# iter_sources не отмечает её выполненной, а воркер возвращает задание в очередь.
+class SourceError(Exception):
+    pass
+
+_DONE = object()
+_FAILED = object()
+
+# Параллельный запуск парсеров: одна задача (platform, url, parse, kwargs) на ссылку,
+# у каждой платформы свой пул потоков. Парсеры — генераторы; записи отдаются
+# по мере поступления в виде (номер задачи, запись), чтобы их можно было
+# объединять и сохранять, не дожидаясь конца обхода.
+# on_done(index) вызывается в потоке потребителя, когда парсер задачи завершился без ошибки,
+# on_failed(index, error) — когда парсер упал (записи, отданные до ошибки, уже выданы).
+def iter_sources(tasks, source_workers=None, queue_size=STREAM_QUEUE_SIZE, on_done=None, on_failed=None):
+    caps = dict(SOURCE_WORKERS, **(source_workers or {}))
+    records = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = {}
+
+    # Кладём в очередь, но не зависаем, если потребитель уже остановился
+    def put(item):
+        while not stop.is_set():
+            try:
+                records.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(index, url, parse, kwargs):
+        if stop.is_set():
+            return
+        status = _FAILED
+        try:
+            for record in parse(url, **kwargs):
+                if not put((index, record)):
+                    return
+            status = _DONE
+        except Exception as e:
+            print(f"❌ Error parsing {url}: {e}")
+            errors[index] = e
+        finally:
+            put((index, status))
+
+    executors = {}
+    try:
+        for index, (platform, url, parse, kwargs) in enumerate(tasks):
+            executor = executors.get(platform)
+            if executor is None:
+                executor = ContextThreadPoolExecutor(max_workers=max(1, caps.get(platform, 1)))
+                executors[platform] = executor
+            executor.submit(run, index, url, parse, kwargs)
+
+        remaining = len(tasks)
+        while remaining:
+            index, record = records.get()
+            if record is _DONE or record is _FAILED:
+                remaining -= 1
+                if record is _DONE and on_done is not None:
+                    on_done(index)
+                elif record is _FAILED and on_failed is not None:
+                    on_failed(index, errors.get(index))
+                continue
+            yield index, record
+    finally:
+        stop.set()
+        for executor in executors.values():
+            executor.shutdown(wait=True)
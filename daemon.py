@@ -0,0 +1,410 @@
+import contextvars
+import hmac
+import importlib
+import io
+import json
+import os
+import secrets
+import socketserver
+import tempfile
+import threading
+import time
+import traceback
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from client import DAEMON_ADDRESS, DAEMON_TOKEN_FILE, parse_address, read_token
+from crawl import detect_platform
+from enrichment import scope_unresolved
+from job_context import capture_output, install_stdout, uninstall_stdout
+from journal import JOURNAL_FILE
+from listing import get_opener
+from metadata_cache import CACHE_FILE, close_cache, get_cache
+from metrics import METRICS_FILE, get_metrics, scope_metrics
+from pipeline import EXIT_FAILED, EXIT_OK, OUTPUT_FILE, run_crawl
+from sync_state import SYNC_STATE_FILE
+from writers import WRITERS
+
+# Резидентный режим: процесс один раз загружает yt_dlp, openpyxl, cookies.txt и кэши
+# и принимает задания по локальному HTTP API (см. client.py). Пул экстракторов,
+# HTTP-сессии, кэш метаданных и подобранные ограничителями частоты сохраняются
+# между заданиями.
+#
+#   GET  /health               состояние демона
+#   POST /crawl                поставить обход в очередь: {"urls": [...], "cwd": ..., "output": ..., ...}
+#   GET  /jobs                 последние задания
+#   GET  /jobs/<id>?since=N    состояние задания и строки его вывода, начиная с N-й
+#   POST /lookup               {"url": ...} — видео одной ссылки сразу в ответе, без сохранения
+#   POST /shutdown             остановиться после текущего задания
+#
+# Задание пишет файлы (результат, метрики, состояние) по путям клиента, поэтому API
+# доступно только клиентам с токеном из файла DAEMON_TOKEN_FILE (client.py). Запросы
+# со страниц браузера отклоняются: у них есть заголовок Origin, а POST принимается
+# только с Content-Type: application/json, который браузер без предварительного
+# запроса CORS (на него демон не отвечает) не отправит.
+
+# Сколько завершённых заданий помнит демон
+MAX_FINISHED_JOBS = 100
+
+# Вывод задания: строки print() во время обхода, доступные клиенту по мере появления
+class JobLog(io.TextIOBase):
+    def __init__(self):
+        self.lines = []
+        self._partial = ''
+        self._lock = threading.Lock()
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        with self._lock:
+            *lines, self._partial = (self._partial + text).split('\n')
+            self.lines.extend(line + '\n' for line in lines)
+        return len(text)
+
+    def since(self, index):
+        with self._lock:
+            return self.lines[index:]
+
+    def flush_partial(self):
+        with self._lock:
+            if self._partial:
+                self.lines.append(self._partial + '\n')
+                self._partial = ''
+
+class Job:
+    def __init__(self, options):
+        self.id = uuid.uuid4().hex[:12]
+        self.options = options
+        self.state = 'queued'
+        self.exit_code = None
+        self.error = None
+        self.output = None
+        self.summary = None
+        self.log = JobLog()
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def describe(self, since=0):
+        return {
+            'id': self.id,
+            'state': self.state,
+            'urls': self.options['urls'],
+            'output': self.output,
+            'exit_code': self.exit_code,
+            'error': self.error,
+            'summary': self.summary,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'log': self.log.since(since),
+        }
+
+# Путь из задания: относительные пути считаются от каталога клиента
+def client_path(options, key, default):
+    path = options.get(key) or default
+    if path is None:
+        return None
+    return os.path.join(options['cwd'], os.path.expanduser(path))
+
+def pairs(value, name):
+    if not isinstance(value, dict) or not all(isinstance(count, int) and count > 0 for count in value.values()):
+        raise ValueError(f"'{name}' must map platforms to positive numbers")
+    return value or None
+
+# Проверяем задание обхода и дополняем его значениями по умолчанию
+def crawl_options(payload):
+    urls = payload.get('urls')
+    if not isinstance(urls, list) or not urls or not all(isinstance(url, str) for url in urls):
+        raise ValueError("'urls' must be a non-empty list of URLs")
+    cwd = payload.get('cwd') or os.getcwd()
+    if not os.path.isabs(cwd):
+        raise ValueError("'cwd' must be an absolute path")
+    output_format = payload.get('format')
+    if output_format is not None and output_format not in WRITERS:
+        raise ValueError(f"unsupported format '{output_format}' (supported: {', '.join(WRITERS)})")
+    return {
+        'urls': urls,
+        'cwd': cwd,
+        'output': payload.get('output'),
+        'format': output_format,
+        'resume': bool(payload.get('resume')),
+        'full': bool(payload.get('full')),
+        'workers': pairs(payload.get('workers') or {}, 'workers'),
+        'source_workers': pairs(payload.get('source_workers') or {}, 'source_workers'),
+        'metrics': payload.get('metrics'),
+        'prometheus': payload.get('prometheus'),
+        'verbose': bool(payload.get('verbose')),
+    }
+
+# Обход или /lookup в отдельном контексте: свои метрики и список незагруженных видео,
+# а print() этого потока и запущенных из него потоков пишет в log (None — в консоль демона).
+# Задания и запросы выполняются параллельно и не видят данных друг друга.
+def run_scoped(func, log=None):
+    def scoped():
+        scope_metrics()
+        scope_unresolved()
+        if log is not None:
+            capture_output(log)
+        return func()
+    return contextvars.copy_context().run(scoped)
+
+class CrawlDaemon:
+    def __init__(self, cache_file=CACHE_FILE, verbose=False):
+        self.cache_file = cache_file
+        self.verbose = verbose
+        self.started_at = time.time()
+        self.jobs = {}
+        self._queue = []
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._worker = threading.Thread(target=self._run_jobs, daemon=True)
+
+    # Загружаем всё, что иначе загружалось бы при каждом запуске
+    def warm_up(self):
+        self.parsers = {
+            True: importlib.import_module('parser').PARSERS,
+            False: importlib.import_module('parser_percentages').PARSERS,
+        }
+        get_opener()
+        get_cache(self.cache_file)
+        install_stdout()
+        self._worker.start()
+
+    def submit(self, payload):
+        job = Job(crawl_options(payload))
+        with self._condition:
+            if self._stopping:
+                raise RuntimeError('daemon is stopping')
+            self.jobs[job.id] = job
+            self._queue.append(job)
+            finished = [item for item in self.jobs.values() if item.finished_at]
+            for item in sorted(finished, key=lambda item: item.finished_at)[:-MAX_FINISHED_JOBS]:
+                del self.jobs[item.id]
+            self._condition.notify()
+        return job
+
+    def get(self, job_id):
+        with self._condition:
+            return self.jobs.get(job_id)
+
+    def health(self):
+        with self._condition:
+            states = [job.state for job in self.jobs.values()]
+        return {
+            'status': 'stopping' if self._stopping else 'ok',
+            'pid': os.getpid(),
+            'uptime': round(time.time() - self.started_at, 1),
+            'queued': states.count('queued'),
+            'running': states.count('running'),
+            'cache': get_cache(self.cache_file).path,
+        }
+
+    # Обходы выполняются по одному: ограничители запросов общие для процесса
+    def _run_jobs(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopping:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                job = self._queue.pop(0)
+                job.state = 'running'
+            self.run(job)
+
+    def run(self, job):
+        options = job.options
+        job.output = client_path(options, 'output', OUTPUT_FILE)
+        print(f"Job {job.id}: crawling {len(options['urls'])} URLs into {job.output}")
+        try:
+            job.exit_code, job.summary = run_scoped(lambda: self.crawl(job), job.log)
+            job.state = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.exit_code = EXIT_FAILED
+            job.state = 'failed'
+            if self.verbose:
+                traceback.print_exc()
+        finally:
+            job.log.flush_partial()
+            job.finished_at = time.time()
+        print(f"{'✅' if job.exit_code == EXIT_OK else '❌'} Job {job.id} finished with code {job.exit_code}")
+
+    # Выполняется в контексте задания (run_scoped); возвращает код завершения и сводку метрик
+    def crawl(self, job):
+        options = job.options
+        exit_code = run_crawl(
+            options['urls'], self.parsers[options['verbose']],
+            output_file=job.output,
+            output_format=options['format'],
+            incremental=not options['full'],
+            resume=options['resume'],
+            verbose=options['verbose'],
+            source_workers=options['source_workers'],
+            enrich_workers=options['workers'],
+            cache_file=self.cache_file,
+            state_file=client_path(options, 'state_file', SYNC_STATE_FILE),
+            journal_file=client_path(options, 'journal_file', JOURNAL_FILE),
+            metrics_file=client_path(options, 'metrics', METRICS_FILE),
+            prometheus_file=client_path(options, 'prometheus', None),
+            keep_cache=True,
+        )
+        return exit_code, get_metrics().snapshot()['summary']
+
+    # Видео одной ссылки без сохранения в файл; выполняется сразу, параллельно с обходами.
+    # Вывод парсера идёт в консоль демона, а не в журнал текущего обхода.
+    def lookup(self, payload):
+        url = payload.get('url')
+        platform = detect_platform(url) if isinstance(url, str) else None
+        if not platform:
+            raise ValueError(f"unsupported URL: {url}")
+        parse = self.parsers[False][platform]
+        videos = run_scoped(lambda: [dict(video) for video in parse(url)])
+        return {'platform': platform, 'url': url, 'videos': videos}
+
+    # Новые задания больше не принимаются; текущие и поставленные в очередь доделываются
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+    def close(self):
+        self.stop()
+        if self._worker.is_alive():
+            self._worker.join()
+        close_cache()
+        uninstall_stdout()
+
+# Новый токен доступа; файл создаётся с правами только для пользователя демона
+def write_token(token_file):
+    token = secrets.token_urlsafe(32)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(token_file)), prefix='.daemon_token')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token + '\n')
+    os.replace(temp_path, token_file)
+    return token
+
+def make_handler(daemon, token, token_file=DAEMON_TOKEN_FILE):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            if daemon.verbose:
+                print(f"{self.command} {self.path}")
+
+        def send_json(self, status, data):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # Ошибка доступа или None, если запрос можно выполнять
+        def rejected(self):
+            if self.headers.get('Origin') is not None:
+                return 403, 'requests from web pages are not allowed'
+            if not hmac.compare_digest(self.headers.get('Authorization', ''), f'Bearer {token}'):
+                return 401, f'missing or invalid token (see {token_file})'
+            if self.command == 'POST' and self.headers.get_content_type() != 'application/json':
+                return 415, 'request body must be application/json'
+            return None
+
+        # Тело отклонённого запроса не читаем, поэтому соединение закрываем
+        def reject(self):
+            error = self.rejected()
+            if error is None:
+                return False
+            self.close_connection = True
+            self.send_json(error[0], {'error': error[1]})
+            return True
+
+        def read_json(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length).decode('utf-8')) if length else {}
+            if not isinstance(payload, dict):
+                raise ValueError('request body must be a JSON object')
+            return payload
+
+        def do_GET(self):
+            if self.reject():
+                return
+            parts = urllib.parse.urlsplit(self.path)
+            if parts.path == '/health':
+                return self.send_json(200, daemon.health())
+            if parts.path == '/jobs':
+                with daemon._condition:
+                    jobs = list(daemon.jobs.values())
+                return self.send_json(200, [
+                    dict(job.describe(), log=[]) for job in sorted(jobs, key=lambda job: job.created_at)
+                ])
+            if parts.path.startswith('/jobs/'):
+                job = daemon.get(parts.path[len('/jobs/'):])
+                if job is None:
+                    return self.send_json(404, {'error': 'unknown job'})
+                since = urllib.parse.parse_qs(parts.query).get('since', ['0'])[0]
+                return self.send_json(200, job.describe(int(since) if since.isdigit() else 0))
+            self.send_json(404, {'error': f'unknown path {parts.path}'})
+
+        def do_POST(self):
+            if self.reject():
+                return
+            try:
+                payload = self.read_json()
+                if self.path == '/crawl':
+                    return self.send_json(202, daemon.submit(payload).describe())
+                if self.path == '/lookup':
+                    return self.send_json(200, daemon.lookup(payload))
+                if self.path == '/shutdown':
+                    self.send_json(202, {'status': 'stopping'})
+                    daemon.stop()
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    return
+            except ValueError as e:
+                return self.send_json(400, {'error': str(e)})
+            except Exception as e:
+                return self.send_json(500, {'error': f'{type(e).__name__}: {e}'})
+            self.send_json(404, {'error': f'unknown path {self.path}'})
+
+    return Handler
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    # BaseHTTPRequestHandler ожидает адрес клиента в виде (host, port)
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ('local', 0)
+
+def make_server(address, daemon, token, token_file=DAEMON_TOKEN_FILE):
+    kind, *target = parse_address(address)
+    handler = make_handler(daemon, token, token_file)
+    if kind == 'unix':
+        if os.path.exists(target[0]):
+            os.remove(target[0])
+        return UnixHTTPServer(target[0], handler)
+    server = ThreadingHTTPServer((target[0], target[1]), handler)
+    server.daemon_threads = True
+    return server
+
+# Запуск демона; возвращается после POST /shutdown или Ctrl+C
+def serve(address=DAEMON_ADDRESS, cache_file=CACHE_FILE, token_file=DAEMON_TOKEN_FILE, verbose=False):
+    daemon = CrawlDaemon(cache_file, verbose)
+    token = write_token(token_file)
+    server = make_server(address, daemon, token, token_file)
+    daemon.warm_up()
+    print(f"✅ Daemon listening on {address} (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.close()
+        kind, *target = parse_address(address)
+        if kind == 'unix' and os.path.exists(target[0]):
+            os.remove(target[0])
+        # Файл мог уже перезаписать другой демон
+        if read_token(token_file) == token:
+            os.remove(token_file)
+    print("Daemon stopped")
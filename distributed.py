@@ -0,0 +1,220 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from crawl import SOURCE_WORKERS
+from enrichment import clear_unresolved
+from job_queue import LEASE_SECONDS
+from merge import VideoMerger
+from metadata_cache import CACHE_FILE, close_cache, get_cache
+from metrics import METRICS_FILE, get_metrics
+from pipeline import (EXIT_FAILED, EXIT_OK, INCREMENTAL_SYNC, OUTPUT_FILE, plan_tasks, report_stats,
+                      save_metrics, save_results, timed)
+from rate_limiter import use_shared_limits
+from sync_state import SYNC_STATE_FILE, SyncState
+
+# Распределённый обход: координатор кладёт ссылки в очередь заданий (job_queue.py),
+# воркеры — процессы на этой или других машинах — берут задания в аренду, парсят
+# ссылки и возвращают записи в очередь, а координатор объединяет их и сохраняет результат.
+
+# Как часто воркер без заданий и координатор в ожидании опрашивают очередь (секунды)
+POLL_INTERVAL = 2
+
+# Кладём ссылки в очередь. В инкрементальном режиме вместе с заданием передаём
+# уже известные ID видео, чтобы воркер листал канал только до них. Возвращает run_id.
+def submit_crawl(queue, urls, output_file=OUTPUT_FILE, incremental=INCREMENTAL_SYNC,
+                 enrich_workers=None, state_file=SYNC_STATE_FILE, verbose=False):
+    incremental = incremental and os.path.exists(output_file)
+    sync_state = SyncState(state_file)
+    try:
+        tasks = plan_tasks(urls, sync_state, incremental, enrich_workers, verbose)
+    finally:
+        sync_state.close()
+    for platform, url, kwargs in tasks:
+        if kwargs['known_ids'] is not None:
+            kwargs['known_ids'] = sorted(kwargs['known_ids'])
+    return queue.submit(tasks)
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+# Пока задание выполняется, продлеваем его аренду в фоновом потоке
+def keep_leased(queue, job_id, worker, lease_seconds, stop):
+    while not stop.wait(lease_seconds / 3):
+        if not queue.heartbeat(job_id, worker, lease_seconds):
+            return
+
+# Выполняем одно задание: парсим ссылку и возвращаем записи в очередь.
+# Возвращает True, если результат принят очередью.
+def run_job(queue, parsers, job, worker, lease_seconds, verbose=False):
+    platform, url = job['platform'], job['url']
+    kwargs = dict(job['kwargs'])
+    if kwargs.get('known_ids') is not None:
+        kwargs['known_ids'] = set(kwargs['known_ids'])
+    if verbose:
+        print(f"[{worker}] Job {job['id']} ({platform}, attempt {job['attempts']}): {url}")
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=keep_leased, args=(queue, job['id'], worker, lease_seconds, stop), daemon=True)
+    heartbeat.start()
+    try:
+        records = list(timed(parsers[platform], platform)(url, **kwargs))
+    except Exception as e:
+        print(f"❌ Job {job['id']} failed for {url}: {e}")
+        queue.fail(job['id'], worker, e)
+        return False
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    if queue.complete(job['id'], worker, records):
+        print(f"✅ Job {job['id']}: {len(records)} videos from {url}")
+        return True
+    print(f"⚠️ Job {job['id']} lease expired, results discarded: {url}")
+    return False
+
+# Воркер: берёт задания в аренду и выполняет их, пока не остановят.
+# Задания одной платформы выполняются одновременно, не больше чем по
+# SOURCE_WORKERS (source_workers) на платформу, как при локальном обходе.
+# once=True — выходим, когда брать больше нечего и ни одно задание не ждёт повтора.
+# Ограничители запросов общие для всех воркеров этой очереди. Возвращает число выполненных заданий.
+def run_worker(queue, parsers, worker=None, platforms=None, once=False, lease_seconds=LEASE_SECONDS,
+               source_workers=None, cache_file=CACHE_FILE, metrics_file=None, verbose=False):
+    worker = worker or default_worker_id()
+    caps = dict(SOURCE_WORKERS, **(source_workers or {}))
+    use_shared_limits(queue)
+    get_metrics().reset()
+    clear_unresolved()
+    get_cache(cache_file)
+    stop = threading.Event()
+    lock = threading.Lock()
+    done = []
+    errors = []
+
+    def work(platform):
+        try:
+            while not stop.is_set():
+                job = queue.lease(worker, [platform], lease_seconds)
+                if job is None:
+                    # once: выходим, только когда не осталось и заданий, ждущих повтора
+                    if once and not queue.waiting([platform]):
+                        return
+                    stop.wait(POLL_INTERVAL)
+                    continue
+                if run_job(queue, parsers, job, worker, lease_seconds, verbose):
+                    with lock:
+                        done.append(job['id'])
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [
+        threading.Thread(target=work, args=(platform,), daemon=True)
+        for platform in (platforms or list(SOURCE_WORKERS))
+        for _ in range(max(1, caps.get(platform, 1)))
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        # Итоги воркера, в том числе видео, которые не удалось загрузить и после повторов
+        report_stats(verbose)
+        close_cache()
+        use_shared_limits(None)
+        if metrics_file:
+            save_metrics(metrics_file, verbose=verbose)
+    return len(done)
+
+# Ждём, пока воркеры не выполнят все задания запуска
+def wait_for_run(queue, run_id, verbose=False):
+    last = None
+    while True:
+        status = queue.status(run_id)
+        if status != last and verbose:
+            print(f"Run {run_id}: {status['done']} done, {status['leased']} in progress, "
+                  f"{status['pending']} pending, {status['failed']} failed")
+        last = status
+        if not status['pending'] and not status['leased']:
+            return status
+        time.sleep(POLL_INTERVAL)
+
+# Объединяем записи выполненных заданий и сохраняем результат. Задания, которые
+# так и не удалось выполнить, не попадают в состояние синхронизации и будут
+# обойдены заново при следующем запуске; код завершения тогда EXIT_FAILED.
+def collect_crawl(queue, run_id, output_file=OUTPUT_FILE, output_format=None, incremental=INCREMENTAL_SYNC,
+                  state_file=SYNC_STATE_FILE, wait=True, keep=False, verbose=False):
+    status = wait_for_run(queue, run_id, verbose) if wait else queue.status(run_id)
+    if not sum(status.values()):
+        print(f"❌ Unknown run: {run_id}")
+        return EXIT_FAILED
+    if status['pending'] or status['leased']:
+        print(f"❌ Run {run_id} is not finished: {status['pending']} pending, {status['leased']} in progress")
+        return EXIT_FAILED
+    failed = 0
+    for job in queue.jobs(run_id):
+        if job['state'] == 'failed':
+            print(f"❌ Failed after {job['attempts']} attempts: {job['url']} ({job['error']})")
+            failed += 1
+
+    incremental = incremental and os.path.exists(output_file)
+    merger = VideoMerger()
+    parsed_ids = {}
+    new_videos = 0
+    with get_metrics().timer('stage_seconds_total', stage='collect'):
+        for source_index, url, video in queue.results(run_id):
+            parsed_ids.setdefault(url, []).append(video['video_id'])
+            merger.add(video, source_index=source_index)
+            new_videos += 1
+
+    exit_code = save_results(merger, new_videos, output_file, output_format, incremental, verbose, failed)
+    if exit_code == EXIT_OK:
+        sync_state = SyncState(state_file)
+        try:
+            for url, video_ids in parsed_ids.items():
+                sync_state.add(url, video_ids)
+        finally:
+            sync_state.close()
+        if not keep:
+            queue.purge(run_id)
+    # Собранное сохранено, но запуск с невыполненными заданиями — не успех
+    if failed:
+        exit_code = EXIT_FAILED
+    return exit_code
+
+# Запускаем local_workers воркеров-процессов на этой машине (python cli.py worker --once)
+# с тем же кэшем метаданных и числом одновременных ссылок на платформу
+def spawn_workers(queue_address, count, cache_file=CACHE_FILE, source_workers=None, verbose=False):
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cli.py')
+    command = [sys.executable, cli, 'worker', '--queue', queue_address, '--once', '--cache', cache_file]
+    for platform, count_per_platform in (source_workers or {}).items():
+        command += ['--source-workers', f'{platform}={count_per_platform}']
+    if verbose:
+        command.append('--verbose')
+    return [subprocess.Popen(command) for _ in range(count)]
+
+# Координатор: кладёт ссылки в очередь, при необходимости запускает локальных
+# воркеров, дожидается выполнения всех заданий и сохраняет объединённый результат
+def crawl_distributed(urls, queue, queue_address, local_workers=0, output_file=OUTPUT_FILE, output_format=None,
+                      incremental=INCREMENTAL_SYNC, enrich_workers=None, source_workers=None, state_file=SYNC_STATE_FILE,
+                      cache_file=CACHE_FILE, metrics_file=METRICS_FILE, prometheus_file=None, verbose=False):
+    get_metrics().reset()
+    run_id = submit_crawl(queue, urls, output_file, incremental, enrich_workers, state_file, verbose)
+    print(f"Run {run_id} submitted to {queue_address}")
+    processes = spawn_workers(queue_address, local_workers, cache_file, source_workers, verbose)
+    try:
+        exit_code = collect_crawl(queue, run_id, output_file, output_format, incremental, state_file,
+                                  wait=True, verbose=verbose)
+    finally:
+        for process in processes:
+            process.wait()
+    report_stats(verbose)
+    save_metrics(metrics_file, prometheus_file, verbose)
+    return exit_code
@@ -0,0 +1,165 @@
+import contextvars
+import re
+import threading
+import time
+
+from circuit_breaker import CircuitOpenError, get_breaker
+from job_context import ContextThreadPoolExecutor
+from metrics import get_metrics
+from rate_limiter import get_limiter
+from ydl_pool import extractor
+
+# Количество параллельных потоков для загрузки полных метаданных по платформам
+ENRICH_WORKERS = {
+    'vk': 4,
+    'rutube': 4,
+}
+
+# Ленивое обогащение: полные метаданные запрашиваются только для записей,
+# у которых в плоском плейлисте нет нормального названия
+LAZY_ENRICHMENT = True
+
+# Названия-заглушки, которые платформы отдают вместо настоящего названия
+PLACEHOLDER_TITLES = {'no title', 'untitled', 'video', 'видео', 'без названия'}
+PLACEHOLDER_RE = re.compile(r'(video|видео)\s*-?\d+(_\d+)?', re.IGNORECASE)
+# Признаки обрезанного названия
+TRUNCATION_MARKS = ('…', '...')
+
+# Отложенные повторы: записи, которые не удалось загрузить в основном проходе, не задерживают
+# его и повторяются после него до DEFERRED_RETRIES раз с паузой RETRY_DELAY * 2 ** n секунд
+# (не больше RETRY_MAX_DELAY и не меньше оставшейся паузы автомата отключения платформы)
+DEFERRED_RETRIES = 3
+RETRY_DELAY = 2
+RETRY_MAX_DELAY = 60
+
+# Результаты обогащения попадают в метрику enrich_total{platform, result}:
+# flat — взято из плоского плейлиста, cached — из кэша,
+# fetched — загружено полностью (в том числе повторно), failed — не удалось и после повторов
+ENRICH_RESULTS = ('flat', 'cached', 'fetched', 'failed')
+
+def _count(platform, result):
+    get_metrics().inc('enrich_total', platform=platform, result=result)
+
+# Записи, которые не удалось загрузить и после отложенных повторов (для отчёта в конце работы);
+# у задания демона — свой список (scope_unresolved)
+_unresolved = contextvars.ContextVar('unresolved', default=[])
+_unresolved_lock = threading.Lock()
+
+def unresolved_entries():
+    with _unresolved_lock:
+        return list(_unresolved.get())
+
+def clear_unresolved():
+    with _unresolved_lock:
+        _unresolved.get().clear()
+
+def scope_unresolved():
+    _unresolved.set([])
+
+# Статистика обогащения по платформам (для отчёта в конце работы)
+def enrichment_stats():
+    stats = {}
+    for counter in get_metrics().snapshot()['counters']:
+        if counter['name'] == 'enrich_total':
+            counts = stats.setdefault(counter['labels']['platform'], dict.fromkeys(ENRICH_RESULTS, 0))
+            counts[counter['labels']['result']] += counter['value']
+    return stats
+
+# Достаточно ли названия из плоского плейлиста: оно есть, не обрезано и не заглушка
+def flat_title_complete(entry):
+    title = (entry.get('title') or '').strip()
+    if not title or title.lower() in PLACEHOLDER_TITLES:
+        return False
+    if title.endswith(TRUNCATION_MARKS):
+        return False
+    if title == entry.get('id') or PLACEHOLDER_RE.fullmatch(title):
+        return False
+    return True
+
+# Параллельная загрузка полных метаданных для записей плоского плейлиста.
+# Возвращает кортежи (entry, full_entry, error); для пустых записей full_entry и error равны None.
+# Записи отдаются в исходном порядке, кроме тех, что не удалось загрузить сразу: они
+# повторяются после основного прохода (DEFERRED_RETRIES) и отдаются в конце. Пока автомат
+# отключения платформы (circuit_breaker.py) держит паузу, записи откладываются без запросов.
+# Если передан cache (MetadataCache), свежие записи берутся из него без запросов к сети.
+# При lazy=True записи с полным названием в плоском плейлисте не запрашиваются вовсе:
+# full_entry тогда содержит только title (ссылку парсер строит по ID).
+def enrich_entries(entries, platform, opts, workers=None, cache=None, lazy=None):
+    if lazy is None:
+        lazy = LAZY_ENRICHMENT
+    if workers is None:
+        workers = ENRICH_WORKERS.get(platform, 1)
+    limiter = get_limiter(platform)
+    breaker = get_breaker(platform)
+
+    def fetch(entry):
+        if entry is None:
+            return None, None
+        if lazy and flat_title_complete(entry):
+            _count(platform, 'flat')
+            return {'title': entry['title'].strip()}, None
+        video_id = entry.get('id')
+        if cache is not None and video_id:
+            cached = cache.get(platform, video_id)
+            get_metrics().inc('cache_total', platform=platform, result='miss' if cached is None else 'hit')
+            if cached is not None:
+                _count(platform, 'cached')
+                return cached, None
+        return request(entry)
+
+    def request(entry, retry=False):
+        if not breaker.allow():
+            return None, CircuitOpenError(f"{platform} requests are paused after repeated failures")
+        limiter.acquire()
+        try:
+            # YoutubeDL не потокобезопасен: каждый поток берёт из пула свой экземпляр
+            with extractor((platform, 'full'), opts) as ydl, get_metrics().request(platform, 'enrich'):
+                full_entry = ydl.extract_info(entry['url'], download=False)
+        except Exception as e:
+            limiter.report_failure(e)
+            breaker.record(False, retry)
+            return None, e
+        limiter.report_success()
+        breaker.record(True, retry)
+        _count(platform, 'fetched')
+        video_id = entry.get('id')
+        # Неполные метаданные (без названия или ссылки) не кэшируем
+        if cache is not None and video_id and full_entry.get('title') and full_entry.get('webpage_url'):
+            cache.put(platform, video_id, full_entry.get('title'), full_entry.get('webpage_url'))
+        return full_entry, None
+
+    entries = list(entries)
+    deferred = []
+    with ContextThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for entry, (full_entry, error) in zip(entries, executor.map(fetch, entries)):
+            if error is None:
+                yield entry, full_entry, error
+            else:
+                deferred.append((entry, error))
+
+        for attempt in range(DEFERRED_RETRIES):
+            if not deferred:
+                break
+            delay = max(min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** attempt), breaker.remaining())
+            print(f"Retrying {len(deferred)} failed {platform} videos in {delay:.0f} s "
+                  f"(attempt {attempt + 1}/{DEFERRED_RETRIES})")
+            get_metrics().inc('retry_sleep_seconds_total', delay, platform=platform, stage='enrich')
+            time.sleep(delay)
+            get_metrics().inc('retries_total', len(deferred), platform=platform, stage='enrich')
+            retried = [entry for entry, error in deferred]
+            deferred = []
+            # Первая запись идёт отдельно: если платформа была на паузе, это пробный запрос,
+            # и остальные отправляются, только когда он прошёл
+            retry = lambda entry: request(entry, retry=True)
+            results = [retry(retried[0])] + list(executor.map(retry, retried[1:]))
+            for entry, (full_entry, error) in zip(retried, results):
+                if error is None:
+                    yield entry, full_entry, error
+                else:
+                    deferred.append((entry, error))
+
+    for entry, error in deferred:
+        _count(platform, 'failed')
+        with _unresolved_lock:
+            _unresolved.get().append({'platform': platform, 'id': entry.get('id'), 'url': entry.get('url'), 'error': str(error)})
+        yield entry, None, error
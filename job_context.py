@@ -0,0 +1,56 @@
+import contextvars
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Состояние текущего задания (метрики, список незагруженных видео, вывод) хранится
+# в contextvars. Новый поток начинает с пустого контекста, поэтому потоки обхода
+# запускаются через обёртки ниже и наследуют контекст запустившего их потока:
+# в демоне вывод и метрики обхода не смешиваются с параллельными запросами /lookup.
+
+# Пул потоков, задачи которого выполняются в контексте вызвавшего submit/map потока
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+# Фоновый поток (daemon) в контексте текущего потока
+def start_thread(target, *args):
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(target, *args), daemon=True)
+    thread.start()
+    return thread
+
+# Куда пишет print() в текущем контексте; None — в исходный sys.stdout
+_output = contextvars.ContextVar('output', default=None)
+
+# Замена sys.stdout: запись идёт в поток вывода текущего контекста (capture_output).
+# В отличие от contextlib.redirect_stdout, не перехватывает вывод других потоков.
+class ContextStdout(io.TextIOBase):
+    def __init__(self, stream):
+        self.stream = stream
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        return (_output.get() or self.stream).write(text)
+
+    def flush(self):
+        (_output.get() or self.stream).flush()
+
+    def isatty(self):
+        return _output.get() is None and self.stream.isatty()
+
+# Подменяем sys.stdout один раз на процесс; возвращает исходный поток
+def install_stdout():
+    if not isinstance(sys.stdout, ContextStdout):
+        sys.stdout = ContextStdout(sys.stdout)
+    return sys.stdout.stream
+
+def uninstall_stdout():
+    if isinstance(sys.stdout, ContextStdout):
+        sys.stdout = sys.stdout.stream
+
+# Вывод текущего контекста (и запущенных из него потоков) — в stream
+def capture_output(stream):
+    _output.set(stream)
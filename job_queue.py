@@ -0,0 +1,276 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Файл очереди заданий по умолчанию
+JOB_QUEUE_FILE = 'crawl_queue.sqlite'
+
+# На сколько секунд задание закрепляется за воркером; воркер продлевает аренду,
+# пока работает, а задание упавшего воркера по истечении аренды забирает другой
+LEASE_SECONDS = 300
+# Сколько раз пытаемся выполнить задание, прежде чем считать его проваленным
+MAX_ATTEMPTS = 3
+# Пауза перед повтором упавшего задания: RETRY_DELAY * 2 ** (попытка - 1) секунд,
+# не больше RETRY_MAX_DELAY. Без неё воркер сразу же брал задание снова, и все
+# попытки уходили за доли секунды на ту же временную ошибку (429, обрыв соединения)
+RETRY_DELAY = 30
+RETRY_MAX_DELAY = 600
+
+# Очередь заданий обхода в SQLite: подходит для нескольких процессов на одной машине
+# или на общем диске с нормальной блокировкой файлов. Задание — одна исходная ссылка;
+# записи, полученные воркером, сохраняются в очереди до финального объединения.
+# Там же хранятся общие для всех воркеров ведра ограничителей запросов по платформам.
+class SQLiteJobQueue:
+    def __init__(self, path=JOB_QUEUE_FILE):
+        self.path = path
+        # isolation_level=None: транзакции открываем явно (BEGIN IMMEDIATE)
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        # Соединение общее для потоков процесса (обогащение, продление аренды): работаем с ним по очереди
+        self._lock = threading.RLock()
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                run_id TEXT NOT NULL,
+                source_index INTEGER NOT NULL,
+                platform TEXT NOT NULL,
+                url TEXT NOT NULL,
+                kwargs TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_until REAL,
+                not_before REAL,
+                error TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, platform);
+            CREATE TABLE IF NOT EXISTS results (
+                job_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                record TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            );
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                platform TEXT PRIMARY KEY,
+                rate REAL NOT NULL,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+        ''')
+        # Очередь, созданная прежней версией, — без колонки not_before
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(jobs)')]
+        if 'not_before' not in columns:
+            try:
+                self._conn.execute('ALTER TABLE jobs ADD COLUMN not_before REAL')
+            except sqlite3.OperationalError as e:
+                # Колонку успел добавить другой процесс
+                if 'duplicate column' not in str(e):
+                    raise
+
+    # Все изменения — в транзакции с блокировкой на запись, чтобы два воркера
+    # не взяли одно задание и не потратили один токен
+    def _transaction(self, func):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(self._conn)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return result
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # Добавляем задания запуска: tasks — (platform, url, kwargs). Возвращает run_id.
+    def submit(self, tasks, run_id=None):
+        run_id = run_id or uuid.uuid4().hex[:12]
+        now = time.time()
+
+        def insert(conn):
+            conn.executemany(
+                'INSERT INTO jobs (run_id, source_index, platform, url, kwargs, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                [(run_id, index, platform, url, json.dumps(kwargs or {}), now)
+                 for index, (platform, url, kwargs) in enumerate(tasks)],
+            )
+        self._transaction(insert)
+        return run_id
+
+    # Берём в аренду следующее задание (ожидающее, у которого прошла пауза перед
+    # повтором, или с истёкшей арендой). Возвращает словарь задания или None, если брать нечего.
+    def lease(self, worker, platforms=None, lease_seconds=LEASE_SECONDS):
+        def take(conn):
+            now = time.time()
+            query = ("SELECT id, run_id, source_index, platform, url, kwargs, attempts FROM jobs "
+                     "WHERE ((state = 'pending' AND (not_before IS NULL OR not_before <= ?)) "
+                     "OR (state = 'leased' AND lease_until < ?))")
+            params = [now, now]
+            if platforms:
+                query += ' AND platform IN (%s)' % ','.join('?' * len(platforms))
+                params.extend(platforms)
+            row = conn.execute(query + ' ORDER BY id LIMIT 1', params).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                (worker, now + lease_seconds, now, row[0]),
+            )
+            return {
+                'id': row[0], 'run_id': row[1], 'source_index': row[2], 'platform': row[3],
+                'url': row[4], 'kwargs': json.loads(row[5]), 'attempts': row[6] + 1,
+            }
+        return self._transaction(take)
+
+    # Продлеваем аренду; False — задание уже забрал другой воркер
+    def heartbeat(self, job_id, worker, lease_seconds=LEASE_SECONDS):
+        def extend(conn):
+            now = time.time()
+            return conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                (now + lease_seconds, now, job_id, worker),
+            ).rowcount == 1
+        return self._transaction(extend)
+
+    # Сохраняем записи задания и отмечаем его выполненным
+    def complete(self, job_id, worker, records):
+        def finish(conn):
+            updated = conn.execute(
+                "UPDATE jobs SET state = 'done', lease_until = NULL, error = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND state = 'leased'",
+                (time.time(), job_id, worker),
+            ).rowcount
+            if not updated:
+                return False
+            conn.execute('DELETE FROM results WHERE job_id = ?', (job_id,))
+            conn.executemany(
+                'INSERT INTO results VALUES (?, ?, ?)',
+                [(job_id, seq, json.dumps(dict(record), ensure_ascii=False)) for seq, record in enumerate(records)],
+            )
+            return True
+        return self._transaction(finish)
+
+    # Ошибка задания: возвращаем его в очередь с паузой перед повтором или,
+    # после max_attempts попыток, считаем проваленным
+    def fail(self, job_id, worker, error, max_attempts=MAX_ATTEMPTS, retry_delay=None):
+        retry_delay = RETRY_DELAY if retry_delay is None else retry_delay
+
+        def release(conn):
+            now = time.time()
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND worker = ? AND state = 'leased'", (job_id, worker),
+            ).fetchone()
+            if row is None:
+                return
+            attempts = row[0]
+            conn.execute(
+                "UPDATE jobs SET state = ?, lease_until = NULL, not_before = ?, error = ?, updated_at = ? WHERE id = ?",
+                ('failed' if attempts >= max_attempts else 'pending',
+                 now + min(RETRY_MAX_DELAY, retry_delay * 2 ** (attempts - 1)), str(error), now, job_id),
+            )
+        self._transaction(release)
+
+    # Сколько ожидающих заданий ещё ждут повтора (пауза после ошибки не прошла)
+    def waiting(self, platforms=None):
+        query = "SELECT COUNT(*) FROM jobs WHERE state = 'pending' AND not_before > ?"
+        params = [time.time()]
+        if platforms:
+            query += ' AND platform IN (%s)' % ','.join('?' * len(platforms))
+            params.extend(platforms)
+        return self._query(query, params)[0][0]
+
+    # Количество заданий запуска по состояниям
+    def status(self, run_id):
+        rows = self._query('SELECT state, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY state', (run_id,))
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(dict(rows))
+        return counts
+
+    def jobs(self, run_id):
+        rows = self._query(
+            'SELECT id, source_index, platform, url, state, attempts, error FROM jobs WHERE run_id = ? ORDER BY source_index',
+            (run_id,),
+        )
+        return [
+            {'id': row[0], 'source_index': row[1], 'platform': row[2], 'url': row[3],
+             'state': row[4], 'attempts': row[5], 'error': row[6]}
+            for row in rows
+        ]
+
+    # Записи выполненных заданий запуска: (source_index, url, record) в порядке ссылок.
+    # Читаются курсором по мере перебора, без загрузки всех записей в память.
+    def results(self, run_id):
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            rows = conn.execute(
+                "SELECT jobs.source_index, jobs.url, results.record FROM results "
+                "JOIN jobs ON jobs.id = results.job_id "
+                "WHERE jobs.run_id = ? AND jobs.state = 'done' ORDER BY jobs.source_index, results.seq",
+                (run_id,),
+            )
+            for source_index, url, record in rows:
+                yield source_index, url, json.loads(record)
+        finally:
+            conn.close()
+
+    # Удаляем задания и записи запуска после финального объединения
+    def purge(self, run_id):
+        def delete(conn):
+            conn.execute('DELETE FROM results WHERE job_id IN (SELECT id FROM jobs WHERE run_id = ?)', (run_id,))
+            conn.execute('DELETE FROM jobs WHERE run_id = ?', (run_id,))
+        self._transaction(delete)
+
+    # Общее ведро токенов платформы: резервируем токен и возвращаем, сколько ждать
+    def reserve(self, platform, rate, burst=1):
+        def take(conn):
+            now = time.time()
+            row = conn.execute('SELECT rate, tokens, updated FROM rate_buckets WHERE platform = ?', (platform,)).fetchone()
+            if row is None:
+                bucket_rate, tokens = rate, float(burst)
+            else:
+                bucket_rate, tokens = row[0], min(burst, row[1] + (now - row[2]) * row[0])
+            tokens -= 1
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_buckets VALUES (?, ?, ?, ?)',
+                (platform, bucket_rate, tokens, now),
+            )
+            return -tokens / bucket_rate if tokens < 0 else 0.0
+        return self._transaction(take)
+
+    # Меняем общую частоту платформы (замедление при 429, ускорение после серии успехов)
+    def adjust_rate(self, platform, factor, min_rate, max_rate, default_rate):
+        def update(conn):
+            now = time.time()
+            row = conn.execute('SELECT rate, tokens FROM rate_buckets WHERE platform = ?', (platform,)).fetchone()
+            rate, tokens = row if row is not None else (default_rate, 1.0)
+            rate = max(min_rate, min(max_rate, rate * factor))
+            # При замедлении не даём накопленным токенам сразу выпустить следующий запрос
+            if factor < 1:
+                tokens = min(tokens, 0.0)
+            conn.execute('INSERT OR REPLACE INTO rate_buckets VALUES (?, ?, ?, ?)', (platform, rate, tokens, now))
+            return rate
+        return self._transaction(update)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# Бэкенды очереди по схеме адреса: sqlite:///path/to/queue.sqlite или просто путь к файлу
+QUEUE_BACKENDS = {
+    'sqlite': SQLiteJobQueue,
+}
+
+def open_queue(address=JOB_QUEUE_FILE):
+    scheme, sep, rest = address.partition('://')
+    if not sep:
+        return SQLiteJobQueue(address)
+    if scheme not in QUEUE_BACKENDS:
+        raise ValueError(f"Unsupported queue backend '{scheme}' (supported: {', '.join(QUEUE_BACKENDS)})")
+    # sqlite:///abs/path -> /abs/path, sqlite://rel/path -> rel/path
+    return QUEUE_BACKENDS[scheme](os.path.expanduser(rest))
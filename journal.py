@@ -0,0 +1,78 @@
+import json
+import os
+
+# Файл журнала обхода (рядом со скриптом)
+JOURNAL_FILE = 'crawl_journal.jsonl'
+
+# Журнал обхода: каждая полученная запись и завершение каждой ссылки сразу
+# дописываются в файл, чтобы после падения продолжить с места остановки (--resume).
+# В памяти — только ID записанных видео; сами записи (records) есть лишь у журнала,
+# прочитанного из файла, и отдаются парсеру один раз (resumable)
+class CrawlJournal:
+    def __init__(self, path=JOURNAL_FILE, resume=False):
+        self.path = path
+        self.records = {}
+        self.completed = set()
+        self._ids = {}
+        if resume and os.path.exists(path):
+            self._load()
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    # Последняя строка могла быть записана не полностью
+                    continue
+                url = item['source']
+                if item.get('completed'):
+                    self.completed.add(url)
+                elif self._remember(url, item['video']['video_id']):
+                    self.records.setdefault(url, []).append(item['video'])
+
+    def _remember(self, url, video_id):
+        ids = self._ids.setdefault(url, set())
+        if video_id in ids:
+            return False
+        ids.add(video_id)
+        return True
+
+    # ID видео, уже сохранённых в журнале для ссылки
+    def processed_ids(self, url):
+        return self._ids.get(url, set())
+
+    def _write(self, item):
+        self._file.write(json.dumps(item, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def record(self, url, video):
+        if self._remember(url, video['video_id']):
+            self._write({'source': url, 'video': dict(video)})
+
+    def complete(self, url):
+        if url not in self.completed:
+            self.completed.add(url)
+            self._write({'source': url, 'completed': True})
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    # remove=True удаляет журнал (после успешного сохранения результата)
+    def close(self, remove=False):
+        self._file.close()
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+# Оборачиваем парсер так, чтобы сначала отдавались записи из журнала,
+# а уже обработанные видео не запрашивались повторно. Отданные записи журнал
+# больше не хранит: дальше они живут только в объединении
+def resumable(parse, journal):
+    def run(url, **kwargs):
+        yield from journal.records.pop(url, [])
+        if url in journal.completed:
+            return
+        yield from parse(url, skip_ids=set(journal.processed_ids(url)), **kwargs)
+    return run
@@ -0,0 +1,406 @@
+import html
+import http.cookiejar
+import json
+import os
+import queue
+import re
+import threading
+import urllib.parse
+import urllib.request
+
+import scrapetube
+
+from job_context import ContextThreadPoolExecutor, start_thread
+from metrics import get_metrics
+from rate_limiter import get_limiter, is_throttle_error
+from sync_state import extract_new_entries, take_new
+from ydl_pool import extractor
+
+# Собственный постраничный обход каналов YouTube, VK и RuTube: одна страница ответа
+# содержит названия и ссылки десятков видео, поэтому канал из 300 видео
+# читается за несколько запросов вместо запроса на каждое видео.
+NATIVE_LISTING = True
+
+# Адреса сайтов (можно подменить, например, на локальный сервер для бенчмарка)
+LISTING_BASE_URLS = {
+    'youtube': 'https://www.youtube.com',
+    'vk': 'https://vk.com',
+    'rutube': 'https://rutube.ru',
+}
+
+# Вкладки канала YouTube, которые листаются одновременно
+YOUTUBE_TABS = ('videos', 'shorts', 'streams')
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36'
+COOKIE_FILE = 'cookies.txt'
+REQUEST_TIMEOUT = 20
+# Повторы страницы при ограничении частоты запросов (429, сброс соединения)
+PAGE_RETRIES = 3
+
+# Ограничение на число страниц, чтобы не зациклиться на некорректном ответе
+MAX_PAGES = 1000
+
+# Ошибка собственного обхода: вызывающий код откатывается на yt-dlp
+class ListingError(Exception):
+    pass
+
+_opener = None
+_opener_lock = threading.Lock()
+
+# Общий HTTP-клиент с куками из cookies.txt (если файл есть)
+def get_opener():
+    global _opener
+    with _opener_lock:
+        if _opener is None:
+            jar = http.cookiejar.MozillaCookieJar()
+            if os.path.exists(COOKIE_FILE):
+                try:
+                    jar.load(COOKIE_FILE, ignore_discard=True, ignore_expires=True)
+                except (OSError, http.cookiejar.LoadError):
+                    pass
+            # Без согласия на cookies YouTube может отдать страницу согласия вместо канала
+            if not any(cookie.name == 'CONSENT' for cookie in jar):
+                jar.set_cookie(http.cookiejar.Cookie(
+                    version=0, name='CONSENT', value='YES+cb', port=None, port_specified=False,
+                    domain='.youtube.com', domain_specified=True, domain_initial_dot=True,
+                    path='/', path_specified=True, secure=True, expires=None, discard=True,
+                    comment=None, comment_url=None, rest={},
+                ))
+            _opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+            _opener.addheaders = [('User-Agent', USER_AGENT), ('Accept-Language', 'en')]
+        return _opener
+
+# Запрос через ограничитель платформы; при ограничении частоты повторяем.
+# data отправляется как форма, json_data — как JSON.
+def fetch(platform, url, data=None, headers=None, json_data=None):
+    limiter = get_limiter(platform)
+    headers = dict(headers or {})
+    if json_data is not None:
+        body = json.dumps(json_data).encode()
+        headers['Content-Type'] = 'application/json'
+    else:
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+    for attempt in range(PAGE_RETRIES + 1):
+        limiter.acquire()
+        request = urllib.request.Request(url, data=body, headers=headers)
+        try:
+            with get_metrics().request(platform, 'listing'):
+                with get_opener().open(request, timeout=REQUEST_TIMEOUT) as response:
+                    text = response.read().decode('utf-8', errors='replace')
+        except Exception as e:
+            limiter.report_failure(e)
+            if attempt < PAGE_RETRIES and is_throttle_error(e):
+                get_metrics().inc('retries_total', platform=platform, stage='listing')
+                continue
+            raise ListingError(f"request to {url} failed: {e}") from e
+        limiter.report_success()
+        return text
+
+def fetch_json(platform, url, data=None, headers=None, json_data=None):
+    text = fetch(platform, url, data, headers, json_data)
+    # Ответы al_*.php у VK могут начинаться с HTML-комментария
+    if text.startswith('<!--'):
+        text = text[4:]
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        raise ListingError(f"invalid JSON from {url}: {e}") from e
+
+# RuTube: /api/video/person/<id>/ отдаёт страницы с results, has_next и next
+RUTUBE_CHANNEL_RE = re.compile(r'rutube\.ru/channel/(\d+)(?:/(videos|shorts))?')
+RUTUBE_ORIGIN_TYPES = {
+    'videos': 'rtb,rst,ifrm,rspa',
+    'shorts': 'rshorts',
+    None: '',
+}
+
+def iter_rutube(url, base_url=None):
+    match = RUTUBE_CHANNEL_RE.search(url)
+    if not match:
+        raise ListingError(f"not a RuTube channel URL: {url}")
+    channel_id, section = match.groups()
+    base_url = (base_url or LISTING_BASE_URLS['rutube']).rstrip('/')
+    page_url = (f"{base_url}/api/video/person/{channel_id}/?page=1&format=json"
+                f"&origin__type={RUTUBE_ORIGIN_TYPES[section]}")
+    for _ in range(MAX_PAGES):
+        page = fetch_json('rutube', page_url)
+        results = page.get('results')
+        if not isinstance(results, list):
+            raise ListingError(f"unexpected RuTube response for {url}")
+        for result in results:
+            video_url = result.get('video_url')
+            if not result.get('id') or not video_url:
+                continue
+            yield {
+                'id': result['id'],
+                'title': result.get('title'),
+                'url': video_url,
+                'webpage_url': video_url,
+            }
+        if not page.get('has_next') or not page.get('next'):
+            return
+        # Ссылка на следующую страницу приходит абсолютной; оставляем её на том же сервере
+        page_url = base_url + urllib.parse.urlsplit(page['next'])._replace(scheme='', netloc='').geturl()
+
+# VK: al_video.php?act=load_videos_silent отдаёт список видео раздела страницами
+VK_PLAYLIST_RE = re.compile(r'vk(?:video\.ru|\.com/video)/playlist/(-?\d+)_(-?\d+)')
+VK_HANDLE_RE = re.compile(r'vk(?:video\.ru|\.com/video)/(@[^/?#]+)')
+VK_OID_RE = re.compile(r'\bvar newCur\s*=\s*\{.*?"oid"\s*:\s*"?(-?\d+)', re.S)
+
+def vk_section(url, base_url):
+    match = VK_PLAYLIST_RE.search(url)
+    if match:
+        return match.group(1), f'playlist_{match.group(2)}'
+    match = VK_HANDLE_RE.search(url)
+    if not match:
+        raise ListingError(f"not a VK channel or playlist URL: {url}")
+    page = fetch('vk', f"{base_url}/video/{match.group(1)}")
+    oid = VK_OID_RE.search(page)
+    if not oid:
+        raise ListingError(f"VK page id not found for {url}")
+    section = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query).get('section', ['all'])[0]
+    return oid.group(1), section
+
+def load_vk_page(base_url, page_id, section, offset):
+    endpoint = f"{base_url}/al_video.php"
+    response = fetch_json('vk', endpoint, data={
+        'act': 'load_videos_silent',
+        'offset': offset,
+        'oid': page_id,
+        'section': section,
+        'al': 1,
+    }, headers={'Referer': endpoint, 'X-Requested-With': 'XMLHttpRequest'})
+    try:
+        code, payload = response['payload']
+        if str(code) == '3':
+            raise ListingError("VK requires login (check cookies.txt)")
+        return payload[0][section]
+    except (KeyError, IndexError, TypeError, ValueError):
+        raise ListingError(f"unexpected VK response for section {section}")
+
+def iter_vk(url, base_url=None):
+    base_url = (base_url or LISTING_BASE_URLS['vk']).rstrip('/')
+    page_id, section = vk_section(url, base_url)
+    offset = 0
+    for _ in range(MAX_PAGES):
+        page = load_vk_page(base_url, page_id, section, offset)
+        for video in page['list']:
+            # Элемент списка: [owner_id, id, обложка, название, ...]
+            video_id = f'{video[0]}_{video[1]}'
+            title = video[3] if len(video) > 3 and isinstance(video[3], str) else None
+            yield {
+                'id': video_id,
+                'title': html.unescape(title) if title else None,
+                'url': f'https://vk.com/video{video_id}',
+            }
+        if not page['count'] or offset + page['count'] >= page['total']:
+            return
+        offset += page['count']
+
+# YouTube: первая страница вкладки канала — HTML с ytInitialData, следующие —
+# youtubei/v1/browse по токену продолжения. Запросы и ответы те же, что у scrapetube.
+YOUTUBE_API_KEY_RE = re.compile(r'"(?:INNERTUBE_API_KEY|innertubeApiKey)"\s*:\s*"([^"]+)"')
+YOUTUBE_RENDERERS = {
+    'videos': ('videoRenderer',),
+    'streams': ('videoRenderer',),
+    'shorts': ('shortsLockupViewModel', 'reelItemRenderer'),
+}
+
+# JSON-объект, который начинается после marker в тексте страницы
+def json_after(text, marker):
+    start = text.find(marker)
+    if start < 0:
+        return None
+    start = text.find('{', start + len(marker))
+    try:
+        return json.JSONDecoder().raw_decode(text, start)[0]
+    except ValueError:
+        return None
+
+# Значения ключей keys в порядке обхода в ширину (как search_dict в scrapetube)
+def find_keys(data, keys):
+    pending = [data]
+    while pending:
+        current = pending.pop(0)
+        if isinstance(current, dict):
+            for key, value in current.items():
+                if key in keys:
+                    yield key, value
+                else:
+                    pending.append(value)
+        elif isinstance(current, list):
+            pending.extend(current)
+
+def youtube_text(value):
+    if isinstance(value, str):
+        return value
+    if not isinstance(value, dict):
+        return None
+    if 'runs' in value:
+        return ''.join(run.get('text', '') for run in value['runs'])
+    return value.get('simpleText') or value.get('content')
+
+def youtube_page_entries(data, tab):
+    for renderer, item in find_keys(data, YOUTUBE_RENDERERS[tab]):
+        if renderer == 'shortsLockupViewModel':
+            command = (item.get('onTap') or {}).get('innertubeCommand') or {}
+            video_id = (command.get('reelWatchEndpoint') or {}).get('videoId')
+            title = youtube_text((item.get('overlayMetadata') or {}).get('primaryText'))
+        else:
+            video_id = item.get('videoId')
+            title = youtube_text(item.get('title') or item.get('headline'))
+        if video_id:
+            yield {'id': video_id, 'title': title, 'url': f'https://youtube.com/watch?v={video_id}', 'tab': tab}
+
+def youtube_continuation(data):
+    endpoint = next((value for key, value in find_keys(data, ('continuationEndpoint',))), None)
+    try:
+        return {'token': endpoint['continuationCommand']['token'],
+                'click_params': {'clickTrackingParams': endpoint['clickTrackingParams']}}
+    except (KeyError, TypeError):
+        return None
+
+# Первая страница вкладки: (данные вкладки, ключ API, client) или None, если вкладки нет
+def load_youtube_tab(base_url, channel_id, tab):
+    page = fetch('youtube', f"{base_url}/channel/{channel_id}/{tab}?view=0&flow=grid&ucbcb=1")
+    initial = json_after(page, 'var ytInitialData = ')
+    context = json_after(page, '"INNERTUBE_CONTEXT"')
+    api_key = YOUTUBE_API_KEY_RE.search(page)
+    if initial is None or context is None or api_key is None or 'client' not in context:
+        raise ListingError(f"unexpected YouTube page for {channel_id}/{tab}")
+    # Несуществующую вкладку YouTube подменяет главной страницей канала
+    tabs = [value for key, value in find_keys(initial, ('tabRenderer',))]
+    if tabs:
+        selected = next((value for value in tabs if value.get('selected')), None)
+        url = (((selected or {}).get('endpoint') or {}).get('commandMetadata') or {}).get('webCommandMetadata', {}).get('url', '')
+        if not url.rstrip('/').endswith('/' + tab):
+            return None
+        initial = selected.get('content', initial)
+    return initial, api_key.group(1), context['client']
+
+def load_youtube_continuation(base_url, api_key, client, continuation):
+    headers = {'X-YouTube-Client-Name': '1', 'X-YouTube-Client-Version': client.get('clientVersion', '')}
+    return fetch_json('youtube', f"{base_url}/youtubei/v1/browse?key={api_key}", headers=headers, json_data={
+        'context': {'clickTracking': continuation['click_params'], 'client': client},
+        'continuation': continuation['token'],
+    })
+
+# Страницы одной вкладки — списки записей. Следующая страница запрашивается заранее,
+# пока текущая разбирается и отдаётся. С known_ids (инкрементальный режим) листаем
+# только до первого известного видео, поэтому страницу сначала разбираем.
+def youtube_tab_pages(base_url, channel_id, tab, known_ids=None, stop=None):
+    first = load_youtube_tab(base_url, channel_id, tab)
+    if first is None:
+        return
+    data, api_key, client = first
+    with ContextThreadPoolExecutor(max_workers=1) as prefetch:
+        for _ in range(MAX_PAGES):
+            continuation = youtube_continuation(data)
+            next_page = None
+            if continuation and known_ids is None:
+                next_page = prefetch.submit(load_youtube_continuation, base_url, api_key, client, continuation)
+            entries = list(youtube_page_entries(data, tab))
+            if known_ids is not None:
+                new = list(take_new(entries, known_ids, lambda entry: entry['id']))
+                if len(new) < len(entries):
+                    yield new
+                    return
+                if continuation:
+                    next_page = prefetch.submit(load_youtube_continuation, base_url, api_key, client, continuation)
+            yield entries
+            if next_page is None or (stop is not None and stop.is_set()):
+                return
+            data = next_page.result()
+
+_TAB_DONE = object()
+
+# Видео канала YouTube со всех вкладок YOUTUBE_TABS: вкладки листаются одновременно,
+# записи отдаются по мере прихода страниц ({'id', 'title', 'url', 'tab'})
+def iter_youtube(channel_id, base_url=None, known_ids=None, tabs=None):
+    base_url = (base_url or LISTING_BASE_URLS['youtube']).rstrip('/')
+    pages = queue.Queue()
+    stop = threading.Event()
+
+    def run(tab):
+        try:
+            for entries in youtube_tab_pages(base_url, channel_id, tab, known_ids, stop):
+                pages.put(entries)
+                if stop.is_set():
+                    break
+            pages.put(_TAB_DONE)
+        except Exception as e:
+            pages.put(e)
+
+    tabs = tabs or YOUTUBE_TABS
+    for tab in tabs:
+        start_thread(run, tab)
+    try:
+        remaining = len(tabs)
+        while remaining:
+            item = pages.get()
+            if item is _TAB_DONE:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise ListingError(f"YouTube listing failed for {channel_id}: {item}") from item
+            else:
+                yield from item
+    finally:
+        stop.set()
+
+# Видео канала YouTube: собственный обход вкладок, а если он не удался до первой
+# записи — scrapetube (только вкладка видео)
+def youtube_entries(channel_id, known_ids=None):
+    if NATIVE_LISTING:
+        emitted = False
+        try:
+            for entry in iter_youtube(channel_id, known_ids=known_ids):
+                emitted = True
+                yield entry
+            if emitted or known_ids:
+                return
+            raise ListingError(f"no videos found for {channel_id}")
+        except Exception as e:
+            if emitted:
+                raise
+            print(f"⚠️ Native youtube listing failed for {channel_id} ({e}), falling back to scrapetube")
+    videos = scrapetube.get_channel(channel_id)
+    if known_ids is not None:
+        videos = take_new(videos, known_ids, lambda video: video['videoId'])
+    for video in videos:
+        yield {
+            'id': video['videoId'],
+            'title': youtube_text(video.get('title')),
+            'url': f"https://youtube.com/watch?v={video['videoId']}",
+            'tab': 'videos',
+        }
+
+LISTERS = {
+    'vk': iter_vk,
+    'rutube': iter_rutube,
+}
+
+# Список видео канала в том же виде, что плоский плейлист yt-dlp:
+# {'entries': [...], 'playlist_count': N}. Если передан known_ids, листаем только
+# до первого уже известного видео (инкрементальный режим).
+def list_channel(platform, url, known_ids=None, base_url=None):
+    entries = LISTERS[platform](url, base_url)
+    if known_ids is not None:
+        entries = take_new(entries, known_ids, lambda entry: entry.get('id'))
+    entries = list(entries)
+    # Пустой канал при полном обходе скорее означает смену формата ответа: пусть проверит yt-dlp
+    if not entries and known_ids is None:
+        raise ListingError(f"no videos found for {url}")
+    return {'entries': entries, 'playlist_count': len(entries)}
+
+# Список видео канала: сначала собственный постраничный обход, при ошибке —
+# плоский плейлист yt-dlp с настройками flat_opts
+def list_entries(platform, url, flat_opts, known_ids=None):
+    if NATIVE_LISTING and platform in LISTERS:
+        try:
+            return list_channel(platform, url, known_ids)
+        except Exception as e:
+            print(f"⚠️ Native {platform} listing failed for {url} ({e}), falling back to yt-dlp")
+    with extractor((platform, 'flat'), flat_opts) as flat_ydl, get_metrics().request(platform, 'listing_ytdlp'):
+        if known_ids is None:
+            return flat_ydl.extract_info(url, download=False)
+        return extract_new_entries(flat_ydl, url, known_ids)
@@ -0,0 +1,221 @@
+import math
+import re
+import sys
+from collections import Counter
+
+TITLE_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+# Функция для нормализации заголовков (удаление пробелов, пунктуации, регистра)
+def normalize_title(title):
+    return TITLE_PUNCTUATION_RE.sub('', title.lower()).strip()
+
+# Колонки итоговой таблицы в порядке вывода
+COLUMNS = [
+    'Название видео', 'Кто в видео?', 'YouTube link', 'Инфа',
+    'VK link', 'Инфа_1', 'RuTube link', 'Инфа_2',
+    'Сайт link', 'Инфа_3'
+]
+COLUMN_SET = frozenset(COLUMNS)
+# Колонки со ссылками: по ним определяем, с какой платформы строка
+LINK_COLUMNS = ['YouTube link', 'VK link', 'RuTube link', 'Сайт link']
+
+# Порог нечёткого совпадения названий (коэффициент Жаккара по значимым словам,
+# см. token_similarity); None отключает нечёткое объединение
+FUZZY_THRESHOLD = 0.8
+# Служебные слова не учитываются при сравнении названий
+STOPWORDS = frozenset('''
+    а в во да до за и из или к ко на над не ни о об обо от по под при про с со у
+    a an and at by for from in of on or the to with
+'''.split())
+# Известные суффиксы: название с таким суффиксом в конце — то же видео, что и без него
+# («Название» и «Название | Часть 2»). Проверяются по нормализованным названиям.
+KNOWN_SUFFIX_RE = re.compile(r'(?:\s*(?:(?:часть|ч|part|серия|выпуск|episode)\s*\d+|полная версия|full|hd|4k))+')
+# Слова, встречающиеся в названиях чаще этого, считаются служебными
+# и не используются для поиска кандидатов
+MAX_POSTING = 100
+
+# Значимые слова нормализованного названия
+def title_tokens(norm_title):
+    return frozenset(norm_title.split()) - STOPWORDS
+
+# Похожесть названий — доля общих слов среди всех слов обоих названий (Жаккар).
+# tokens_b может быть и кортежем различных слов (так они хранятся в TitleIndex)
+def token_similarity(tokens_a, tokens_b):
+    if not tokens_a or not tokens_b:
+        return 0.0
+    common = len(tokens_a.intersection(tokens_b))
+    return common / (len(tokens_a) + len(tokens_b) - common)
+
+# Длинное название — это короткое плюс известный суффикс («| Часть 2», «HD»)
+def suffix_contained(short, long):
+    return (len(short) < len(long) and long.startswith(short + ' ')
+            and KNOWN_SUFFIX_RE.fullmatch(long, len(short)) is not None)
+
+# Название без известных суффиксов в конце (или само название, если их нет)
+def strip_known_suffix(norm_title):
+    words = norm_title.split(' ')
+    for size in range(1, len(words)):
+        base = ' '.join(words[:size])
+        if suffix_contained(base, norm_title):
+            return base
+    return norm_title
+
+NO_NUMBERS = frozenset()
+
+def title_numbers(tokens):
+    return frozenset(token for token in tokens if token.isdigit()) or NO_NUMBERS
+
+# Разные номера («Часть 1» / «Часть 2», «2023» / «2024») означают разные видео
+def numbers_conflict(numbers_a, numbers_b):
+    return bool(numbers_a - numbers_b) and bool(numbers_b - numbers_a)
+
+# Инвертированный индекс слов названий для поиска похожих названий без сравнения всех со всеми.
+# Общие слова с каждым кандидатом считаются по спискам вхождений (Counter.update работает на C),
+# поэтому полное сравнение выполняется только для кандидатов, которые могут пройти порог.
+# Слишком частые слова (MAX_POSTING) в подсчёте не участвуют, как служебные.
+class TitleIndex:
+    def __init__(self, threshold=FUZZY_THRESHOLD, max_posting=MAX_POSTING):
+        self.threshold = threshold
+        self.max_posting = max_posting
+        self._postings = {}
+        self._titles = []
+        self._tokens = []
+        self._numbers = []
+
+    def add(self, norm_title):
+        item_id = len(self._tokens)
+        # Слова храним кортежем общих (sys.intern) строк: frozenset и отдельные
+        # копии слов на каждое название занимали бы в несколько раз больше памяти
+        tokens = tuple(sys.intern(token) for token in title_tokens(norm_title))
+        self._titles.append(norm_title)
+        self._tokens.append(tokens)
+        self._numbers.append(title_numbers(tokens))
+        for token in tokens:
+            self._postings.setdefault(token, []).append(item_id)
+        return item_id
+
+    # Запоминаем номера из названия, объединённого с item_id, чтобы к строке
+    # «Часть 1» потом не присоединилась «Часть 2»
+    def add_numbers(self, item_id, norm_title):
+        self._numbers[item_id] = self._numbers[item_id] | title_numbers(title_tokens(norm_title))
+
+    # Возвращает id самого похожего названия (при равенстве — добавленного раньше),
+    # для которого accept(item_id) истинно, или None. Похожими считаются названия
+    # с коэффициентом Жаккара не ниже порога и названия, отличающиеся известным суффиксом.
+    def find(self, norm_title, accept=None):
+        tokens = title_tokens(norm_title)
+        if not tokens:
+            return None
+        hits = Counter()
+        frequent = []
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            if len(posting) > self.max_posting:
+                frequent.append(posting)
+            else:
+                hits.update(posting)
+        if not hits and frequent:
+            # Редких слов нет: проверяем последние названия с самым редким из частых слов
+            hits.update(min(frequent, key=len)[-self.max_posting:])
+
+        # Сколько общих слов нужно как минимум: для порога Жаккара — доля слов этого
+        # названия, для суффикса — все слова названия без суффикса; частые слова тоже
+        # могут оказаться общими, поэтому вычитаем их
+        required = min(math.ceil(self.threshold * len(tokens)),
+                       len(title_tokens(strip_known_suffix(norm_title))))
+        need = max(1, required - len(frequent))
+        candidates = sorted(item_id for item_id, count in hits.items() if count >= need)
+
+        numbers = title_numbers(tokens)
+        best_id, best_score = None, self.threshold
+        for item_id in candidates:
+            other = self._titles[item_id]
+            if suffix_contained(norm_title, other) or suffix_contained(other, norm_title):
+                score = 1.0
+            else:
+                score = token_similarity(tokens, self._tokens[item_id])
+            if score < best_score or (best_id is not None and score == best_score):
+                continue
+            if numbers_conflict(numbers, self._numbers[item_id]):
+                continue
+            if accept is not None and not accept(item_id):
+                continue
+            best_id, best_score = item_id, score
+        return best_id
+
+# Потоковое объединение дубликатов по normalized_title.
+# Хранится одна копия каждой уникальной строки; пустые ячейки заполняются
+# из других записей с тем же названием («первое непустое значение побеждает»).
+# «Первой» считается запись из источника с меньшим номером (а внутри источника —
+# пришедшая раньше), поэтому результат не зависит от того, в каком порядке
+# параллельные парсеры отдают записи.
+# При выводе строки с разных платформ дополнительно объединяются по похожести
+# названий (fuzzy_threshold): почти все значимые слова общие или добавлен суффикс «| Часть 2».
+# Если у записи нет normalized_title, он вычисляется из названия.
+# Записи — словари или VideoRecord (читаются через items()); строки результата содержат
+# только заполненные колонки, полный набор колонок (COLUMNS) подставляют писатели.
+class VideoMerger:
+    def __init__(self, fuzzy_threshold=FUZZY_THRESHOLD):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.fuzzy_merged = 0
+        self._rows = {}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, video, source_index=0):
+        self._seq += 1
+        key = (source_index, self._seq)
+        norm_title = video.get('normalized_title')
+        if norm_title is None:
+            norm_title = normalize_title(video.get('Название видео') or '')
+        existing = self._rows.get(norm_title)
+        if existing is None:
+            # Строка хранит только заполненные ячейки; для каждой помним ключ записи,
+            # из которой взято значение
+            self._rows[norm_title] = [key, {}, {}]
+            existing = self._rows[norm_title]
+        merged, cell_keys = existing[1], existing[2]
+        existing[0] = min(existing[0], key)
+        for column, value in video.items():
+            if value and column in COLUMN_SET and (column not in cell_keys or key < cell_keys[column]):
+                merged[column] = value
+                cell_keys[column] = key
+
+    # Уникальные строки (normalized_title, row) в порядке первого появления
+    def _groups(self):
+        for norm_title, (key, row, cell_keys) in sorted(self._rows.items(), key=lambda item: item[1][0]):
+            yield norm_title, row
+
+    # Объединённые строки в порядке первого появления
+    def rows(self):
+        if not self.fuzzy_threshold:
+            for norm_title, row in self._groups():
+                yield row
+            return
+
+        index = TitleIndex(self.fuzzy_threshold)
+        merged = []
+        for norm_title, row in self._groups():
+            # Объединяем только строки с разных платформ: ссылки не должны пересекаться
+            target = index.find(norm_title, lambda item_id: links_compatible(merged[item_id], row))
+            if target is None:
+                index.add(norm_title)
+                merged.append(row)
+            else:
+                fill_empty(merged[target], row)
+                index.add_numbers(target, norm_title)
+                self.fuzzy_merged += 1
+        yield from merged
+
+# Заполняем пустые ячейки строки first значениями из second
+def fill_empty(first, second):
+    for column in COLUMNS:
+        if not first.get(column) and second.get(column):
+            first[column] = second[column]
+
+def links_compatible(row_a, row_b):
+    return all(not row_a.get(column) or not row_b.get(column) for column in LINK_COLUMNS)
@@ -0,0 +1,147 @@
+import sqlite3
+import threading
+import time
+
+# Файл кэша метаданных (рядом со скриптом)
+CACHE_FILE = 'video_cache.sqlite'
+# Время жизни записи в кэше по платформам (секунды)
+CACHE_TTL = {
+    'vk': 30 * 24 * 3600,
+    'rutube': 30 * 24 * 3600,
+}
+DEFAULT_CACHE_TTL = 7 * 24 * 3600
+# Максимальное количество записей; самые давно использованные вытесняются
+CACHE_MAX_ENTRIES = 200000
+# Сколько секунд ждать, пока файл кэша занят другим процессом (воркеры, демон)
+CACHE_TIMEOUT = 30
+# Время обращения к записям записывается пачками по столько записей
+ACCESS_BATCH_SIZE = 1000
+
+# Кэш полных метаданных видео: (platform, video_id) -> title, webpage_url.
+# Файл могут открывать несколько процессов (локальные воркеры, демон и cli.py),
+# поэтому транзакции записи короткие и сразу фиксируются: get() только читает,
+# а время обращения копится в памяти и записывается одной транзакцией
+class MetadataCache:
+    def __init__(self, path=CACHE_FILE, ttl=None, max_entries=CACHE_MAX_ENTRIES, timeout=CACHE_TIMEOUT):
+        self.path = path
+        self.ttl = dict(CACHE_TTL, **(ttl or {}))
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (platform, video_id) -> время последнего обращения, ещё не записанное в файл
+        self._accessed = {}
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS videos (
+                platform TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                title TEXT,
+                webpage_url TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (platform, video_id)
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS videos_accessed ON videos (accessed_at)')
+        self._conn.commit()
+
+    # Возвращает {'title', 'webpage_url'} или None, если записи нет или она устарела
+    def get(self, platform, video_id):
+        ttl = self.ttl.get(platform, DEFAULT_CACHE_TTL)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT title, webpage_url, fetched_at FROM videos WHERE platform = ? AND video_id = ?',
+                (platform, video_id),
+            ).fetchone()
+            # Записи без названия или ссылки (от прежних версий) считаем промахом
+            if row is None or now - row[2] > ttl or not row[0] or not row[1]:
+                self.misses += 1
+                return None
+            self._accessed[(platform, video_id)] = now
+            self.hits += 1
+            if len(self._accessed) >= ACCESS_BATCH_SIZE:
+                self._write_accessed()
+                self._conn.commit()
+        return {'title': row[0], 'webpage_url': row[1]}
+
+    def put(self, platform, video_id, title, webpage_url):
+        now = time.time()
+        with self._lock:
+            self._accessed.pop((platform, video_id), None)
+            self._write_accessed()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?)',
+                (platform, video_id, title, webpage_url, now, now),
+            )
+            self._conn.commit()
+
+    # Записываем накопленное время обращения (вызывается под self._lock, фиксирует вызывающий)
+    def _write_accessed(self):
+        if self._accessed:
+            self._conn.executemany(
+                'UPDATE videos SET accessed_at = ? WHERE platform = ? AND video_id = ?',
+                [(accessed_at, platform, video_id) for (platform, video_id), accessed_at in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    # Удаляем самые давно использованные записи сверх max_entries
+    def evict(self):
+        with self._lock:
+            self._write_accessed()
+            count = self._conn.execute('SELECT COUNT(*) FROM videos').fetchone()[0]
+            extra = count - self.max_entries
+            if extra > 0:
+                self._conn.execute(
+                    'DELETE FROM videos WHERE rowid IN '
+                    '(SELECT rowid FROM videos ORDER BY accessed_at LIMIT ?)',
+                    (extra,),
+                )
+            self._conn.commit()
+        return max(extra, 0)
+
+    # Удаляем устаревшие записи (старше TTL своей платформы)
+    def expire(self):
+        now = time.time()
+        removed = 0
+        with self._lock:
+            self._write_accessed()
+            platforms = [row[0] for row in self._conn.execute('SELECT DISTINCT platform FROM videos')]
+            for platform in platforms:
+                ttl = self.ttl.get(platform, DEFAULT_CACHE_TTL)
+                removed += self._conn.execute(
+                    'DELETE FROM videos WHERE platform = ? AND fetched_at < ?', (platform, now - ttl),
+                ).rowcount
+            self._conn.commit()
+        return removed
+
+    # Количество записей по платформам
+    def stats(self):
+        with self._lock:
+            return dict(self._conn.execute('SELECT platform, COUNT(*) FROM videos GROUP BY platform ORDER BY platform'))
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Общий кэш процесса (открывается при первом обращении)
+def get_cache(path=CACHE_FILE):
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetadataCache(path)
+        return _cache
+
+# Закрываем общий кэш процесса; следующий get_cache() откроет его заново
+def close_cache():
+    global _cache
+    with _cache_lock:
+        cache, _cache = _cache, None
+    if cache is not None:
+        cache.close()
@@ -0,0 +1,198 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+
+# Файл метрик последнего запуска (JSON)
+METRICS_FILE = 'crawl_metrics.json'
+
+# Границы корзин гистограммы задержек запросов (секунды)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Префикс имён в формате Prometheus
+PROMETHEUS_PREFIX = 'video_parser_'
+
+# Метрики по платформам и этапам: счётчики и гистограммы с метками.
+# Все методы потокобезопасны: их вызывают потоки обогащения и источников.
+class Metrics:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    # Увеличиваем счётчик name с метками labels
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    # Добавляем наблюдение в гистограмму name
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+                    break
+            else:
+                histogram['counts'][-1] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    # Время выполнения блока прибавляется к счётчику name (секунды)
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.inc(name, time.perf_counter() - start, **labels)
+
+    # Время запроса попадает в гистограмму request_seconds, результат — в requests_total
+    @contextlib.contextmanager
+    def request(self, platform, stage):
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            yield
+            status = 'ok'
+        finally:
+            self.observe('request_seconds', time.perf_counter() - start, platform=platform, stage=stage)
+            self.inc('requests_total', platform=platform, stage=stage, status=status)
+
+    def snapshot(self):
+        with self._lock:
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': round(value, 6) if isinstance(value, float) else value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = []
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(self.buckets + ('+Inf',), histogram['counts']):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                histograms.append({
+                    'name': name,
+                    'labels': dict(labels),
+                    'buckets': buckets,
+                    'sum': round(histogram['sum'], 6),
+                    'count': histogram['count'],
+                })
+        return {
+            'started_at': self.started_at,
+            'finished_at': time.time(),
+            'summary': summarize(counters, histograms),
+            'counters': counters,
+            'histograms': histograms,
+        }
+
+    def write_json(self, path):
+        write_atomic(path, json.dumps(self.snapshot(), ensure_ascii=False, indent=1))
+
+    # Текстовый формат Prometheus (для node_exporter textfile collector)
+    def write_prometheus(self, path):
+        snapshot = self.snapshot()
+        lines = []
+        declared = set()
+        for counter in snapshot['counters']:
+            name = PROMETHEUS_PREFIX + counter['name']
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f"{name}{prometheus_labels(counter['labels'])} {counter['value']}")
+        for histogram in snapshot['histograms']:
+            name = PROMETHEUS_PREFIX + histogram['name']
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            for bound, count in histogram['buckets'].items():
+                lines.append(f"{name}_bucket{prometheus_labels(dict(histogram['labels'], le=bound))} {count}")
+            lines.append(f"{name}_sum{prometheus_labels(histogram['labels'])} {histogram['sum']}")
+            lines.append(f"{name}_count{prometheus_labels(histogram['labels'])} {histogram['count']}")
+        write_atomic(path, '\n'.join(lines) + '\n')
+
+def prometheus_labels(labels):
+    if not labels:
+        return ''
+    values = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in sorted(labels.items())
+    )
+    return '{' + values + '}'
+
+def write_atomic(path, text):
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_file, path)
+
+# Сводка по платформам и этапам: куда ушло время — сеть, ожидание ограничителя или запись
+def summarize(counters, histograms):
+    platforms = {}
+    stages = {}
+
+    def platform(name):
+        return platforms.setdefault(name, {
+            'requests': 0, 'errors': 0, 'retries': 0, 'request_seconds': 0.0,
+            'rate_limit_sleep_seconds': 0.0, 'retry_sleep_seconds': 0.0, 'throttles': 0, 'cache_hits': 0, 'cache_misses': 0,
+            'enrich_skipped': 0, 'enrich_failed': 0, 'circuit_breaks': 0, 'videos': 0,
+        })
+
+    for counter in counters:
+        labels, value = counter['labels'], counter['value']
+        name = counter['name']
+        if name == 'stage_seconds_total':
+            stage = labels['stage'] + (f":{labels['platform']}" if 'platform' in labels else '')
+            stages[stage] = round(stages.get(stage, 0) + value, 3)
+        elif 'platform' not in labels:
+            continue
+        elif name == 'requests_total':
+            platform(labels['platform'])['requests'] += value
+            if labels.get('status') != 'ok':
+                platform(labels['platform'])['errors'] += value
+        elif name == 'cache_total':
+            platform(labels['platform'])['cache_hits' if labels['result'] == 'hit' else 'cache_misses'] += value
+        elif name == 'enrich_total':
+            if labels['result'] == 'flat':
+                platform(labels['platform'])['enrich_skipped'] += value
+            elif labels['result'] == 'failed':
+                platform(labels['platform'])['enrich_failed'] += value
+        elif name in ('retries_total', 'throttles_total', 'videos_total', 'circuit_breaks_total'):
+            platform(labels['platform'])[name[:-len('_total')]] += value
+        elif name in ('rate_limit_sleep_seconds_total', 'retry_sleep_seconds_total'):
+            platform(labels['platform'])[name[:-len('_total')]] += value
+    for histogram in histograms:
+        if histogram['name'] == 'request_seconds':
+            platform(histogram['labels']['platform'])['request_seconds'] += histogram['sum']
+    for stats in platforms.values():
+        for key in ('request_seconds', 'rate_limit_sleep_seconds', 'retry_sleep_seconds'):
+            stats[key] = round(stats[key], 3)
+    return {'platforms': platforms, 'stages': stages}
+
+# Общие метрики процесса; у задания демона — свои (scope_metrics)
+_metrics = Metrics()
+_job_metrics = contextvars.ContextVar('metrics', default=_metrics)
+
+def get_metrics():
+    return _job_metrics.get()
+
+# Отдельные метрики для текущего контекста и запущенных из него потоков (job_context.py)
+def scope_metrics():
+    metrics = Metrics()
+    _job_metrics.set(metrics)
+    return metrics
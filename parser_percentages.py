@@ -1,15 +1,14 @@
-import yt_dlp
-import scrapetube
-import pandas as pd
 import time
-import re
-import os
+import copy
+import sys
 from tqdm import tqdm
 
-# Функция для нормализации заголовков (удаление пробелов, пунктуации, регистра)
-def normalize_title(title):
-    title = re.sub(r'[^\w\s]', '', title.lower()).strip()
-    return title
+from client import crawl_via_daemon
+from crawl import SourceError, youtube_channel_id
+from video_record import VideoRecord
+
+# Модули обхода (yt_dlp, openpyxl) загружаются при первом вызове парсеров: если
+# обход выполняет демон (см. конец файла), этому процессу они не нужны
 
 # Функция для форматирования времени в ЧЧ:ММ:СС
 def format_time(seconds):
@@ -18,16 +17,6 @@ def format_time(seconds):
     seconds = int(seconds % 60)
     return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
-# Функция для определения платформы по URL
-def detect_platform(url):
-    if 'youtube.com' in url or 'youtu.be' in url:
-        return 'youtube'
-    elif 'vkvideo.ru' in url or 'vk.com' in url:
-        return 'vk'
-    elif 'rutube.ru' in url:
-        return 'rutube'
-    return None
-
 # Базовые настройки yt-dlp
 base_opts = {
     'quiet': True,
@@ -41,69 +30,72 @@ base_opts = {
 }
 
 # Парсер YouTube
-def parse_youtube(url):
-    video_data = []
-    ydl_opts = base_opts.copy()
+def parse_youtube(url, known_ids=None, skip_ids=None):
+    from listing import youtube_entries
+    from ydl_pool import extractor
+
+    ydl_opts = copy.deepcopy(base_opts)
     ydl_opts['extract_flat'] = True
     ydl_opts['http_headers']['Referer'] = 'https://youtube.com/'
     
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        try:
-            channel_info = ydl.extract_info(url, download=False)
-            channel_id = channel_info.get('channel_id', None)
-            if not channel_id:
-                print(f"❌ Could not extract channel_id for {url}")
-                return video_data
-        except Exception as e:
-            print(f"❌ Error extracting channel_id for {url}: {e}")
-            return video_data
+    # channel_id берём из ссылки вида /channel/UC..., иначе спрашиваем yt-dlp
+    channel_id = youtube_channel_id(url)
+    if channel_id is None:
+        with extractor(('youtube', 'flat'), ydl_opts) as ydl:
+            try:
+                channel_info = ydl.extract_info(url, download=False)
+            except Exception as e:
+                raise SourceError(f"Error extracting channel_id: {e}") from e
+        channel_id = channel_info.get('channel_id', None)
+        if not channel_id:
+            raise SourceError("Could not extract channel_id")
     
     try:
-        videos = list(scrapetube.get_channel(channel_id))  # Преобразуем в список для подсчёта
-        total_videos = len(videos)
+        videos = youtube_entries(channel_id, known_ids)
+        if skip_ids:
+            # Видео, уже сохранённые в журнале обхода, пропускаем
+            videos = (video for video in videos if video['id'] not in skip_ids)
         for i, video in enumerate(tqdm(videos, desc="Parsing YouTube", unit="video")):
             try:
-                title = video['title']['runs'][0]['text']
-                video_url = f"https://youtube.com/watch?v={video['videoId']}"
-                video_data.append({
-                    'Название видео': title,
-                    'normalized_title': normalize_title(title),
-                    'YouTube link': video_url,
-                    'VK link': '',
-                    'RuTube link': '',
-                    'Сайт link': '',
-                    'Кто в видео?': '',
-                    'Инфа': '',
-                    'Инфа_1': '',
-                    'Инфа_2': '',
-                    'Инфа_3': ''
-                })
-                time.sleep(0.1)
+                yield VideoRecord(video['title'], video['id'], 'YouTube link', video['url'])
             except Exception as e:
-                print(f"⚠️ Failed to process YouTube video {i+1}/{total_videos}")
+                print(f"⚠️ Failed to process YouTube video {i+1}")
     except Exception as e:
-        print(f"❌ Error fetching YouTube videos: {e}")
-    
-    return video_data
+        raise SourceError(f"Error fetching YouTube videos: {e}") from e
 
 # Парсер VK
-def parse_vk(url):
-    video_data = []
-    flat_opts = base_opts.copy()
+def parse_vk(url, workers=None, known_ids=None, skip_ids=None):
+    from enrichment import enrich_entries
+    from listing import list_entries
+    from metadata_cache import get_cache
+
+    flat_opts = copy.deepcopy(base_opts)
     flat_opts['extract_flat'] = True
     flat_opts['http_headers']['Referer'] = 'https://vkvideo.ru/'
     flat_opts['extractor_args'] = {'vk': {'skip_auth': True}}
     
-    with yt_dlp.YoutubeDL(flat_opts) as flat_ydl:
-        try:
-            playlist_info = flat_ydl.extract_info(url, download=False)
-            total_videos = playlist_info.get('playlist_count', 0)
-        except Exception as e:
-            print(f"❌ VK playlist extraction error for {url}: {e}")
-            return video_data
+    try:
+        playlist_info = list_entries('vk', url, flat_opts, known_ids)
+        total_videos = playlist_info.get('playlist_count', 0)
+    except Exception as e:
+        raise SourceError(f"VK playlist extraction error: {e}") from e
+    
+    if 'entries' in playlist_info and skip_ids:
+        # Видео, уже сохранённые в журнале обхода, повторно не запрашиваем
+        playlist_info['entries'] = [
+            entry for entry in playlist_info['entries']
+            if entry is None or entry.get('id') not in skip_ids
+        ]
+        total_videos = len(playlist_info['entries'])
     
     if 'entries' in playlist_info:
-        for i, entry in enumerate(tqdm(playlist_info['entries'], total=total_videos, desc="Parsing VK", unit="video")):
+        full_opts = copy.deepcopy(base_opts)
+        full_opts['extract_flat'] = False
+        full_opts['http_headers']['Referer'] = 'https://vkvideo.ru/'
+        full_opts['extractor_args'] = {'vk': {'skip_auth': True}}
+        
+        entries = enrich_entries(playlist_info['entries'], 'vk', full_opts, workers, get_cache())
+        for i, (entry, full_entry, error) in enumerate(tqdm(entries, total=total_videos, desc="Parsing VK", unit="video")):
             if entry is None:
                 print(f"⚠️ Skipping empty VK entry {i+1}/{total_videos}")
                 continue
@@ -113,152 +105,89 @@ def parse_vk(url):
                 owner_id, vid_id = video_id.split('_', 1)
                 video_url = f"https://vkvideo.ru/video{owner_id}_{vid_id}"
             else:
-                video_url = entry.get('url', 'No URL')
+                video_url = entry.get('url') or 'No URL'
             
-            title = entry.get('title', 'No title')
+            title = entry.get('title') or 'No title'
             
-            try:
-                full_opts = base_opts.copy()
-                full_opts['extract_flat'] = False
-                full_opts['http_headers']['Referer'] = 'https://vkvideo.ru/'
-                full_opts['extractor_args'] = {'vk': {'skip_auth': True}}
-                with yt_dlp.YoutubeDL(full_opts) as full_ydl:
-                    full_entry = full_ydl.extract_info(entry['url'], download=False)
-                    title = full_entry.get('title', title)
-                    video_url = full_entry.get('webpage_url', video_url)
-            except Exception as e:
+            if full_entry is not None:
+                title = full_entry.get('title') or title
+                video_url = full_entry.get('webpage_url') or video_url
+            else:
                 print(f"⚠️ Failed to process VK video {i+1}/{total_videos}")
             
-            video_data.append({
-                'Название видео': title,
-                'normalized_title': normalize_title(title),
-                'YouTube link': '',
-                'VK link': video_url,
-                'RuTube link': '',
-                'Сайт link': '',
-                'Кто в видео?': '',
-                'Инфа': '',
-                'Инфа_1': '',
-                'Инфа_2': '',
-                'Инфа_3': ''
-            })
-            time.sleep(1.5)
-    
-    return video_data
+            yield VideoRecord(title, video_id, 'VK link', video_url)
 
 # Парсер Rutube
-def parse_rutube(url):
-    video_data = []
-    flat_opts = base_opts.copy()
+def parse_rutube(url, workers=None, known_ids=None, skip_ids=None):
+    from enrichment import enrich_entries
+    from listing import list_entries
+    from metadata_cache import get_cache
+
+    flat_opts = copy.deepcopy(base_opts)
     flat_opts['extract_flat'] = True
     flat_opts['http_headers']['Referer'] = 'https://rutube.ru/'
     flat_opts['extractor_args'] = {'rutube': {'skip_auth': True}}
     
-    with yt_dlp.YoutubeDL(flat_opts) as flat_ydl:
-        try:
-            playlist_info = flat_ydl.extract_info(url, download=False)
-            total_videos = playlist_info.get('playlist_count', 0)
-        except Exception as e:
-            print(f"❌ Rutube playlist extraction error for {url}: {e}")
-            return video_data
+    try:
+        playlist_info = list_entries('rutube', url, flat_opts, known_ids)
+        total_videos = playlist_info.get('playlist_count', 0)
+    except Exception as e:
+        raise SourceError(f"Rutube playlist extraction error: {e}") from e
+    
+    if 'entries' in playlist_info and skip_ids:
+        # Видео, уже сохранённые в журнале обхода, повторно не запрашиваем
+        playlist_info['entries'] = [
+            entry for entry in playlist_info['entries']
+            if entry is None or entry.get('id') not in skip_ids
+        ]
+        total_videos = len(playlist_info['entries'])
     
     if 'entries' in playlist_info:
-        for i, entry in enumerate(tqdm(playlist_info['entries'], total=total_videos, desc="Parsing RuTube", unit="video")):
+        full_opts = copy.deepcopy(base_opts)
+        full_opts['extract_flat'] = False
+        full_opts['http_headers']['Referer'] = 'https://rutube.ru/'
+        full_opts['extractor_args'] = {'rutube': {'skip_auth': True}}
+        
+        entries = enrich_entries(playlist_info['entries'], 'rutube', full_opts, workers, get_cache())
+        for i, (entry, full_entry, error) in enumerate(tqdm(entries, total=total_videos, desc="Parsing RuTube", unit="video")):
             if entry is None:
                 print(f"⚠️ Skipping empty RuTube entry {i+1}/{total_videos}")
                 continue
             
             video_id = entry.get('id', 'unknown')
             video_url = f"https://rutube.ru/video/{video_id}/"
-            title = entry.get('title', 'No title')
+            title = entry.get('title') or 'No title'
             
-            try:
-                full_opts = base_opts.copy()
-                full_opts['extract_flat'] = False
-                full_opts['http_headers']['Referer'] = 'https://rutube.ru/'
-                full_opts['extractor_args'] = {'rutube': {'skip_auth': True}}
-                with yt_dlp.YoutubeDL(full_opts) as full_ydl:
-                    full_entry = full_ydl.extract_info(entry['url'], download=False)
-                    title = full_entry.get('title', title)
-                    video_url = full_entry.get('webpage_url', video_url)
-            except Exception as e:
+            if full_entry is not None:
+                title = full_entry.get('title') or title
+                video_url = full_entry.get('webpage_url') or video_url
+            else:
                 print(f"⚠️ Failed to process RuTube video {i+1}/{total_videos}")
             
-            video_data.append({
-                'Название видео': title,
-                'normalized_title': normalize_title(title),
-                'YouTube link': '',
-                'VK link': '',
-                'RuTube link': video_url,
-                'Сайт link': '',
-                'Кто в видео?': '',
-                'Инфа': '',
-                'Инфа_1': '',
-                'Инфа_2': '',
-                'Инфа_3': ''
-            })
-            time.sleep(1.5)
-    
-    return video_data
-
-# Основная логика
-start_time = time.time()
+            yield VideoRecord(title, video_id, 'RuTube link', video_url)
 
-urls = input("Введите ссылки через запятую (YouTube, VK, Rutube): ").strip().split(',')
-urls = [url.strip() for url in urls if url.strip()]
+# Парсеры по платформам (для pipeline.run_crawl и cli.py)
+PARSERS = {
+    'youtube': parse_youtube,
+    'vk': parse_vk,
+    'rutube': parse_rutube,
+}
 
-all_videos = []
+# Интерактивный запуск; для запуска без диалога см. cli.py
+if __name__ == '__main__':
+    start_time = time.time()
 
-for url in urls:
-    platform = detect_platform(url)
-    if not platform:
-        print(f"❌ Unsupported platform for URL: {url}")
-        continue
-    
-    if platform == 'youtube':
-        all_videos.extend(parse_youtube(url))
-    elif platform == 'vk':
-        all_videos.extend(parse_vk(url))
-    elif platform == 'rutube':
-        all_videos.extend(parse_rutube(url))
+    urls = input("Введите ссылки через запятую (YouTube, VK, Rutube): ").strip().split(',')
+    urls = [url.strip() for url in urls if url.strip()]
 
-# Объединение дубликатов по normalized_title
-if all_videos:
-    video_dict = {}
-    for video in all_videos:
-        norm_title = video['normalized_title']
-        if norm_title in video_dict:
-            video_dict[norm_title]['YouTube link'] = video_dict[norm_title]['YouTube link'] or video['YouTube link']
-            video_dict[norm_title]['VK link'] = video_dict[norm_title]['VK link'] or video['VK link']
-            video_dict[norm_title]['RuTube link'] = video_dict[norm_title]['RuTube link'] or video['RuTube link']
-            video_dict[norm_title]['Название видео'] = video_dict[norm_title]['Название видео'] or video['Название видео']
-        else:
-            video_dict[norm_title] = video
-    
-    merged_videos = list(video_dict.values())
-    
-    for video in merged_videos:
-        del video['normalized_title']
-    
-    output_file = 'videos.xlsx'
-    try:
-        df = pd.DataFrame(merged_videos, columns=[
-            'Название видео', 'Кто в видео?', 'YouTube link', 'Инфа',
-            'VK link', 'Инфа_1', 'RuTube link', 'Инфа_2',
-            'Сайт link', 'Инфа_3'
-        ])
-        df.to_excel(output_file, index=False, engine='openpyxl')
-        print(f"✅ Saved {len(merged_videos)} unique videos to {output_file}")
-        if os.path.exists(output_file):
-            print(f"File {output_file} exists, size: {os.path.getsize(output_file)} bytes")
-        else:
-            print(f"❌ File {output_file} was not created")
-    except Exception as e:
-        print(f"❌ Error saving to XLSX: {e}")
-else:
-    print("❌ No video data to save.")
+    # --resume: продолжаем прерванный обход по журналу, не запрашивая уже обработанные видео
+    resume = '--resume' in sys.argv[1:]
+    # Если запущен демон (python cli.py daemon), обход выполняет он, иначе — этот процесс
+    if crawl_via_daemon(urls, resume=resume) is None:
+        from pipeline import run_crawl
+        run_crawl(urls, PARSERS, resume=resume)
 
-end_time = time.time()
-execution_time = end_time - start_time
-print(f"Total execution time: {format_time(execution_time)}")
-input("Готово! Проверьте videos.xlsx — ссылки должны открывать видео для просмотра.")
\ No newline at end of file
+    end_time = time.time()
+    execution_time = end_time - start_time
+    print(f"Total execution time: {format_time(execution_time)}")
+    input("Готово! Проверьте файл результата — ссылки должны открывать видео для просмотра.")
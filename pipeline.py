@@ -0,0 +1,256 @@
+import os
+
+from crawl import detect_platform, iter_sources
+from circuit_breaker import breaker_stats
+from enrichment import DEFERRED_RETRIES, clear_unresolved, enrichment_stats, unresolved_entries
+from journal import CrawlJournal, JOURNAL_FILE, resumable
+from merge import VideoMerger
+from metadata_cache import CACHE_FILE, close_cache, get_cache
+from metrics import METRICS_FILE, get_metrics
+from rate_limiter import limiter_stats
+from sync_state import SYNC_STATE_FILE, SyncState
+from upsert import can_upsert, upsert_xlsx
+from writers import read_rows, write_rows
+
+# Файл результата; формат определяется расширением (.xlsx, .csv, .jsonl, .parquet)
+# или задаётся явно через output_format
+OUTPUT_FILE = 'videos.xlsx'
+
+# Инкрементальный режим: если файл результата уже есть, добавляем в него только новые видео
+INCREMENTAL_SYNC = True
+
+# Существующий XLSX не перезаписывается, а обновляется на месте (upsert.py):
+# ручные колонки и оформление книги сохраняются
+UPSERT_XLSX = True
+
+# Коды завершения
+EXIT_OK = 0
+EXIT_FAILED = 1
+
+# Логируем строки по мере записи
+def log_rows(rows):
+    print("Data to be saved:")
+    for row in rows:
+        print(row)
+        yield row
+
+# Добавляем в объединение строки ранее сохранённого результата
+# (normalized_title вычисляет объединение)
+def load_existing(merger, output_file, output_format=None):
+    count = 0
+    for video in read_rows(output_file, output_format):
+        merger.add(video, source_index=-1)
+        count += 1
+    return count
+
+# Время работы парсера и число полученных видео попадают в метрики
+def timed(parse, platform):
+    def run(url, **kwargs):
+        metrics = get_metrics()
+        with metrics.timer('stage_seconds_total', stage='parse', platform=platform):
+            for video in parse(url, **kwargs):
+                metrics.inc('videos_total', platform=platform)
+                yield video
+    return run
+
+# Задания по ссылкам: (platform, url, kwargs) для парсера платформы.
+# Ссылки неподдерживаемых платформ пропускаются.
+def plan_tasks(urls, sync_state, incremental=False, enrich_workers=None, verbose=False):
+    tasks = []
+    for url in urls:
+        platform = detect_platform(url)
+        if not platform:
+            print(f"❌ Unsupported platform for URL: {url}")
+            continue
+
+        if verbose:
+            print(f"Queued {platform.upper()} URL: {url}")
+        kwargs = {'known_ids': sync_state.known_ids(url) if incremental else None}
+        if enrich_workers and platform in enrich_workers:
+            kwargs['workers'] = enrich_workers[platform]
+        tasks.append((platform, url, kwargs))
+    return tasks
+
+# Объединяем новые записи со строками существующего файла (в инкрементальном режиме)
+# и сохраняем результат; существующий XLSX обновляется на месте. Возвращает код завершения.
+def save_results(merger, new_videos, output_file, output_format=None, incremental=False, verbose=False, failed=0):
+    metrics = get_metrics()
+    try:
+        if not new_videos:
+            # Если часть ссылок не удалось обойти, «новых видео нет» — не успех
+            if incremental and not failed:
+                print("✅ No new videos since the last run.")
+                return EXIT_OK
+            print("❌ No video data to save.")
+            return EXIT_FAILED
+
+        if UPSERT_XLSX and can_upsert(output_file, output_format):
+            with metrics.timer('stage_seconds_total', stage='merge'):
+                rows = list(merger.rows())
+            with metrics.timer('stage_seconds_total', stage='write'):
+                result = upsert_xlsx(log_rows(rows) if verbose else rows, output_file)
+            print(f"✅ Added {result['appended']} new videos to {output_file}, "
+                  f"filled {result['updated_cells']} empty cells in {result['updated_rows']} existing rows")
+            if verbose:
+                print(f"Rows merged by fuzzy title matching: {merger.fuzzy_merged}, "
+                      f"matched to sheet rows: {result['fuzzy_matched']}")
+            return EXIT_OK
+
+        # Строки существующего файла имеют приоритет, чтобы сохранить заполненные вручную колонки.
+        # Если файл не удалось прочитать, не перезаписываем его.
+        if incremental:
+            try:
+                with metrics.timer('stage_seconds_total', stage='load_existing'):
+                    existing_count = load_existing(merger, output_file, output_format)
+            except Exception as e:
+                raise RuntimeError(f"can't read existing rows: {e}")
+            if verbose:
+                print(f"Loaded {existing_count} existing rows from {output_file}")
+
+        with metrics.timer('stage_seconds_total', stage='merge'):
+            rows = list(merger.rows())
+        with metrics.timer('stage_seconds_total', stage='write'):
+            saved = write_rows(log_rows(rows) if verbose else rows, output_file, output_format)
+        print(f"✅ Saved {saved} unique videos to {output_file}")
+        if verbose:
+            print(f"Rows merged by fuzzy title matching: {merger.fuzzy_merged}")
+        if not os.path.exists(output_file):
+            print(f"❌ File {output_file} was not created")
+            return EXIT_FAILED
+        print(f"File {output_file} exists, size: {os.path.getsize(output_file)} bytes")
+        return EXIT_OK
+    except Exception as e:
+        print(f"❌ Error saving to {output_file}: {e}")
+        return EXIT_FAILED
+
+# Итоги запуска: ограничители запросов, обогащение и кэш метаданных
+def report_stats(verbose=False):
+    # Статистика ограничителей запросов (для подбора RATE_LIMITS)
+    for platform, stats in limiter_stats().items():
+        if verbose:
+            print(f"Rate limiter {platform}: {stats['rate']} req/s, throttled {stats['throttles']} times, "
+                  f"{stats['requests']} requests, waited {stats['waited']} s")
+        elif stats['throttles']:
+            print(f"⚠️ {platform} throttled {stats['throttles']} times, rate lowered to {stats['rate']} req/s")
+
+    # Сколько полных запросов удалось избежать благодаря данным плоского плейлиста
+    for platform, stats in enrichment_stats().items():
+        total = sum(stats.values())
+        if verbose:
+            print(f"Enrichment {platform}: {stats['flat']} of {total} videos complete in the playlist, "
+                  f"{stats['cached']} from cache, {stats['fetched']} fetched, {stats['failed']} failed")
+        elif stats['flat']:
+            print(f"{platform}: {stats['flat']} of {total} full extractions skipped (playlist data was complete)")
+
+    # Паузы автомата отключения и записи, которые так и не удалось загрузить
+    for platform, stats in breaker_stats().items():
+        if stats['trips']:
+            print(f"⚠️ {platform} requests were paused {stats['trips']} times after repeated failures")
+    unresolved = unresolved_entries()
+    if unresolved:
+        print(f"⚠️ {len(unresolved)} videos are still unresolved after {DEFERRED_RETRIES} deferred retries "
+              f"(saved with the playlist title):")
+        for item in unresolved:
+            print(f"  {item['platform']} {item['url'] or item['id']}: {item['error']}")
+
+# Метрики запуска: запросы, задержки, повторы, кэш и ожидание ограничителей по платформам
+def save_metrics(metrics_file=METRICS_FILE, prometheus_file=None, verbose=False):
+    metrics = get_metrics()
+    try:
+        metrics.write_json(metrics_file)
+        if prometheus_file:
+            metrics.write_prometheus(prometheus_file)
+        if verbose:
+            print(f"Metrics saved to {metrics_file}" + (f" and {prometheus_file}" if prometheus_file else ''))
+    except OSError as e:
+        print(f"⚠️ Could not save metrics: {e}")
+
+# Полный цикл: парсинг ссылок, объединение дубликатов и сохранение результата.
+# parsers — парсеры по платформам ({'youtube': parse_youtube, ...}).
+# Возвращает код завершения: EXIT_OK, если результат сохранён или новых видео нет,
+# и EXIT_FAILED, если хотя бы одну ссылку не удалось обойти (собранное при этом сохраняется).
+# Метрики запуска пишутся в metrics_file (JSON) и, если задан, в prometheus_file.
+# keep_cache=True оставляет кэш метаданных открытым после запуска (режим демона).
+def run_crawl(urls, parsers, output_file=OUTPUT_FILE, output_format=None,
+              incremental=INCREMENTAL_SYNC, resume=False, verbose=False,
+              source_workers=None, enrich_workers=None, cache_file=CACHE_FILE,
+              state_file=SYNC_STATE_FILE, journal_file=JOURNAL_FILE,
+              metrics_file=METRICS_FILE, prometheus_file=None, keep_cache=False):
+    metrics = get_metrics()
+    metrics.reset()
+    clear_unresolved()
+
+    # Инкрементальный режим: листаем каналы только до первого уже известного видео
+    # и дописываем новые строки в существующий файл
+    incremental = incremental and os.path.exists(output_file)
+    sync_state = SyncState(state_file)
+    if incremental and verbose:
+        print(f"Incremental sync: only new videos will be added to {output_file}")
+
+    # resume: продолжаем прерванный обход по журналу, не запрашивая уже обработанные видео
+    journal = CrawlJournal(journal_file, resume=resume)
+    if resume and verbose:
+        print(f"Resuming from {journal.path}: {len(journal.completed)} sources completed, "
+              f"{sum(len(records) for records in journal.records.values())} videos journaled")
+
+    cache = get_cache(cache_file)
+    cache_hits, cache_misses = cache.hits, cache.misses
+
+    # Ссылки разных платформ обрабатываются параллельно (SOURCE_WORKERS в crawl.py)
+    tasks = [
+        (platform, url, timed(resumable(parsers[platform], journal), platform), kwargs)
+        for platform, url, kwargs in plan_tasks(urls, sync_state, incremental, enrich_workers, verbose)
+    ]
+
+    # Записи объединяются по мере поступления от парсеров: в памяти хранится
+    # только одна копия каждой уникальной строки
+    merger = VideoMerger()
+    parsed_ids = {url: [] for platform, url, parse, kwargs in tasks}
+    failed = {}
+    new_videos = 0
+    records = iter_sources(tasks, source_workers,
+                           on_done=lambda index: journal.complete(tasks[index][1]),
+                           on_failed=lambda index, error: failed.setdefault(tasks[index][1], error))
+    with metrics.timer('stage_seconds_total', stage='crawl'):
+        for index, video in records:
+            journal.record(tasks[index][1], video)
+            parsed_ids[tasks[index][1]].append(video['video_id'])
+            merger.add(video, source_index=index)
+            new_videos += 1
+
+    try:
+        exit_code = save_results(merger, new_videos, output_file, output_format, incremental, verbose, len(failed))
+        if exit_code == EXIT_OK and new_videos:
+            # Запоминаем обработанные видео только после успешного сохранения. Ссылки,
+            # которые не удалось обойти до конца, не запоминаем: иначе следующий
+            # инкрементальный запуск остановится на их первых видео.
+            for url, video_ids in parsed_ids.items():
+                if url not in failed:
+                    sync_state.add(url, video_ids)
+            # Результат сохранён — журнал обхода больше не нужен, если обойдены все ссылки
+            if not failed:
+                journal.close(remove=True)
+    finally:
+        sync_state.close()
+        if not journal.closed:
+            journal.close(remove=not new_videos and not failed)
+
+    if failed:
+        print(f"❌ Failed to crawl {len(failed)} of {len(tasks)} sources"
+              + (" (run again with --resume to continue):" if new_videos else ":"))
+        for url, error in failed.items():
+            print(f"  {url}: {error}")
+        exit_code = EXIT_FAILED
+
+    report_stats(verbose)
+
+    # Сохраняем кэш метаданных и вытесняем лишние записи
+    print(f"Metadata cache: {cache.hits - cache_hits} hits, {cache.misses - cache_misses} misses"
+          + (f" ({cache.path})" if verbose else ''))
+    if keep_cache:
+        cache.evict()
+    else:
+        close_cache()
+
+    save_metrics(metrics_file, prometheus_file, verbose)
+    return exit_code
@@ -0,0 +1,171 @@
+import threading
+import time
+
+from metrics import get_metrics
+
+# Частота запросов к платформе (запросов в секунду): начальная, минимальная и максимальная
+RATE_LIMITS = {
+    'youtube': {'rate': 5.0, 'min_rate': 0.5, 'max_rate': 20.0},
+    'vk': {'rate': 1.0, 'min_rate': 0.1, 'max_rate': 4.0},
+    'rutube': {'rate': 1.0, 'min_rate': 0.1, 'max_rate': 4.0},
+}
+DEFAULT_RATE_LIMIT = {'rate': 1.0, 'min_rate': 0.1, 'max_rate': 2.0}
+
+# Во сколько раз снижаем частоту при 429 / разрыве соединения
+BACKOFF_FACTOR = 0.5
+# Во сколько раз повышаем частоту после серии успешных запросов
+SPEEDUP_FACTOR = 1.2
+# Длина серии успешных запросов, после которой ускоряемся
+SUCCESS_STREAK = 20
+
+# Проверяем, означает ли ошибка, что платформа нас притормаживает (HTTP 429 или сброс соединения)
+def is_throttle_error(error):
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, ConnectionResetError):
+            return True
+        if getattr(error, 'status', None) == 429 or getattr(error, 'code', None) == 429:
+            return True
+        message = str(error)
+        if '429' in message or 'Too Many Requests' in message or 'Connection reset' in message:
+            return True
+        # yt-dlp заворачивает исходное исключение в DownloadError.exc_info
+        exc_info = getattr(error, 'exc_info', None)
+        if exc_info and exc_info[1] is not error:
+            error = exc_info[1]
+        else:
+            error = error.__cause__ or error.__context__
+    return False
+
+# Адаптивный ограничитель (token bucket) для одного хоста, общий для всех потоков
+class RateLimiter:
+    def __init__(self, rate, min_rate, max_rate, burst=1, platform=None):
+        self.platform = platform
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.throttles = 0
+        self.requests = 0
+        self.waited = 0.0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._streak = 0
+        self._lock = threading.Lock()
+
+    # Ждём, пока в ведре не появится токен для следующего запроса
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.requests += 1
+            self.waited += delay
+        if delay > 0:
+            if self.platform:
+                get_metrics().inc('rate_limit_sleep_seconds_total', delay, platform=self.platform)
+            time.sleep(delay)
+
+    # Успешный запрос: после серии успехов постепенно ускоряемся
+    def report_success(self):
+        with self._lock:
+            self._streak += 1
+            if self._streak >= SUCCESS_STREAK:
+                self._streak = 0
+                self.rate = min(self.max_rate, self.rate * SPEEDUP_FACTOR)
+
+    # Неудачный запрос: при 429 / сбросе соединения замедляемся
+    def report_failure(self, error):
+        if not is_throttle_error(error):
+            return
+        with self._lock:
+            self._streak = 0
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate * BACKOFF_FACTOR)
+            # Не даём накопленным токенам сразу же выпустить следующий запрос
+            self._tokens = min(self._tokens, 0.0)
+        if self.platform:
+            get_metrics().inc('throttles_total', platform=self.platform)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': round(self.rate, 3),
+                'throttles': self.throttles,
+                'requests': self.requests,
+                'waited': round(self.waited, 3),
+            }
+
+# Ограничитель, общий для нескольких процессов: ведро токенов и текущая частота
+# хранятся в бэкенде (например, в очереди заданий SQLiteJobQueue), поэтому
+# воркеры вместе не превышают RATE_LIMITS платформы
+class SharedRateLimiter(RateLimiter):
+    def __init__(self, backend, rate, min_rate, max_rate, burst=1, platform=None):
+        super().__init__(rate, min_rate, max_rate, burst, platform)
+        self.backend = backend
+
+    def acquire(self):
+        delay = self.backend.reserve(self.platform, self.rate, self.burst)
+        with self._lock:
+            self.requests += 1
+            self.waited += delay
+        if delay > 0:
+            get_metrics().inc('rate_limit_sleep_seconds_total', delay, platform=self.platform)
+            time.sleep(delay)
+
+    def _adjust(self, factor):
+        rate = self.backend.adjust_rate(self.platform, factor, self.min_rate, self.max_rate, self.rate)
+        with self._lock:
+            self.rate = rate
+
+    def report_success(self):
+        with self._lock:
+            self._streak += 1
+            speedup = self._streak >= SUCCESS_STREAK
+            if speedup:
+                self._streak = 0
+        if speedup:
+            self._adjust(SPEEDUP_FACTOR)
+
+    def report_failure(self, error):
+        if not is_throttle_error(error):
+            return
+        with self._lock:
+            self._streak = 0
+            self.throttles += 1
+        get_metrics().inc('throttles_total', platform=self.platform)
+        self._adjust(BACKOFF_FACTOR)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+_shared_backend = None
+
+# Возвращает общий ограничитель для платформы (создаётся при первом обращении)
+def get_limiter(platform):
+    with _limiters_lock:
+        limiter = _limiters.get(platform)
+        if limiter is None:
+            limits = RATE_LIMITS.get(platform, DEFAULT_RATE_LIMIT)
+            if _shared_backend is not None:
+                limiter = SharedRateLimiter(_shared_backend, platform=platform, **limits)
+            else:
+                limiter = RateLimiter(platform=platform, **limits)
+            _limiters[platform] = limiter
+        return limiter
+
+# Переключаем ограничители процесса на общий бэкенд (воркеры распределённого обхода)
+def use_shared_limits(backend):
+    global _shared_backend
+    with _limiters_lock:
+        _shared_backend = backend
+        _limiters.clear()
+
+# Статистика всех созданных ограничителей: текущая частота и число притормаживаний
+def limiter_stats():
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {platform: limiter.stats() for platform, limiter in limiters.items()}
@@ -0,0 +1,54 @@
+import sqlite3
+
+# Файл со списком уже известных видео по каждой исходной ссылке
+SYNC_STATE_FILE = 'sync_state.sqlite'
+
+# Известные ID видео по исходным ссылкам (для инкрементального режима)
+class SyncState:
+    def __init__(self, path=SYNC_STATE_FILE):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS known_videos (
+                source_url TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                PRIMARY KEY (source_url, video_id)
+            )
+        ''')
+        self._conn.commit()
+
+    def known_ids(self, source_url):
+        rows = self._conn.execute(
+            'SELECT video_id FROM known_videos WHERE source_url = ?', (source_url,)
+        )
+        return {row[0] for row in rows}
+
+    def add(self, source_url, video_ids):
+        self._conn.executemany(
+            'INSERT OR IGNORE INTO known_videos VALUES (?, ?)',
+            [(source_url, video_id) for video_id in video_ids if video_id],
+        )
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+# Отдаём элементы (от новых к старым) до первого уже известного видео
+def take_new(items, known_ids, get_id):
+    for item in items:
+        if item is not None and get_id(item) in known_ids:
+            break
+        yield item
+
+# Лениво листаем плоский плейлист yt-dlp и останавливаемся на первом известном видео.
+# process=False возвращает записи генератором, поэтому следующие страницы не запрашиваются.
+def extract_new_entries(ydl, url, known_ids):
+    info = ydl.extract_info(url, download=False, process=False)
+    for _ in range(5):
+        if info.get('_type') not in ('url', 'url_transparent'):
+            break
+        info = ydl.extract_info(info['url'], download=False, process=False)
+    entries = info.get('entries') or []
+    info['entries'] = list(take_new(entries, known_ids, lambda entry: entry.get('id')))
+    info['playlist_count'] = len(info['entries'])
+    return info
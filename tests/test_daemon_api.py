@@ -0,0 +1,68 @@
+import http.client
+import json
+import os
+import threading
+
+import pytest
+
+from client import DaemonError, call
+from daemon import make_server, write_token
+
+class FakeDaemon:
+    verbose = False
+
+    def __init__(self):
+        self.lookups = []
+
+    def health(self):
+        return {'status': 'ok'}
+
+    def lookup(self, payload):
+        self.lookups.append(payload)
+        return {'videos': []}
+
+@pytest.fixture
+def api(tmp_path):
+    token_file = str(tmp_path / 'token')
+    daemon = FakeDaemon()
+    server = make_server('http://127.0.0.1:0', daemon, write_token(token_file), token_file)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}', token_file, daemon
+    server.shutdown()
+    server.server_close()
+
+def raw_post(address, headers):
+    host, port = address[len('http://'):].split(':')
+    conn = http.client.HTTPConnection(host, int(port), timeout=5)
+    try:
+        conn.request('POST', '/lookup', json.dumps({'url': 'https://rutube.ru/channel/1/'}), headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+def test_client_with_token_is_served(api):
+    address, token_file, daemon = api
+    assert call(address, 'GET', '/health', token_file=token_file) == {'status': 'ok'}
+    assert call(address, 'POST', '/lookup', {'url': 'u'}, token_file=token_file) == {'videos': []}
+    assert daemon.lookups == [{'url': 'u'}]
+
+def test_token_file_is_private(api):
+    address, token_file, daemon = api
+    assert os.stat(token_file).st_mode & 0o077 == 0
+
+# Запрос со страницы браузера: без токена, text/plain (без предварительного запроса CORS), с Origin
+def test_requests_without_token_or_from_web_pages_are_rejected(api, tmp_path):
+    address, token_file, daemon = api
+    with pytest.raises(DaemonError, match='token'):
+        call(address, 'GET', '/health', token_file=str(tmp_path / 'missing'))
+    with open(token_file, encoding='utf-8') as f:
+        authorization = f"Bearer {f.read().strip()}"
+
+    assert raw_post(address, {'Content-Type': 'text/plain'})[0] == 401
+    assert raw_post(address, {'Content-Type': 'text/plain', 'Authorization': authorization})[0] == 415
+    assert raw_post(address, {'Content-Type': 'application/json', 'Authorization': authorization,
+                              'Origin': 'http://example.com'})[0] == 403
+    assert raw_post(address, {'Content-Type': 'application/json', 'Authorization': 'Bearer wrong'})[0] == 401
+    assert daemon.lookups == []
@@ -0,0 +1,60 @@
+import time
+
+import distributed
+import job_queue
+from crawl import SourceError
+from job_queue import SQLiteJobQueue
+from video_record import VideoRecord
+
+def test_failed_job_waits_before_retry(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / 'queue.sqlite'))
+    run_id = queue.submit([('vk', 'https://vkvideo.ru/@a', {})])
+
+    job = queue.lease('w1')
+    queue.fail(job['id'], 'w1', 'HTTP Error 429', retry_delay=0.2)
+
+    assert queue.lease('w1') is None
+    assert queue.waiting() == 1 and queue.waiting(['youtube']) == 0
+    assert queue.status(run_id)['pending'] == 1
+    time.sleep(0.25)
+    job = queue.lease('w2')
+    assert job['attempts'] == 2 and queue.waiting() == 0
+    queue.close()
+
+def test_retry_delay_doubles_and_job_fails_after_max_attempts(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / 'queue.sqlite'))
+    run_id = queue.submit([('vk', 'https://vkvideo.ru/@a', {})])
+    delays = []
+    for attempt in range(job_queue.MAX_ATTEMPTS):
+        job = queue.lease('w1')
+        assert job['attempts'] == attempt + 1
+        queue.fail(job['id'], 'w1', 'connection reset', retry_delay=10)
+        delays.append(queue._query('SELECT not_before - updated_at FROM jobs')[0][0])
+        queue._query('UPDATE jobs SET not_before = 0')
+
+    assert [round(delay) for delay in delays] == [10, 20, 40]
+    assert queue.jobs(run_id)[0]['state'] == 'failed'
+    assert queue.lease('w1') is None and queue.waiting() == 0
+    queue.close()
+
+# Воркер --once не выходит, пока задание ждёт повтора, и повторяет его после паузы
+def test_once_worker_waits_for_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, 'RETRY_DELAY', 0.2)
+    monkeypatch.setattr(distributed, 'POLL_INTERVAL', 0.05)
+    queue = SQLiteJobQueue(str(tmp_path / 'queue.sqlite'))
+    run_id = queue.submit([('vk', 'https://vkvideo.ru/@a', {})])
+    calls = []
+
+    def parse_vk(url, **kwargs):
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise SourceError('HTTP Error 429: Too Many Requests')
+        yield VideoRecord('Видео', '1', 'VK link', 'https://vkvideo.ru/video-1_1')
+
+    done = distributed.run_worker(queue, {'vk': parse_vk}, worker='w1', platforms=['vk'], once=True,
+                                  cache_file=str(tmp_path / 'cache.sqlite'))
+
+    assert done == 1 and len(calls) == 3
+    assert calls[1] - calls[0] >= 0.2 and calls[2] - calls[1] >= 0.4
+    assert queue.status(run_id)['done'] == 1
+    queue.close()
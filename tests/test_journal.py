@@ -0,0 +1,44 @@
+from journal import CrawlJournal, resumable
+from video_record import VideoRecord
+
+URL = 'https://vkvideo.ru/@channel'
+
+def video(i):
+    return VideoRecord(f'Видео {i}', str(i), 'VK link', f'https://vkvideo.ru/video-1_{i}')
+
+# Обычный обход не держит записи в памяти: они только дописываются в файл
+def test_record_keeps_only_ids(tmp_path):
+    journal = CrawlJournal(str(tmp_path / 'journal.jsonl'))
+    for i in range(100):
+        journal.record(URL, video(i))
+    journal.record(URL, video(5))
+
+    assert journal.records == {}
+    assert len(journal.processed_ids(URL)) == 100
+    journal.close()
+    with open(tmp_path / 'journal.jsonl', encoding='utf-8') as f:
+        assert len(f.readlines()) == 100
+
+def test_resume_replays_journaled_records_once(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = CrawlJournal(path)
+    for i in range(3):
+        journal.record(URL, video(i))
+    journal.close()
+
+    journal = CrawlJournal(path, resume=True)
+    seen = []
+
+    def parse(url, skip_ids=None):
+        seen.append(set(skip_ids))
+        yield from (video(i) for i in range(5) if str(i) not in skip_ids)
+
+    crawled = []
+    for record in resumable(parse, journal)(URL):
+        journal.record(URL, record)
+        crawled.append(record['video_id'])
+
+    assert crawled == ['0', '1', '2', '3', '4']
+    assert seen == [{'0', '1', '2'}]
+    assert journal.records == {}
+    journal.close()
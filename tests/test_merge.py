@@ -0,0 +1,65 @@
+import pytest
+
+from merge import TitleIndex, VideoMerger, normalize_title, suffix_contained, token_similarity, title_tokens
+from video_record import VideoRecord
+
+def merged_rows(*records):
+    merger = VideoMerger()
+    for source_index, (title, column, link) in enumerate(records):
+        merger.add(VideoRecord(title, str(source_index), column, link), source_index=source_index)
+    return list(merger.rows())
+
+@pytest.mark.parametrize('youtube, vk', [
+    ('Лама Палкьи: учение о пустоте', 'Лама Палкьи: учение о сострадании'),
+    ('Медитация на дыхание, утренняя практика', 'Медитация на дыхание, вечерняя практика'),
+    ('Вопросы и ответы', 'Вопросы и ответы о медитации'),
+    ('Вопросы и ответы', 'Вопросы и ответы после ретрита в Москве, день второй'),
+    ('Друбпон Лама Палкьи. Совет практикующим. Учение о пустоте',
+     'Друбпон Лама Палкьи. Совет практикующим. Учение о сострадании'),
+    ('Учение о пустоте | Часть 1', 'Учение о пустоте | Часть 2'),
+])
+def test_different_videos_are_not_merged(youtube, vk):
+    rows = merged_rows((youtube, 'YouTube link', 'y'), (vk, 'VK link', 'v'))
+    assert len(rows) == 2
+
+@pytest.mark.parametrize('youtube, vk', [
+    ('Друбпон Лама Палкьи. Совет практикующим', 'Друбпон Лама Палкьи. Совет практикующим | Часть 2'),
+    ('Учение о пустоте', 'Учение о пустоте (полная версия)'),
+    ('Друбпон Лама Палкьи. Совет практикующим 🙏', 'Друбпон Лама Палкьи — совет практикующим'),
+    ('Друбпон Лама Палкьи. Совет практикующим о медитации',
+     'Друбпон Лама Палкьи. Совет практикующим о медитации, Москва'),
+])
+def test_same_video_is_merged(youtube, vk):
+    rows = merged_rows((youtube, 'YouTube link', 'y'), (vk, 'VK link', 'v'))
+    assert rows == [{'Название видео': youtube, 'YouTube link': 'y', 'VK link': 'v'}]
+
+def test_rows_from_the_same_platform_are_not_merged():
+    rows = merged_rows(('Учение о пустоте', 'YouTube link', 'y1'), ('Учение о пустоте, часть 2', 'YouTube link', 'y2'))
+    assert len(rows) == 2
+
+def test_part_numbers_merged_into_a_row_block_other_parts():
+    rows = merged_rows(
+        ('Учение о пустоте', 'YouTube link', 'y'),
+        ('Учение о пустоте | Часть 2', 'VK link', 'v'),
+        ('Учение о пустоте | Часть 3', 'RuTube link', 'r'),
+    )
+    assert len(rows) == 2
+
+def test_similarity_counts_both_titles_and_ignores_stopwords():
+    short = title_tokens(normalize_title('Вопросы и ответы'))
+    long = title_tokens(normalize_title('Вопросы и ответы о медитации'))
+    assert short == {'вопросы', 'ответы'}
+    assert token_similarity(short, long) == pytest.approx(2 / 3)
+
+def test_containment_only_for_known_suffixes():
+    assert suffix_contained('учение о пустоте', 'учение о пустоте часть 2')
+    assert suffix_contained('учение о пустоте', 'учение о пустоте hd')
+    assert not suffix_contained('вопросы и ответы', 'вопросы и ответы о медитации')
+    assert not suffix_contained('учение', 'учение о пустоте часть 2')
+
+def test_index_finds_the_shorter_title_for_a_suffixed_query():
+    index = TitleIndex()
+    index.add('друбпон лама палкьи совет практикующим')
+    index.add('вопросы и ответы')
+    assert index.find('друбпон лама палкьи совет практикующим часть 2') == 0
+    assert index.find('вопросы и ответы о медитации') is None
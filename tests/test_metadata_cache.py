@@ -0,0 +1,45 @@
+import sqlite3
+
+import metadata_cache
+from metadata_cache import MetadataCache
+
+def accessed_at(path, video_id):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT accessed_at FROM videos WHERE video_id = ?', (video_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+# Кэш открыт в двух процессах (воркеры с общим --cache, демон и cli.py):
+# попадание в одном не должно блокировать запись в другом
+def test_get_does_not_lock_the_file_for_other_connections(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    first = MetadataCache(path, timeout=0.1)
+    first.put('vk', '1', 'Название', 'https://vkvideo.ru/video-1_1')
+    second = MetadataCache(path, timeout=0.1)
+
+    assert first.get('vk', '1') == {'title': 'Название', 'webpage_url': 'https://vkvideo.ru/video-1_1'}
+    second.put('vk', '2', 'Другое', 'https://vkvideo.ru/video-1_2')
+    assert second.get('vk', '1') is not None
+    first.put('rutube', '3', 'Третье', 'https://rutube.ru/video/3/')
+    assert second.evict() == 0
+
+    first.close()
+    second.close()
+
+def test_access_time_is_written_in_batches(tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.sqlite')
+    monkeypatch.setattr(metadata_cache, 'ACCESS_BATCH_SIZE', 2)
+    cache = MetadataCache(path)
+    cache.put('vk', '1', 'Первое', 'u1')
+    cache.put('vk', '2', 'Второе', 'u2')
+    written = accessed_at(path, '1')
+
+    cache.get('vk', '1')
+    assert accessed_at(path, '1') == written
+    cache.get('vk', '2')
+    assert accessed_at(path, '1') > written
+
+    cache.get('vk', '1')
+    cache.close()
+    assert accessed_at(path, '1') > accessed_at(path, '2')
@@ -0,0 +1,197 @@
+import re
+import zipfile
+
+from openpyxl import load_workbook
+
+import upsert
+from upsert import SheetIndex, inline_cell, rewrite_sheet, update_row, upsert_xlsx
+from writers import read_rows, write_xlsx
+
+TITLE = 'Друбпон Лама Палкьи. Совет практикующим'
+COLUMN_LETTERS = {'Название видео': 'A', 'YouTube link': 'C', 'VK link': 'E', 'RuTube link': 'G', 'Сайт link': 'I'}
+
+def make_workbook(path, rows, manual=None):
+    write_xlsx(rows, str(path))
+    if manual:
+        workbook = load_workbook(path)
+        for cell, value in manual.items():
+            workbook.active[cell] = value
+        workbook.save(path)
+
+def filled_rows(path):
+    return [{column: value for column, value in row.items() if value} for row in read_rows(str(path))]
+
+def edit_package(path, edits, added=None):
+    with zipfile.ZipFile(path) as source:
+        entries = [(info, source.read(info)) for info in source.infolist()]
+    with zipfile.ZipFile(path, 'w') as target:
+        for info, data in entries:
+            if info.filename in edits:
+                data = edits[info.filename](data.decode('utf-8')).encode('utf-8')
+            target.writestr(info, data)
+        for name, text in (added or {}).items():
+            target.writestr(name, text)
+
+def edit_sheet(path, edit):
+    edit_package(path, {'xl/worksheets/sheet1.xml': edit})
+
+# openpyxl пишет встроенные строки, Excel — общие (sharedStrings.xml). Переводим книгу
+# в общие строки; название TITLE — форматированный текст из двух фрагментов с подсказкой <rPh>
+def to_shared_strings(path):
+    strings = []
+
+    def shared(match):
+        text = match.group(2)
+        if text == f'<t>{TITLE}</t>':
+            first, second = TITLE.split('. ')
+            text = f'<r><t>{first}. </t></r><r><rPr><b/></rPr><t>{second}</t></r><rPh sb="0" eb="1"><t>фонетика</t></rPh>'
+        strings.append(f'<si>{text}</si>')
+        return f'{match.group(1)} t="s"><v>{len(strings) - 1}</v></c>'
+
+    with zipfile.ZipFile(path) as archive:
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    sheet = re.sub(r'(<c\b[^>]*?) t="inlineStr"><is>(.*?)</is></c>', shared, sheet)
+    edit_package(path, {
+        'xl/worksheets/sheet1.xml': lambda xml: sheet,
+        'xl/_rels/workbook.xml.rels': lambda xml: xml.replace('</Relationships>', (
+            '<Relationship Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"'
+            ' Target="sharedStrings.xml" Id="rId99"/></Relationships>')),
+        '[Content_Types].xml': lambda xml: xml.replace('</Types>', (
+            '<Override PartName="/xl/sharedStrings.xml" ContentType='
+            '"application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>')),
+    }, {'xl/sharedStrings.xml': (
+        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="{0}" uniqueCount="{0}">{1}</sst>'
+        .format(len(strings), ''.join(strings)))})
+
+def test_shared_strings_row_gets_part_from_another_platform(tmp_path):
+    path = tmp_path / 'videos.xlsx'
+    make_workbook(path, [{'Название видео': TITLE, 'YouTube link': 'y1'}], {'B2': 'Лама Палкьи'})
+    to_shared_strings(path)
+    assert filled_rows(path)[0]['Название видео'] == TITLE
+
+    result = upsert_xlsx([{'Название видео': TITLE + ' | Часть 2', 'VK link': 'v1'}], str(path))
+
+    assert result == {'updated_rows': 1, 'updated_cells': 1, 'appended': 0, 'fuzzy_matched': 1}
+    assert filled_rows(path) == [
+        {'Название видео': TITLE, 'Кто в видео?': 'Лама Палкьи', 'YouTube link': 'y1', 'VK link': 'v1'},
+    ]
+
+def test_different_videos_are_appended(tmp_path):
+    path = tmp_path / 'videos.xlsx'
+    make_workbook(path, [
+        {'Название видео': 'Вопросы и ответы', 'YouTube link': 'y1'},
+        {'Название видео': 'Лама Палкьи: учение о пустоте', 'YouTube link': 'y2'},
+    ])
+
+    result = upsert_xlsx([
+        {'Название видео': 'Вопросы и ответы о медитации', 'VK link': 'v1'},
+        {'Название видео': 'Лама Палкьи: учение о сострадании', 'VK link': 'v2'},
+    ], str(path))
+
+    assert result['appended'] == 2 and result['updated_rows'] == 0
+    assert len(filled_rows(path)) == 4
+
+def test_other_parts_do_not_join_a_row_matched_by_part(tmp_path):
+    path = tmp_path / 'videos.xlsx'
+    make_workbook(path, [{'Название видео': TITLE, 'YouTube link': 'y1'}])
+
+    result = upsert_xlsx([
+        {'Название видео': TITLE + ' | Часть 2', 'VK link': 'v2'},
+        {'Название видео': TITLE + ' | Часть 3', 'RuTube link': 'r3'},
+    ], str(path))
+
+    assert result['fuzzy_matched'] == 1 and result['appended'] == 1
+
+def test_inline_strings_written_by_upsert_are_read_back(tmp_path):
+    path = tmp_path / 'videos.xlsx'
+    make_workbook(path, [{'Название видео': 'Старое видео', 'YouTube link': 'y0'}])
+    upsert_xlsx([{'Название видео': 'Новое & <видео>', 'YouTube link': 'y1'}], str(path))
+    with zipfile.ZipFile(path) as archive:
+        assert 't="inlineStr"' in archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+
+    result = upsert_xlsx([{'Название видео': 'Новое & <видео>', 'VK link': 'v1'}], str(path))
+
+    assert result['updated_cells'] == 1 and result['appended'] == 0
+    assert filled_rows(path)[1] == {'Название видео': 'Новое & <видео>', 'YouTube link': 'y1', 'VK link': 'v1'}
+
+def test_rows_without_r_attribute_and_with_spans(tmp_path):
+    path = tmp_path / 'videos.xlsx'
+    make_workbook(path, [
+        {'Название видео': 'Первое', 'YouTube link': 'y1'},
+        {'Название видео': 'Второе', 'YouTube link': 'y2'},
+    ], {'B3': 'Лама Палкьи', 'D3': 'заметка'})
+    # Так пишут книги некоторые программы: у строк и у идущих подряд ячеек нет r,
+    # у строк есть spans
+    edit_sheet(path, lambda xml: re.sub(r'<row\b[^>]*?>', '<row spans="1:10">',
+                                        re.sub(r'(<c\b[^>]*?) r="[AB]\d+"', r'\1', xml)))
+
+    result = upsert_xlsx([{'Название видео': 'Второе', 'VK link': 'v2'}], str(path))
+
+    assert result == {'updated_rows': 1, 'updated_cells': 1, 'appended': 0, 'fuzzy_matched': 0}
+    assert filled_rows(path) == [
+        {'Название видео': 'Первое', 'YouTube link': 'y1'},
+        {'Название видео': 'Второе', 'Кто в видео?': 'Лама Палкьи', 'YouTube link': 'y2', 'Инфа': 'заметка',
+         'VK link': 'v2'},
+    ]
+    with zipfile.ZipFile(path) as archive:
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    # spans остаётся у нетронутых строк и убирается у изменённой
+    assert sheet.count('<row spans="1:10">') == 2 and sheet.count('<row>') == 1
+
+def test_update_row_keeps_style_and_cell_order():
+    index = SheetIndex(COLUMN_LETTERS)
+    row_xml = ('<row r="5" spans="1:4"><c r="A5" t="s"><v>0</v></c>'
+               '<c r="C5" s="3"/><c r="D5" t="s"><v>1</v></c></row>')
+
+    updated = update_row(index, row_xml, 5, '<row r="5" spans="1:4">', {'YouTube link': 'y', 'VK link': 'v'})
+
+    assert updated == ('<row r="5"><c r="A5" t="s"><v>0</v></c>'
+                       '<c r="C5" s="3" t="inlineStr"><is><t>y</t></is></c>'
+                       '<c r="D5" t="s"><v>1</v></c>'
+                       '<c r="E5" t="inlineStr"><is><t>v</t></is></c></row>')
+
+def test_update_row_fills_an_empty_self_closing_row():
+    index = SheetIndex(COLUMN_LETTERS)
+
+    updated = update_row(index, '<row r="2" spans="1:1"/>', 2, '<row r="2" spans="1:1"/>', {'Название видео': 'x'})
+
+    assert updated == '<row r="2"><c r="A2" t="inlineStr"><is><t>x</t></is></c></row>'
+
+def test_inline_cell_escapes_text():
+    assert inline_cell('A2', ' a & <b> \x01') == (
+        '<c r="A2" t="inlineStr"><is><t xml:space="preserve"> a &amp; &lt;b&gt; </t></is></c>'
+    )
+    assert inline_cell('B3', 'x', ' s="2"') == '<c r="B3" s="2" t="inlineStr"><is><t>x</t></is></c>'
+
+def test_rewrite_sheet_does_not_depend_on_chunk_size():
+    index = SheetIndex(COLUMN_LETTERS)
+    index.last_row = 3
+    xml = ('<worksheet><dimension ref="A1:J3"/><sheetData>'
+           '<row r="1"><c r="A1" t="inlineStr"><is><t>Название видео</t></is></c></row>'
+           '<row r="2"><c r="A2" t="inlineStr"><is><t>a</t></is></c></row>'
+           '<row r="3"><c r="A3" t="inlineStr"><is><t>b</t></is></c></row>'
+           '</sheetData><pageMargins/></worksheet>')
+    updates = {3: {'VK link': 'v'}}
+    appended = {4: {'Название видео': 'c', 'YouTube link': 'y'}}
+
+    whole = ''.join(rewrite_sheet(index, [xml], updates, appended))
+    pieces = ''.join(rewrite_sheet(index, [xml[i:i + 7] for i in range(0, len(xml), 7)], updates, appended))
+
+    assert whole == pieces
+    assert '<dimension ref="A1:J4"/>' in whole
+    assert '<c r="E3" t="inlineStr"><is><t>v</t></is></c></row>' in whole
+    assert whole.endswith('<row r="4"><c r="A4" t="inlineStr"><is><t>c</t></is></c>'
+                          '<c r="C4" t="inlineStr"><is><t>y</t></is></c></row>'
+                          '</sheetData><pageMargins/></worksheet>')
+
+def test_small_sheet_chunks(tmp_path, monkeypatch):
+    path = tmp_path / 'videos.xlsx'
+    make_workbook(path, [{'Название видео': f'Видео {i}', 'YouTube link': f'y{i}'} for i in range(20)])
+    monkeypatch.setattr(upsert, 'SHEET_CHUNK', 7)
+
+    upsert_xlsx([{'Название видео': 'Видео 7', 'VK link': 'v7'}, {'Название видео': 'Новое', 'VK link': 'v'}], str(path))
+
+    rows = filled_rows(path)
+    assert len(rows) == 21
+    assert rows[7] == {'Название видео': 'Видео 7', 'YouTube link': 'y7', 'VK link': 'v7'}
+    assert rows[20] == {'Название видео': 'Новое', 'VK link': 'v'}
@@ -0,0 +1,384 @@
+import codecs
+import os
+import posixpath
+import re
+import shutil
+import xml.etree.ElementTree as ET
+import zipfile
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from merge import FUZZY_THRESHOLD, LINK_COLUMNS, TitleIndex, links_compatible, normalize_title
+from writers import output_format
+
+# Обновление существующего XLSX на месте (upsert): строки из обхода сопоставляются
+# со строками листа по ссылке на платформе, а если её нет — по нормализованному названию,
+# в том числе нечётко (TitleIndex из merge.py, как при объединении строк обхода).
+# В найденной строке заполняются только пустые ячейки названия и ссылок, остальные
+# видео дописываются в конец листа. Ручные колонки («Кто в видео?», «Инфа*»),
+# оформление, ширина колонок и другие листы книги не меняются.
+#
+# Книга не загружается целиком: индекс строится потоковым разбором XML листа,
+# затем XML листа переписывается потоково — изменённые строки правятся, новые
+# добавляются перед </sheetData>, остальные части архива копируются как есть.
+# Новые значения пишутся встроенными строками (inlineStr), sharedStrings.xml не трогаем.
+
+# Колонки, которые заполняет обход; остальные колонки листа заполняются вручную
+UPSERT_COLUMNS = ['Название видео'] + LINK_COLUMNS
+SHEET_CHUNK = 1 << 20
+
+NS = {
+    'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+}
+R_ID = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+ROW_START_RE = re.compile(r'<row\b[^>]*?(/?)>')
+ROW_NUMBER_RE = re.compile(r'\sr="(\d+)"')
+CELL_RE = re.compile(r'<c\b[^>]*?(?:/>|>.*?</c>)', re.S)
+CELL_REF_RE = re.compile(r'\sr="([A-Z]+)\d+"')
+CELL_STYLE_RE = re.compile(r'\ss="\d+"')
+ROW_SPANS_RE = re.compile(r'\sspans="[^"]*"')
+DIMENSION_RE = re.compile(r'(<dimension\b[^>]*?\sref=")([^"]*)(")')
+
+# Подходит ли файл для обновления на месте: существующий XLSX
+def can_upsert(output_file, fmt=None):
+    return os.path.exists(output_file) and output_format(output_file, fmt) == 'xlsx'
+
+# Путь XML активного листа внутри архива (тот же лист, что читает read_xlsx_rows)
+def active_sheet_path(archive):
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    view = workbook.find('main:bookViews/main:workbookView', NS)
+    active = int(view.get('activeTab', 0)) if view is not None else 0
+    sheets = workbook.findall('main:sheets/main:sheet', NS)
+    sheet = sheets[active if active < len(sheets) else 0]
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.findall('rel:Relationship', NS):
+        if rel.get('Id') == sheet.get(R_ID):
+            target = rel.get('Target')
+            if target.startswith('/'):
+                return target[1:]
+            return posixpath.normpath(posixpath.join('xl', target))
+    raise ValueError(f"sheet '{sheet.get('name')}' not found in the workbook")
+
+# Индекс строк листа: ссылка -> номер строки, нормализованное название -> номера строк,
+# индекс похожих названий, заполненные колонки обхода каждой строки, буквы этих колонок
+# и номер последней строки
+class SheetIndex:
+    def __init__(self, columns, fuzzy_threshold=FUZZY_THRESHOLD):
+        self.columns = columns
+        self.letters = set(columns.values())
+        self.values = {}
+        self.by_link = {}
+        self.by_title = {}
+        # Нечёткий поиск: id названия в TitleIndex -> номер строки
+        self.titles = TitleIndex(fuzzy_threshold) if fuzzy_threshold else None
+        self.title_rows = []
+        self.fuzzy_matched = 0
+        self.last_row = 1
+
+    def add(self, row_number, values):
+        self.values[row_number] = values
+        for column in LINK_COLUMNS:
+            if values.get(column):
+                self.by_link.setdefault(values[column], row_number)
+        norm_title = normalize_title(values.get('Название видео') or '')
+        if norm_title:
+            self.by_title.setdefault(norm_title, []).append(row_number)
+            if self.titles is not None:
+                self.titles.add(norm_title)
+                self.title_rows.append(row_number)
+
+    # Строка листа для записи обхода: сначала по любой из ссылок, затем по названию —
+    # точно, а потом нечётко, — если ссылки строк не пересекаются (как при объединении
+    # в merge.py). Найденная строка объединяется с записью.
+    def find(self, row):
+        for column in LINK_COLUMNS:
+            if row.get(column) and row[column] in self.by_link:
+                return self.by_link[row[column]]
+        norm_title = normalize_title(row.get('Название видео') or '')
+        for row_number in self.by_title.get(norm_title, ()):
+            if links_compatible(self.values[row_number], row):
+                return row_number
+        if self.titles is None or not norm_title:
+            return None
+        item_id = self.titles.find(norm_title, lambda item_id: links_compatible(self.values[self.title_rows[item_id]], row))
+        if item_id is None:
+            return None
+        # Номера из названия записи закрепляем за строкой: к «Часть 2» не присоединится «Часть 3»
+        self.titles.add_numbers(item_id, norm_title)
+        self.fuzzy_matched += 1
+        return self.title_rows[item_id]
+
+def tag(name):
+    return '{%s}%s' % (NS['main'], name)
+
+# Текст строки из sharedStrings.xml или встроенной строки: <t> и <t> внутри <r>
+# (фонетические подсказки <rPh> пропускаем)
+def string_text(element):
+    parts = []
+    for child in element:
+        if child.tag == tag('t'):
+            parts.append(child.text or '')
+        elif child.tag == tag('r'):
+            parts.extend(t.text or '' for t in child.iter(tag('t')))
+    return ''.join(parts)
+
+def shared_strings(archive):
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.findall('rel:Relationship', NS):
+        if rel.get('Type', '').endswith('/sharedStrings'):
+            target = rel.get('Target')
+            path = target[1:] if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+            strings = []
+            with archive.open(path) as f:
+                for event, element in ET.iterparse(f):
+                    if element.tag == tag('si'):
+                        strings.append(string_text(element))
+                        element.clear()
+            return strings
+    return []
+
+def cell_value(cell, strings):
+    kind = cell.get('t')
+    if kind == 'inlineStr':
+        inline = cell.find(tag('is'))
+        return string_text(inline) if inline is not None else ''
+    value = cell.find(tag('v'))
+    if value is None or value.text is None:
+        return ''
+    if kind == 's':
+        return strings[int(value.text)]
+    return value.text
+
+# Индекс строится потоковым разбором XML листа (ElementTree.iterparse): из каждой строки
+# читаются только колонки обхода, разобранные строки сразу освобождаются
+def read_index(archive, sheet_path, output_file, fuzzy_threshold=FUZZY_THRESHOLD):
+    strings = shared_strings(archive)
+    row_tag, cell_tag = tag('row'), tag('c')
+    index = None
+    sheet_data = None
+    row_number = 0
+    with archive.open(sheet_path) as f:
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == tag('sheetData'):
+                    sheet_data = element
+                continue
+            if element.tag != row_tag:
+                continue
+            number = element.get('r')
+            row_number = int(number) if number else row_number + 1
+            values = {}
+            position = 0
+            for cell in element.iter(cell_tag):
+                reference = cell.get('r')
+                position = column_index_from_string(reference.rstrip('0123456789')) if reference else position + 1
+                letter = get_column_letter(position)
+                if index is None or letter in index.letters:
+                    value = cell_value(cell, strings)
+                    if value:
+                        values[letter] = value
+            # Разобранная строка больше не нужна
+            if sheet_data is not None:
+                sheet_data.clear()
+            if index is None:
+                # Первая строка — заголовок
+                positions = {value: letter for letter, value in values.items() if value in UPSERT_COLUMNS}
+                missing = [column for column in UPSERT_COLUMNS if column not in positions]
+                if missing:
+                    raise ValueError(f"columns {', '.join(missing)} not found in the header of {output_file}")
+                index = SheetIndex(positions, fuzzy_threshold)
+                continue
+            index.add(row_number, {column: values[letter] for column, letter in index.columns.items() if letter in values})
+            index.last_row = row_number
+    if index is None:
+        raise ValueError(f"no header row in {output_file}")
+    return index
+
+# Изменения: номер строки -> {колонка: значение}. Для найденных строк — только пустые
+# ячейки, для новых — все колонки обхода; новые строки тоже попадают в индекс.
+def plan_changes(index, rows):
+    updates = {}
+    appended = {}
+    for row in rows:
+        row = {column: row.get(column) for column in UPSERT_COLUMNS if row.get(column)}
+        row_number = index.find(row)
+        if row_number is None:
+            row_number = index.last_row + len(appended) + 1
+            appended[row_number] = row
+            index.add(row_number, dict(row))
+            continue
+        current = index.values[row_number]
+        for column, value in row.items():
+            if not current.get(column):
+                current[column] = value
+                (appended.get(row_number) or updates.setdefault(row_number, {}))[column] = value
+    return updates, appended
+
+def escape(value):
+    value = ILLEGAL_CHARACTERS_RE.sub('', str(value))
+    text = value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    space = ' xml:space="preserve"' if value != value.strip() else ''
+    return f'<t{space}>{text}</t>'
+
+def inline_cell(reference, value, style=''):
+    return f'<c r="{reference}"{style} t="inlineStr"><is>{escape(value)}</is></c>'
+
+def new_row(index, row_number, values):
+    cells = sorted(
+        (column_index_from_string(index.columns[column]), inline_cell(f'{index.columns[column]}{row_number}', value))
+        for column, value in values.items()
+    )
+    return f'<row r="{row_number}">' + ''.join(cell for _, cell in cells) + '</row>'
+
+# Вписываем значения в строку листа: пустая ячейка заменяется (со своим стилем),
+# отсутствующая вставляется на место по порядку колонок. Подсказку Excel spans
+# (диапазон колонок строки) убираем — после вставки она может стать неверной.
+def update_row(index, row_xml, row_number, start_tag, values):
+    body = row_xml[len(start_tag):-len('</row>')] if not start_tag.endswith('/>') else ''
+    start_tag = ROW_SPANS_RE.sub('', start_tag)
+    pending = {column_index_from_string(index.columns[column]): (index.columns[column], value)
+               for column, value in values.items()}
+    if start_tag.endswith('/>'):
+        start_tag = start_tag[:-2].rstrip() + '>'
+    cells = []
+    position = 0
+    for cell in CELL_RE.findall(body):
+        reference = CELL_REF_RE.search(cell.split('>', 1)[0])
+        position = column_index_from_string(reference.group(1)) if reference else position + 1
+        for column in sorted(column for column in pending if column < position):
+            letter, value = pending.pop(column)
+            cells.append(inline_cell(f'{letter}{row_number}', value))
+        if position in pending:
+            letter, value = pending.pop(position)
+            style = CELL_STYLE_RE.search(cell.split('>', 1)[0])
+            cell = inline_cell(f'{letter}{row_number}', value, style.group(0) if style else '')
+        cells.append(cell)
+    for column in sorted(pending):
+        letter, value = pending[column]
+        cells.append(inline_cell(f'{letter}{row_number}', value))
+    return start_tag + ''.join(cells) + '</row>'
+
+def update_dimension(index, head, last_row):
+    def replace(match):
+        first, _, last = match.group(2).partition(':')
+        last_column = re.match(r'[A-Z]+', last or first).group(0)
+        for letter in index.columns.values():
+            if column_index_from_string(letter) > column_index_from_string(last_column):
+                last_column = letter
+        return f"{match.group(1)}{first}:{last_column}{last_row}{match.group(3)}"
+    return DIMENSION_RE.sub(replace, head, count=1)
+
+# Потоковая правка XML листа: chunks — куски исходного текста, результат — куски нового
+def rewrite_sheet(index, chunks, updates, appended):
+    last_row = max([index.last_row] + list(appended))
+    added = ''.join(new_row(index, row_number, values) for row_number, values in sorted(appended.items()))
+    buffer = ''
+    chunks = iter(chunks)
+
+    # Заголовок листа до <sheetData> включительно
+    for chunk in chunks:
+        buffer += chunk
+        start = buffer.find('<sheetData')
+        if start >= 0 and buffer.find('>', start) >= 0:
+            break
+    start = buffer.find('<sheetData')
+    if start < 0:
+        raise ValueError('sheetData not found in the worksheet XML')
+    end = buffer.find('>', start) + 1
+    yield update_dimension(index, buffer[:start], last_row)
+    if buffer[end - 2] == '/':
+        yield '<sheetData>' + added + '</sheetData>'
+        yield buffer[end:]
+        yield from chunks
+        return
+    yield buffer[start:end]
+    buffer = buffer[end:]
+
+    # Неизменённые строки копируются без правки; out — сколько буфера уже отдано,
+    # pos — откуда искать следующую строку
+    row_number = 0
+    out = pos = 0
+    data_end = buffer.find('</sheetData>')
+    while True:
+        row_start = buffer.find('<row', pos)
+        if data_end >= 0 and (row_start < 0 or data_end < row_start):
+            yield buffer[out:data_end] + added
+            yield buffer[data_end:]
+            yield from chunks
+            return
+        start_tag = ROW_START_RE.match(buffer, row_start) if row_start >= 0 else None
+        row_end = -1
+        if start_tag is not None:
+            row_end = start_tag.end() if start_tag.group(1) else buffer.find('</row>', start_tag.end())
+        if row_end < 0:
+            # Строка не поместилась в буфер — дочитываем
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ValueError('unexpected end of the worksheet XML')
+            if row_start < 0:
+                # Хвост буфера может быть началом тега
+                row_start = buffer.rfind('<', pos)
+                if row_start < 0:
+                    row_start = len(buffer)
+            yield buffer[out:row_start]
+            buffer = buffer[row_start:] + chunk
+            out = pos = 0
+            data_end = buffer.find('</sheetData>')
+            continue
+        if not start_tag.group(1):
+            row_end += len('</row>')
+        number = ROW_NUMBER_RE.search(start_tag.group(0))
+        row_number = int(number.group(1)) if number else row_number + 1
+        if row_number in updates:
+            yield buffer[out:row_start]
+            yield update_row(index, buffer[row_start:row_end], row_number, start_tag.group(0), updates[row_number])
+            out = row_end
+        pos = row_end
+
+def read_chunks(stream):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        data = stream.read(SHEET_CHUNK)
+        if not data:
+            break
+        yield decoder.decode(data)
+    yield decoder.decode(b'', final=True)
+
+# Обновляем книгу output_file строками rows. Результат пишется во временный файл
+# и подменяет исходный, как в write_rows.
+# Возвращает {'updated_rows', 'updated_cells', 'appended', 'fuzzy_matched'}.
+def upsert_xlsx(rows, output_file, fuzzy_threshold=FUZZY_THRESHOLD):
+    with zipfile.ZipFile(output_file) as source:
+        sheet_path = active_sheet_path(source)
+        index = read_index(source, sheet_path, output_file, fuzzy_threshold)
+    updates, appended = plan_changes(index, rows)
+    result = {
+        'updated_rows': len(updates),
+        'updated_cells': sum(len(values) for values in updates.values()),
+        'appended': len(appended),
+        'fuzzy_matched': index.fuzzy_matched,
+    }
+    if not updates and not appended:
+        return result
+
+    tmp_file = output_file + '.tmp'
+    try:
+        with zipfile.ZipFile(output_file) as source, zipfile.ZipFile(tmp_file, 'w') as target:
+            for info in source.infolist():
+                copy = zipfile.ZipInfo(info.filename, info.date_time)
+                copy.compress_type = info.compress_type
+                copy.external_attr = info.external_attr
+                with source.open(info) as src, target.open(copy, 'w', force_zip64=True) as dst:
+                    if info.filename == sheet_path:
+                        for text in rewrite_sheet(index, read_chunks(src), updates, appended):
+                            dst.write(text.encode('utf-8'))
+                    else:
+                        shutil.copyfileobj(src, dst, SHEET_CHUNK)
+        os.replace(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return result
@@ -0,0 +1,39 @@
+TITLE_COLUMN = 'Название видео'
+
+# Запись о видео от парсера: название, ID и ссылка на одной платформе.
+# Пустые колонки таблицы (ссылки других платформ, «Кто в видео?», «Инфа*») не хранятся —
+# полный набор колонок подставляют объединение (merge.py) и писатели (writers.py).
+# Читается как словарь: record['video_id'], record.get('VK link'), record.items();
+# dict(record) — обычный словарь для JSON (журнал обхода, очередь заданий, ответы демона).
+# normalized_title не хранится: его вычисляет объединение.
+class VideoRecord:
+    __slots__ = ('title', 'video_id', 'link_column', 'link')
+
+    def __init__(self, title, video_id, link_column, link):
+        self.title = title
+        self.video_id = video_id
+        self.link_column = link_column
+        self.link = link
+
+    def items(self):
+        return ((TITLE_COLUMN, self.title), ('video_id', self.video_id), (self.link_column, self.link))
+
+    def keys(self):
+        return (TITLE_COLUMN, 'video_id', self.link_column)
+
+    def get(self, key, default=None):
+        if key == TITLE_COLUMN:
+            return self.title
+        if key == 'video_id':
+            return self.video_id
+        if key == self.link_column:
+            return self.link
+        return default
+
+    def __getitem__(self, key):
+        if key not in self.keys():
+            raise KeyError(key)
+        return self.get(key)
+
+    def __repr__(self):
+        return f'VideoRecord({dict(self)!r})'
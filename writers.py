@@ -0,0 +1,148 @@
+import csv
+import json
+import os
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from merge import COLUMNS
+
+# Сколько строк собирать в один пакет при записи Parquet
+PARQUET_BATCH_SIZE = 10000
+
+# Все писатели принимают итератор строк (словарей) и пишут их по одной,
+# не накапливая таблицу в памяти. Возвращают количество записанных строк.
+# Пишут уже объединённые строки после обхода, во временный файл, который затем
+# заменяет выходной; сырые записи во время обхода сохраняет журнал (journal.py).
+
+# XLSX в потоковом режиме openpyxl (write_only)
+def write_xlsx(rows, output_file, columns=COLUMNS):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    header = []
+    for column in columns:
+        cell = WriteOnlyCell(sheet, value=column)
+        cell.font = Font(bold=True)
+        header.append(cell)
+    sheet.append(header)
+
+    count = 0
+    for row in rows:
+        sheet.append([row.get(column) or None for column in columns])
+        count += 1
+    workbook.save(output_file)
+    return count
+
+# CSV в UTF-8 с BOM, чтобы Excel правильно открывал кириллицу
+def write_csv(rows, output_file, columns=COLUMNS):
+    count = 0
+    with open(output_file, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([row.get(column) or '' for column in columns])
+            count += 1
+    return count
+
+# JSON Lines: один объект на строку
+def write_jsonl(rows, output_file, columns=COLUMNS):
+    count = 0
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps({column: row.get(column) or '' for column in columns}, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+# Parquet пакетами по PARQUET_BATCH_SIZE строк (нужен pyarrow)
+def write_parquet(rows, output_file, columns=COLUMNS, batch_size=PARQUET_BATCH_SIZE):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output requires pyarrow: pip install pyarrow")
+
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    count = 0
+    with pq.ParquetWriter(output_file, schema) as writer:
+        batch = {column: [] for column in columns}
+        for row in rows:
+            for column in columns:
+                batch[column].append(row.get(column) or '')
+            count += 1
+            if count % batch_size == 0:
+                writer.write_table(pa.table(batch, schema=schema))
+                batch = {column: [] for column in columns}
+        if count % batch_size or count == 0:
+            writer.write_table(pa.table(batch, schema=schema))
+    return count
+
+# Писатели по формату; формат по умолчанию определяется расширением файла
+WRITERS = {
+    'xlsx': write_xlsx,
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+    'parquet': write_parquet,
+}
+
+def output_format(output_file, fmt=None):
+    fmt = (fmt or os.path.splitext(output_file)[1].lstrip('.')).lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported output format '{fmt}' (supported: {', '.join(WRITERS)})")
+    return fmt
+
+# Запись строк выбранным писателем. Сначала пишем во временный файл и затем
+# подменяем им результат, чтобы при сбое не остаться с наполовину записанным файлом.
+def write_rows(rows, output_file, fmt=None, columns=COLUMNS):
+    writer = WRITERS[output_format(output_file, fmt)]
+    tmp_file = output_file + '.tmp'
+    try:
+        count = writer(rows, tmp_file, columns)
+        os.replace(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return count
+
+# Чтение строк существующего XLSX в режиме read_only: по одному словарю на строку
+def read_xlsx_rows(input_file):
+    workbook = load_workbook(input_file, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        for values in rows:
+            yield {
+                column: '' if value is None else str(value)
+                for column, value in zip(header, values)
+                if column is not None
+            }
+    finally:
+        workbook.close()
+
+def read_csv_rows(input_file):
+    with open(input_file, encoding='utf-8-sig', newline='') as f:
+        yield from csv.DictReader(f)
+
+def read_jsonl_rows(input_file):
+    with open(input_file, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def read_parquet_rows(input_file):
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(input_file).iter_batches():
+        yield from batch.to_pylist()
+
+READERS = {
+    'xlsx': read_xlsx_rows,
+    'csv': read_csv_rows,
+    'jsonl': read_jsonl_rows,
+    'parquet': read_parquet_rows,
+}
+
+# Чтение строк ранее сохранённого результата (для инкрементального режима)
+def read_rows(input_file, fmt=None):
+    return READERS[output_format(input_file, fmt)](input_file)
@@ -0,0 +1,54 @@
+import atexit
+import threading
+from contextlib import contextmanager
+
+import yt_dlp
+
+# Пул долгоживущих экземпляров YoutubeDL.
+# Экземпляр создаётся один раз на ключ (например, ('vk', 'full')) и одновременного
+# пользователя, поэтому cookies.txt, настройки экстрактора и HTTP-сессия
+# загружаются один раз, а не для каждого видео.
+class ExtractorPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._all = []
+        self.created = 0
+
+    # Берём свободный экземпляр для ключа (или создаём новый) и возвращаем его в пул после работы.
+    # opts используются только при создании экземпляра.
+    @contextmanager
+    def extractor(self, key, opts):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            ydl = idle.pop() if idle else None
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(opts)
+            with self._lock:
+                self._all.append(ydl)
+                self.created += 1
+        try:
+            yield ydl
+        finally:
+            with self._lock:
+                self._idle[key].append(ydl)
+
+    def close(self):
+        with self._lock:
+            instances, self._all, self._idle = self._all, [], {}
+        for ydl in instances:
+            try:
+                ydl.close()
+            except Exception as e:
+                print(f"⚠️ Failed to close extractor: {e}")
+
+
+_pool = ExtractorPool()
+atexit.register(_pool.close)
+
+# Экземпляр YoutubeDL из общего пула процесса
+def extractor(key, opts):
+    return _pool.extractor(key, opts)
+
+def get_pool():
+    return _pool